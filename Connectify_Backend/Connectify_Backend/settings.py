@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Custom apps
     'accounts',
@@ -220,3 +221,27 @@ CLOUDINARY_STORAGE = {
 }
 
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
+
+# Uploaded files are hashed as they are received, for reusing stored copies of the same content
+FILE_UPLOAD_HANDLERS = [
+    'accounts.uploadhandlers.HashingMemoryFileUploadHandler',
+    'accounts.uploadhandlers.HashingTemporaryFileUploadHandler',
+]
+
+# Posts
+# Number of posts kept in each materialized home timeline
+POSTS_TIMELINE_MAX_LENGTH = 800
+# Hot posts spread counter writes over this many shard rows
+POSTS_COUNTER_SHARDS = 16
+# Counter writes per minute after which a post switches to sharded counters
+POSTS_HOT_POST_WRITES_PER_MINUTE = 600
+# Posts older than this no longer count towards trends
+POSTS_TRENDING_WINDOW_HOURS = 7 * 24
+# Age after which a post weighs half as much in the trend score
+POSTS_TRENDING_HALF_LIFE_HOURS = 24
+# Class storing post media; posts.media.LocalMediaStorage keeps it under MEDIA_ROOT
+POSTS_MEDIA_STORAGE_BACKEND = 'posts.media.CloudinaryMediaStorage'
+# Background media upload threads per process
+POSTS_MEDIA_UPLOAD_WORKERS = 4
+# Processes resizing uploaded images; 0 resizes in the uploading thread
+IMAGE_PROCESSING_WORKERS = 2
@@ -0,0 +1,79 @@
+import hashlib
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+from .models import StoredFile
+
+
+def new_content_hash():
+    """Start hashing uploaded content, fed chunk by chunk as it is read"""
+    return hashlib.sha256()
+
+
+def hash_uploaded_file(uploaded_file):
+    """
+    Get the hash of an uploaded file's content.
+    Files received by the upload handlers were hashed as they arrived; others are
+    hashed while streaming their chunks, then rewound for storing.
+    """
+    if getattr(uploaded_file, 'content_hash', None):
+        return uploaded_file.content_hash
+    content_hash = new_content_hash()
+    for chunk in uploaded_file.chunks():
+        content_hash.update(chunk)
+    uploaded_file.seek(0)
+    return content_hash.hexdigest()
+
+
+def find_stored_file(content_hash, folder):
+    """
+    Get the stored file holding the given content, counting the upload it saves.
+    Returns None when the content was never stored.
+    """
+    if not content_hash:
+        return None
+    stored = StoredFile.objects.filter(content_hash=content_hash, folder=folder).first()
+    if stored is not None:
+        StoredFile.objects.filter(pk=stored.pk).update(
+            hits=F('hits') + 1,
+            bytes_saved=F('bytes_saved') + stored.size
+        )
+    return stored
+
+
+def register_stored_file(content_hash, folder, url, public_id, size, variants=None):
+    """Record newly stored content so later uploads of it reuse the file"""
+    if not content_hash:
+        return
+    try:
+        with transaction.atomic():
+            StoredFile.objects.create(
+                content_hash=content_hash,
+                folder=folder,
+                url=url,
+                public_id=public_id,
+                variants=variants or {},
+                size=size
+            )
+    except IntegrityError:
+        # The same content was stored concurrently; the first file is the one reused
+        pass
+
+
+def forget_stored_file(public_id):
+    """Remove a file about to be deleted from storage, so no upload reuses it"""
+    StoredFile.objects.filter(public_id=public_id).delete()
+
+
+def get_dedup_stats():
+    """Get how many uploads were stored or reused, the hit rate and the bytes saved"""
+    totals = StoredFile.objects.aggregate(hits=Sum('hits'), bytes_saved=Sum('bytes_saved'))
+    stored = StoredFile.objects.count()
+    hits = totals['hits'] or 0
+    uploads = stored + hits
+    return {
+        'stored': stored,
+        'hits': hits,
+        'hit_rate': hits / uploads if uploads else 0.0,
+        'bytes_saved': totals['bytes_saved'] or 0,
+    }
@@ -0,0 +1,94 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Longest side of stored images, larger ones are scaled down
+IMAGE_MAX_DIMENSION = getattr(settings, 'IMAGE_MAX_DIMENSION', 2048)
+
+# Bounding boxes of the thumbnails generated for every image
+IMAGE_THUMBNAIL_SIZES = getattr(settings, 'IMAGE_THUMBNAIL_SIZES', {
+    'large': 1080,
+    'medium': 480,
+    'small': 150,
+})
+
+IMAGE_FORMAT = 'WEBP'
+IMAGE_EXTENSION = '.webp'
+IMAGE_QUALITY = getattr(settings, 'IMAGE_QUALITY', 80)
+
+# Processes resizing images; 0 resizes in the calling thread
+IMAGE_PROCESSING_WORKERS = getattr(settings, 'IMAGE_PROCESSING_WORKERS', 2)
+
+# Name of the variant holding the full (capped) image
+FULL_VARIANT = 'full'
+
+
+class ImageProcessingError(Exception):
+    pass
+
+
+def make_variants(path):
+    """
+    Write the full and thumbnail variants of an image next to it, returning their paths by name.
+    Images are rotated upright, re-encoded and saved without their EXIF and other metadata.
+    Runs in a worker process.
+    """
+    try:
+        with Image.open(path) as source:
+            image = ImageOps.exif_transpose(source)
+            image.load()
+    except (UnidentifiedImageError, OSError) as e:
+        raise ImageProcessingError(f"Invalid image: {e}")
+    except Image.DecompressionBombError as e:
+        # The header claims far more pixels than any upload should decode to
+        raise ImageProcessingError(f"Image too large: {e}")
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+    base = os.path.splitext(path)[0]
+    variants = {}
+    for name, size in [(FULL_VARIANT, IMAGE_MAX_DIMENSION), *IMAGE_THUMBNAIL_SIZES.items()]:
+        variant = image.copy()
+        # Keeps the aspect ratio and never enlarges
+        variant.thumbnail((size, size), Image.Resampling.LANCZOS)
+        variants[name] = f'{base}-{name}{IMAGE_EXTENSION}'
+        variant.save(variants[name], IMAGE_FORMAT, quality=IMAGE_QUALITY)
+    return variants
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Get the process pool resizing images, starting it on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Forking a process running threads can deadlock the child
+            _executor = ProcessPoolExecutor(
+                max_workers=IMAGE_PROCESSING_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executor
+
+
+def preprocess_image(path):
+    """
+    Make the variants of an image in the process pool, so CPU-bound resizing runs outside the web process.
+    Blocks until they are made; post media calls it from its upload threads, profile images from the request.
+    """
+    if not IMAGE_PROCESSING_WORKERS:
+        return make_variants(path)
+    return get_executor().submit(make_variants, path).result()
+
+
+def discard_variants(variants):
+    """Remove the local files of image variants"""
+    for path in variants.values():
+        if os.path.exists(path):
+            os.remove(path)
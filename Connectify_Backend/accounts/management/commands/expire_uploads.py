@@ -0,0 +1,18 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from accounts.uploads import UPLOAD_EXPIRY, expire_uploads
+
+class Command(BaseCommand):
+    help = 'Removes the chunked uploads left unfinished or unattached'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than',
+            type=int,
+            default=int(UPLOAD_EXPIRY.total_seconds() // 3600),
+            help='Only remove uploads untouched for more than this many hours'
+        )
+
+    def handle(self, *args, **options):
+        count = expire_uploads(older_than=timedelta(hours=options['older_than']))
+        self.stdout.write(self.style.SUCCESS(f'Removed {count} uploads'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from accounts.dedup import get_dedup_stats
+
+class Command(BaseCommand):
+    help = 'Shows how many uploads reused already stored content and the bytes it saved'
+
+    def handle(self, *args, **options):
+        stats = get_dedup_stats()
+        self.stdout.write(f"Stored files: {stats['stored']}")
+        self.stdout.write(f"Reused uploads: {stats['hits']}")
+        self.stdout.write(f"Hit rate: {stats['hit_rate']:.1%}")
+        self.stdout.write(self.style.SUCCESS(f"Bytes saved: {stats['bytes_saved']}"))
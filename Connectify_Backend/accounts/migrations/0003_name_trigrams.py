@@ -0,0 +1,63 @@
+# Generated by Django 5.1.7 on 2026-10-17 06:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+from accounts.trigrams import get_trigrams
+
+NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def index_user_names(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for field in NAME_FIELDS:
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS accounts_user_{field}_trgm_idx '
+                f'ON accounts_user USING gin (UPPER({field}) gin_trgm_ops, {field} gin_trgm_ops)'
+            )
+        return
+
+    User = apps.get_model('accounts', 'User')
+    UserTrigram = apps.get_model('accounts', 'UserTrigram')
+    rows = []
+    for user in User.objects.only(*NAME_FIELDS).iterator():
+        for field in NAME_FIELDS:
+            trigrams = get_trigrams(getattr(user, field))
+            rows.extend(
+                UserTrigram(user=user, field=field, gram=gram, total=len(trigrams)) for gram in trigrams
+            )
+    UserTrigram.objects.bulk_create(rows, batch_size=1000)
+
+
+def drop_user_name_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for field in NAME_FIELDS:
+            schema_editor.execute(f'DROP INDEX IF EXISTS accounts_user_{field}_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_user_bio_user_dob_user_profile_image'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='UserTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(max_length=20)),
+                ('gram', models.CharField(max_length=3)),
+                ('total', models.PositiveSmallIntegerField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['gram', 'field'], name='accounts_trigram_gram_idx')],
+                'unique_together': {('user', 'field', 'gram')},
+            },
+        ),
+        migrations.RunPython(index_user_names, drop_user_name_indexes),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-17 06:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_name_trigrams'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='profile_image_variants',
+            field=models.JSONField(blank=True, default=dict, help_text='URLs of the resized profile images by size'),
+        ),
+    ]
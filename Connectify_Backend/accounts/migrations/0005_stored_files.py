@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-17 06:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('folder', models.CharField(max_length=50)),
+                ('url', models.CharField(max_length=500)),
+                ('public_id', models.CharField(db_index=True, max_length=255)),
+                ('variants', models.JSONField(blank=True, default=dict)),
+                ('size', models.PositiveBigIntegerField(help_text='Size of the uploaded content in bytes')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('bytes_saved', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('content_hash', 'folder')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-17 08:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_chunked_uploads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chunkedupload',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -1,3 +1,4 @@
+import uuid
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils.translation import gettext_lazy as _
@@ -23,6 +24,7 @@ class User(AbstractUser):
     bio = models.TextField(blank=True, null=True, help_text=_("User's bio"))
     dob = models.DateField(blank=True, null=True, help_text=_("Date of birth"))
     profile_image = models.URLField(blank=True, null=True, help_text=_("URL of the user's profile image"))
+    profile_image_variants = models.JSONField(default=dict, blank=True, help_text=_("URLs of the resized profile images by size"))
     
     # Add any additional fields here
     
@@ -32,3 +34,84 @@ class User(AbstractUser):
     class Meta:
         verbose_name = _('User')
         verbose_name_plural = _('Users')
+
+
+class UserTrigram(models.Model):
+    """
+    Trigram of a user name field, used for name search on databases without pg_trgm.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='trigrams')
+    field = models.CharField(max_length=20)
+    gram = models.CharField(max_length=3)
+    # Number of distinct trigrams of the field, for similarity ranking
+    total = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        unique_together = ['user', 'field', 'gram']
+        indexes = [
+            models.Index(fields=['gram', 'field'], name='accounts_trigram_gram_idx'),
+        ]
+    
+    def __str__(self):
+        return f"'{self.gram}' in {self.field} of {self.user_id}"
+
+
+class StoredFile(models.Model):
+    """
+    File already in storage, addressed by the hash of the uploaded content,
+    so uploading the same content again reuses it instead of storing a copy.
+    Stored files are shared by every upload of their content.
+    """
+    content_hash = models.CharField(max_length=64)
+    # Kind of upload the file was stored for, as its storage folder
+    folder = models.CharField(max_length=50)
+    url = models.CharField(max_length=500)
+    # Storage identifier of the file: Cloudinary public ID or storage name
+    public_id = models.CharField(max_length=255, db_index=True)
+    # Resized images by size name, each {'url': ..., 'public_id': ...}
+    variants = models.JSONField(default=dict, blank=True)
+    size = models.PositiveBigIntegerField(help_text=_("Size of the uploaded content in bytes"))
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    # Uploads that reused the file, and the bytes they did not have to store
+    hits = models.PositiveIntegerField(default=0)
+    bytes_saved = models.PositiveBigIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['content_hash', 'folder']
+    
+    def __str__(self):
+        return f"{self.folder}/{self.content_hash}"
+
+
+class ChunkedUpload(models.Model):
+    """
+    Large file sent in chunks, so a dropped connection resumes from the last
+    acknowledged offset. Once finished it can be attached to a post or a message.
+    """
+    STATUS_ACTIVE = 'active'
+    STATUS_COMPLETE = 'complete'
+    STATUS_ATTACHED = 'attached'
+    STATUSES = [
+        (STATUS_ACTIVE, 'Active'),
+        (STATUS_COMPLETE, 'Complete'),
+        (STATUS_ATTACHED, 'Attached'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chunked_uploads')
+    file_name = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    size = models.PositiveBigIntegerField(help_text=_("Total size of the file in bytes"))
+    # Bytes received so far, where the next chunk starts
+    offset = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUSES, default=STATUS_ACTIVE)
+    # Temporary file the chunks are written to
+    path = models.CharField(max_length=500)
+    # SHA-256 of the content, set once the upload is finished
+    content_hash = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Upload of {self.file_name} by {self.user_id} ({self.offset}/{self.size})"
@@ -0,0 +1,15 @@
+from .models import UserTrigram
+from .trigrams import index_trigrams, match_trigrams
+
+# Fields users are found by
+USER_SEARCH_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def index_user(user):
+    """Write the name search entries of a user"""
+    index_trigrams(UserTrigram, 'user', user, USER_SEARCH_FIELDS)
+
+
+def match_users(users, query):
+    """Get the users whose names start with or resemble the query, best matches first"""
+    return match_trigrams(users, query, UserTrigram, 'user', USER_SEARCH_FIELDS)
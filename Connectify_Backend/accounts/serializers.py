@@ -4,7 +4,7 @@ from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.utils.translation import gettext_lazy as _
 
-from .models import User
+from .models import ChunkedUpload, User
 
 class UserSerializer(serializers.ModelSerializer):
     """
@@ -12,8 +12,18 @@ class UserSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = User
-        fields = ('id', 'username', 'email', 'first_name', 'last_name', 'role', 'bio', 'dob', 'profile_image')
-        read_only_fields = ('id', 'role')
+        fields = ('id', 'username', 'email', 'first_name', 'last_name', 'role', 'bio', 'dob', 'profile_image', 'profile_image_variants')
+        read_only_fields = ('id', 'role', 'profile_image_variants')
+
+
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    """
+    Serializer for chunked uploads, started with the name, type and size of the file.
+    """
+    class Meta:
+        model = ChunkedUpload
+        fields = ('id', 'file_name', 'content_type', 'size', 'offset', 'status', 'created_at')
+        read_only_fields = ('id', 'offset', 'status', 'created_at')
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
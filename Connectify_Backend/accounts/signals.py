@@ -0,0 +1,14 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import User
+from .search import USER_SEARCH_FIELDS, index_user
+
+
+@receiver(post_save, sender=User)
+def index_user_names(sender, instance, update_fields=None, **kwargs):
+    """Keep the name search entries of a user up to date"""
+    # Saves of other fields, such as last_login on every login, leave the names alone
+    if update_fields is not None and not set(update_fields) & set(USER_SEARCH_FIELDS):
+        return
+    index_user(instance)
@@ -0,0 +1,34 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+from django.contrib.auth import get_user_model
+
+User = get_user_model()
+
+@pytest.fixture
+def api_client():
+    """Return an API client for testing."""
+    return APIClient()
+
+@pytest.fixture
+def regular_user():
+    """Create a regular user for testing."""
+    return User.objects.create_user(
+        username='user_test',
+        email='user@example.com',
+        password='user123',
+        role='USER',
+        is_staff=False,
+        is_superuser=False
+    )
+
+@pytest.fixture
+def user_token(api_client, regular_user):
+    """Get authentication token for regular user."""
+    url = reverse('accounts:login')
+    data = {
+        'login': 'user_test',
+        'password': 'user123'
+    }
+    response = api_client.post(url, data)
+    return response.data['access']
@@ -0,0 +1,58 @@
+import hashlib
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory
+from accounts.dedup import find_stored_file, get_dedup_stats, hash_uploaded_file, register_stored_file
+
+# Test the content table of stored files
+@pytest.mark.django_db
+class TestDedup:
+    def test_hashing_rewinds_the_file(self):
+        """Test that a hashed file can still be read from the start"""
+        uploaded_file = SimpleUploadedFile('notes.txt', b'hello')
+
+        content_hash = hash_uploaded_file(uploaded_file)
+
+        assert content_hash == hash_uploaded_file(SimpleUploadedFile('other.txt', b'hello'))
+        assert uploaded_file.read() == b'hello'
+
+    @pytest.mark.parametrize('max_memory_size', [2621440, 0])
+    def test_received_files_are_hashed_once(self, settings, max_memory_size):
+        """Test that files parsed from a request carry the hash computed while they were received"""
+        settings.FILE_UPLOAD_MAX_MEMORY_SIZE = max_memory_size
+        request = RequestFactory().post('/', {'media': SimpleUploadedFile('notes.txt', b'hello')})
+
+        uploaded_file = request.FILES['media']
+
+        assert uploaded_file.content_hash == hashlib.sha256(b'hello').hexdigest()
+        assert hash_uploaded_file(uploaded_file) == uploaded_file.content_hash
+        assert uploaded_file.read() == b'hello'
+
+    def test_stored_files_are_found_by_content(self):
+        """Test that registered content is found in its own folder only"""
+        register_stored_file('abc', 'posts', '/media/posts/a.webp', 'posts/a.webp', 100)
+
+        assert find_stored_file('abc', 'posts').public_id == 'posts/a.webp'
+        assert find_stored_file('abc', 'user_profiles') is None
+        assert find_stored_file('', 'posts') is None
+
+    def test_registering_twice_keeps_the_first_file(self):
+        """Test that content stored concurrently keeps pointing to the first file"""
+        register_stored_file('abc', 'posts', '/media/posts/a.webp', 'posts/a.webp', 100)
+        register_stored_file('abc', 'posts', '/media/posts/b.webp', 'posts/b.webp', 100)
+
+        assert find_stored_file('abc', 'posts').public_id == 'posts/a.webp'
+
+    def test_stats(self):
+        """Test the hit rate and bytes saved by reused uploads"""
+        register_stored_file('abc', 'posts', '/media/posts/a.webp', 'posts/a.webp', 100)
+        find_stored_file('abc', 'posts')
+        find_stored_file('abc', 'posts')
+        find_stored_file('def', 'posts')
+
+        stats = get_dedup_stats()
+
+        assert stats['stored'] == 1
+        assert stats['hits'] == 2
+        assert stats['hit_rate'] == pytest.approx(2 / 3)
+        assert stats['bytes_saved'] == 200
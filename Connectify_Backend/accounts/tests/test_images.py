@@ -0,0 +1,81 @@
+import os
+import struct
+import zlib
+import pytest
+from PIL import Image
+from accounts import images
+
+def write_image(path, size, orientation=None):
+    """Write a JPEG with camera EXIF data"""
+    exif = Image.Exif()
+    exif[0x010f] = 'Camera maker'
+    if orientation:
+        exif[0x0112] = orientation
+    Image.new('RGB', size, 'blue').save(path, 'JPEG', exif=exif)
+    return str(path)
+
+def png_chunk(kind, data):
+    """Encode a PNG chunk with its length and checksum"""
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+# Test the image preprocessing
+class TestImages:
+    def test_variants_are_resized(self, tmp_path):
+        """Test that the full image is capped and the thumbnails fit their sizes"""
+        variants = images.make_variants(write_image(tmp_path / 'photo.jpg', (3000, 1500)))
+
+        assert set(variants) == {images.FULL_VARIANT, *images.IMAGE_THUMBNAIL_SIZES}
+        with Image.open(variants[images.FULL_VARIANT]) as full:
+            assert full.format == 'WEBP'
+            assert full.size == (2048, 1024)
+        for name, size in images.IMAGE_THUMBNAIL_SIZES.items():
+            with Image.open(variants[name]) as thumbnail:
+                assert max(thumbnail.size) == size
+
+    def test_small_images_are_not_enlarged(self, tmp_path):
+        """Test that images smaller than a variant keep their size"""
+        variants = images.make_variants(write_image(tmp_path / 'photo.jpg', (100, 50)))
+
+        with Image.open(variants['large']) as large:
+            assert large.size == (100, 50)
+
+    def test_exif_is_stripped(self, tmp_path):
+        """Test that images are rotated upright and saved without their EXIF data"""
+        # Orientation 6 means the camera was turned a quarter clockwise
+        variants = images.make_variants(write_image(tmp_path / 'photo.jpg', (200, 100), orientation=6))
+
+        with Image.open(variants[images.FULL_VARIANT]) as full:
+            assert full.size == (100, 200)
+            assert not full.getexif()
+
+    def test_invalid_images_are_rejected(self, tmp_path):
+        """Test that files which are not images raise ImageProcessingError"""
+        path = tmp_path / 'photo.jpg'
+        path.write_bytes(b'not an image')
+
+        with pytest.raises(images.ImageProcessingError):
+            images.make_variants(str(path))
+
+    def test_decompression_bombs_are_rejected(self, tmp_path):
+        """Test that images whose header claims a huge size raise ImageProcessingError"""
+        # A PNG declaring 100000 x 100000 pixels, with no pixel data
+        header = struct.pack('>IIBBBBB', 100000, 100000, 8, 2, 0, 0, 0)
+        path = tmp_path / 'bomb.png'
+        path.write_bytes(
+            b'\x89PNG\r\n\x1a\n' + png_chunk(b'IHDR', header) + png_chunk(b'IDAT', zlib.compress(b'')) + png_chunk(b'IEND', b'')
+        )
+
+        with pytest.raises(images.ImageProcessingError):
+            images.make_variants(str(path))
+
+    def test_preprocessing_runs_in_worker_processes(self, tmp_path, monkeypatch):
+        """Test that the variants made in the process pool are returned"""
+        monkeypatch.setattr(images, '_executor', None)
+        path = write_image(tmp_path / 'photo.jpg', (300, 300))
+
+        variants = images.preprocess_image(path)
+        images.get_executor().shutdown()
+
+        assert all(os.path.exists(variant) for variant in variants.values())
+        images.discard_variants(variants)
+        assert not any(os.path.exists(variant) for variant in variants.values())
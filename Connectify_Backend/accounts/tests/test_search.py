@@ -0,0 +1,80 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from django.contrib.auth import get_user_model
+from accounts.models import UserTrigram
+from accounts.search import match_users
+from accounts.trigrams import get_prefix_trigrams, get_trigrams
+
+User = get_user_model()
+
+def search(query):
+    """Get the usernames matching a query, best first"""
+    return [user.username for user in match_users(User.objects.all(), query)]
+
+# Test trigram extraction
+class TestTrigrams:
+    def test_words_are_padded(self):
+        """Test that trigrams are taken per lowercased word, padded like pg_trgm"""
+        assert get_trigrams('Ab, c') == {'  a', ' ab', 'ab ', '  c', ' c '}
+
+    def test_prefix_trigrams_are_contained(self):
+        """Test that the prefix trigrams of a word are a subset of the trigrams of its extensions"""
+        assert get_prefix_trigrams('ali') <= get_trigrams('alice')
+        assert not get_prefix_trigrams('lic') <= get_trigrams('alice')
+
+# Test user name search
+@pytest.mark.django_db
+class TestUserSearch:
+    @pytest.fixture(autouse=True)
+    def users(self):
+        User.objects.create_user(username='alice', password='pass', first_name='Alice', last_name='Martin')
+        User.objects.create_user(username='alicia', password='pass', first_name='Alicia', last_name='Keys')
+        User.objects.create_user(username='bob', password='pass', first_name='Robert', last_name='Marten')
+
+    def test_prefix_matches_come_first(self):
+        """Test that names starting with the query rank above similar names"""
+        # Shorter names are closer to the query
+        assert search('ali') == ['alice', 'alicia']
+
+    def test_fuzzy_matches(self):
+        """Test that misspelled names are found by similarity"""
+        assert search('alise') == ['alice', 'alicia']
+        assert sorted(search('martn')) == ['alice', 'bob']
+        assert search('zzz') == []
+
+    def test_entries_follow_name_changes(self):
+        """Test that renaming a user replaces their search entries"""
+        user = User.objects.get(username='bob')
+        user.first_name = 'Zed'
+        user.save(update_fields=['first_name'])
+
+        assert search('zed') == ['bob']
+        assert search('robert') == []
+
+    def test_unrelated_saves_keep_entries(self):
+        """Test that saving other fields does not rewrite the entries"""
+        user = User.objects.get(username='bob')
+        ids = set(UserTrigram.objects.filter(user=user).values_list('id', flat=True))
+
+        user.bio = 'Hello'
+        user.save(update_fields=['bio'])
+
+        assert set(UserTrigram.objects.filter(user=user).values_list('id', flat=True)) == ids
+
+    def test_search_endpoint(self, api_client, user_token):
+        """Test that the endpoint returns the matching users"""
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        response = api_client.get(reverse('accounts:user_search'), {'q': 'alic'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [user['username'] for user in response.data] == ['alice', 'alicia']
+
+    def test_search_endpoint_requires_query(self, api_client, user_token):
+        """Test that a missing query is rejected"""
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        response = api_client.get(reverse('accounts:user_search'))
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
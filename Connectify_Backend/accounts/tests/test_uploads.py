@@ -0,0 +1,128 @@
+import hashlib
+import io
+import os
+import pytest
+from datetime import timedelta
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from accounts import uploads
+from accounts.models import ChunkedUpload
+
+CONTENT = b'0123456789' * 10
+
+@pytest.fixture(autouse=True)
+def upload_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(uploads, 'UPLOAD_DIR', str(tmp_path))
+
+@pytest.fixture
+def upload(api_client, user_token):
+    """Start an upload through the API"""
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+    data = {'file_name': 'clip.mp4', 'content_type': 'video/mp4', 'size': len(CONTENT)}
+    response = api_client.post(reverse('accounts:upload_start'), data, format='json')
+    assert response.status_code == status.HTTP_201_CREATED
+    return ChunkedUpload.objects.get(id=response.data['id'])
+
+def send_chunk(api_client, upload, offset, chunk):
+    return api_client.generic(
+        'PATCH',
+        reverse('accounts:upload_detail', args=[upload.id]),
+        chunk,
+        content_type='application/octet-stream',
+        HTTP_UPLOAD_OFFSET=str(offset)
+    )
+
+# Test the chunked upload endpoints
+@pytest.mark.django_db
+class TestChunkedUploads:
+    def test_upload_in_chunks(self, api_client, upload):
+        """Test that chunks are appended in order and the upload is then finalized"""
+        for offset in range(0, len(CONTENT), 40):
+            response = send_chunk(api_client, upload, offset, CONTENT[offset:offset + 40])
+            assert response.status_code == status.HTTP_200_OK
+            assert response.data['offset'] == min(offset + 40, len(CONTENT))
+
+        response = api_client.post(reverse('accounts:upload_finalize', args=[upload.id]))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['status'] == ChunkedUpload.STATUS_COMPLETE
+        with open(upload.path, 'rb') as spool:
+            assert spool.read() == CONTENT
+
+    def test_content_is_hashed_as_chunks_arrive(self, api_client, upload):
+        """Test that the content hash is built chunk by chunk, even when chunks reach several processes"""
+        send_chunk(api_client, upload, 0, CONTENT[:40])
+        # A process that did not receive the first chunk reads it back from the file
+        uploads._upload_hashes.clear()
+        send_chunk(api_client, upload, 40, CONTENT[40:])
+        api_client.post(reverse('accounts:upload_finalize', args=[upload.id]))
+
+        upload.refresh_from_db()
+        assert upload.content_hash == hashlib.sha256(CONTENT).hexdigest()
+        assert upload.id not in uploads._upload_hashes
+        with uploads.open_upload(upload) as uploaded_file:
+            assert uploaded_file.content_hash == upload.content_hash
+
+    def test_wrong_offset_returns_the_resume_offset(self, api_client, upload):
+        """Test that a chunk at the wrong offset is rejected with the offset to resume from"""
+        send_chunk(api_client, upload, 0, CONTENT[:40])
+
+        response = send_chunk(api_client, upload, 80, CONTENT[80:])
+
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert response.data['offset'] == 40
+        response = api_client.get(reverse('accounts:upload_detail', args=[upload.id]))
+        assert response.data['offset'] == 40
+
+    def test_interrupted_chunk_is_not_acknowledged(self, upload):
+        """Test that a chunk cut short leaves the offset where it was"""
+        with pytest.raises(uploads.UploadOffsetError) as error:
+            uploads.append_chunk(upload, 0, io.BytesIO(CONTENT[:30]), 50)
+
+        assert error.value.offset == 0
+        upload.refresh_from_db()
+        assert upload.offset == 0
+
+    def test_incomplete_upload_cannot_be_finalized(self, api_client, upload):
+        """Test that finalizing before every chunk arrived is refused"""
+        send_chunk(api_client, upload, 0, CONTENT[:40])
+
+        response = api_client.post(reverse('accounts:upload_finalize', args=[upload.id]))
+
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert response.data['offset'] == 40
+
+    def test_oversized_chunks_are_rejected(self, api_client, upload, monkeypatch):
+        """Test that chunks larger than the limit are refused"""
+        monkeypatch.setattr(uploads, 'UPLOAD_CHUNK_MAX_SIZE', 10)
+
+        response = send_chunk(api_client, upload, 0, CONTENT[:40])
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_uploads_are_claimed_once(self, api_client, upload, regular_user):
+        """Test that a finished upload can only be attached once"""
+        send_chunk(api_client, upload, 0, CONTENT)
+        api_client.post(reverse('accounts:upload_finalize', args=[upload.id]))
+
+        assert uploads.claim_uploads(regular_user, [upload.id]) == [upload]
+        with pytest.raises(uploads.ChunkedUploadError):
+            uploads.claim_uploads(regular_user, [upload.id])
+
+    def test_expired_uploads_are_removed(self, upload):
+        """Test that old uploads are removed with their files"""
+        assert uploads.expire_uploads(older_than=timedelta(hours=1)) == 0
+        assert uploads.expire_uploads(older_than=timedelta(0)) == 1
+        assert not os.path.exists(upload.path)
+
+    def test_claimed_uploads_are_not_expired(self, api_client, upload, regular_user):
+        """Test that claiming an old upload keeps expiry from removing it while it is attached"""
+        send_chunk(api_client, upload, 0, CONTENT)
+        api_client.post(reverse('accounts:upload_finalize', args=[upload.id]))
+        ChunkedUpload.objects.filter(pk=upload.pk).update(updated_at=timezone.now() - timedelta(days=2))
+
+        uploads.claim_uploads(regular_user, [upload.id])
+
+        assert uploads.expire_uploads(older_than=timedelta(hours=1)) == 0
+        assert os.path.exists(upload.path)
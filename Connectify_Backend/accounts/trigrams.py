@@ -0,0 +1,131 @@
+import math
+import re
+from django.contrib.postgres.search import TrigramSimilarity, TrigramWordSimilarity
+from django.db import connection, transaction
+from django.db.models import Case, Count, Max, Q, Value, When
+from django.db.models.functions import Greatest
+
+# Minimum similarity of a whole field to the query, as pg_trgm.similarity_threshold
+TRIGRAM_SIMILARITY_THRESHOLD = 0.3
+
+# Minimum similarity of part of a long field to the query, as pg_trgm.word_similarity_threshold
+TRIGRAM_WORD_SIMILARITY_THRESHOLD = 0.6
+
+# Maximum number of results of a name search
+TRIGRAM_SEARCH_LIMIT = 20
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def uses_trigram_index():
+    """Check whether names are searched through pg_trgm indexes rather than trigram tables"""
+    return connection.vendor == 'postgresql'
+
+
+def get_trigrams(text):
+    """Get the trigrams of a text the way pg_trgm does: per lowercased word, padded with spaces"""
+    trigrams = set()
+    for word in WORD_PATTERN.findall((text or '').lower()):
+        padded = f'  {word} '
+        trigrams.update(padded[index:index + 3] for index in range(len(padded) - 2))
+    return trigrams
+
+
+def get_prefix_trigrams(text):
+    """Get the trigrams every text whose words start with the words of the given text contains"""
+    trigrams = set()
+    for word in WORD_PATTERN.findall((text or '').lower()):
+        # Without the trailing space, which only marks the end of a complete word
+        padded = f'  {word}'
+        trigrams.update(padded[index:index + 3] for index in range(len(padded) - 2))
+    return trigrams
+
+
+def index_trigrams(trigram_model, owner_field, instance, fields):
+    """Replace the trigram rows of an instance in the fallback trigram table"""
+    if uses_trigram_index():
+        return
+
+    rows = []
+    for field in fields:
+        trigrams = get_trigrams(getattr(instance, field))
+        rows.extend(
+            trigram_model(**{owner_field: instance}, field=field, gram=gram, total=len(trigrams))
+            for gram in trigrams
+        )
+
+    with transaction.atomic():
+        trigram_model.objects.filter(**{owner_field: instance}).delete()
+        trigram_model.objects.bulk_create(rows, batch_size=1000)
+
+
+def match_trigrams(queryset, query, trigram_model, owner_field, fields, word_fields=(), limit=TRIGRAM_SEARCH_LIMIT):
+    """
+    Get the objects of a queryset whose fields start with or resemble the query.
+    Prefix matches come first, then the others by decreasing similarity.
+
+    Whole-field similarity is used for the given fields and best-matching-part
+    similarity for the word_fields, which hold longer texts.
+    """
+    if uses_trigram_index():
+        return match_trigram_index(queryset, query, fields, word_fields, limit)
+
+    trigrams = get_trigrams(query)
+    prefix_trigrams = get_prefix_trigrams(query)
+    if not trigrams:
+        return queryset.none()
+
+    # Neither kind of similarity can pass its threshold with fewer shared trigrams
+    min_shared = math.ceil(min(TRIGRAM_SIMILARITY_THRESHOLD, TRIGRAM_WORD_SIMILARITY_THRESHOLD) * len(trigrams))
+    owner_id = f'{owner_field}_id'
+    rows = trigram_model.objects.filter(
+        gram__in=trigrams | prefix_trigrams,
+        field__in=[*fields, *word_fields],
+        **{f'{owner_field}__in': queryset.values('pk')}
+    ).values(owner_id, 'field').annotate(
+        shared=Count('id', filter=Q(gram__in=trigrams)),
+        prefix_shared=Count('id', filter=Q(gram__in=prefix_trigrams)),
+        total=Max('total')
+    ).filter(Q(shared__gte=min_shared) | Q(prefix_shared=len(prefix_trigrams))).order_by()
+
+    ranks = {}
+    for row in rows:
+        if row['field'] in word_fields:
+            similarity = row['shared'] / len(trigrams)
+            threshold = TRIGRAM_WORD_SIMILARITY_THRESHOLD
+            prefix = False
+        else:
+            similarity = row['shared'] / (len(trigrams) + row['total'] - row['shared'])
+            threshold = TRIGRAM_SIMILARITY_THRESHOLD
+            prefix = row['prefix_shared'] == len(prefix_trigrams)
+        if prefix or similarity >= threshold:
+            ranks[row[owner_id]] = max(ranks.get(row[owner_id], (False, 0)), (prefix, similarity))
+
+    ranked_ids = sorted(ranks, key=lambda pk: (ranks[pk], pk), reverse=True)[:limit]
+    if not ranked_ids:
+        return queryset.none()
+    return queryset.filter(pk__in=ranked_ids).order_by(
+        Case(*[When(pk=pk, then=Value(position)) for position, pk in enumerate(ranked_ids)])
+    )
+
+
+def match_trigram_index(queryset, query, fields, word_fields, limit):
+    """Run a name search with the pg_trgm operators, which use the GIN trigram indexes"""
+    prefix = Q()
+    for field in fields:
+        prefix |= Q(**{f'{field}__istartswith': query})
+
+    matches = prefix
+    for field in fields:
+        matches |= Q(**{f'{field}__trigram_similar': query})
+    for field in word_fields:
+        matches |= Q(**{f'{field}__trigram_word_similar': query})
+
+    similarities = [TrigramSimilarity(field, query) for field in fields]
+    similarities += [TrigramWordSimilarity(query, field) for field in word_fields]
+    similarity = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+
+    return queryset.filter(matches).annotate(
+        search_prefix=Case(When(prefix, then=Value(1)), default=Value(0)),
+        search_similarity=similarity
+    ).order_by('-search_prefix', '-search_similarity', '-pk')[:limit]
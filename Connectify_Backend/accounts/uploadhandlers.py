@@ -0,0 +1,35 @@
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+from .dedup import new_content_hash
+
+
+class ContentHashMixin:
+    """
+    Hash the files an upload handler stores as their chunks arrive, so the content hash
+    is known once the request is parsed without reading the files again.
+    """
+
+    def new_file(self, *args, **kwargs):
+        self.content_hash = new_content_hash()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        data = super().receive_data_chunk(raw_data, start)
+        # A handler returns the chunk only when it leaves the file to the next handler
+        if data is None:
+            self.content_hash.update(raw_data)
+        return data
+
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        if uploaded_file is not None:
+            uploaded_file.content_hash = self.content_hash.hexdigest()
+        return uploaded_file
+
+
+class HashingMemoryFileUploadHandler(ContentHashMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(ContentHashMixin, TemporaryFileUploadHandler):
+    pass
@@ -0,0 +1,223 @@
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.utils import timezone
+
+from .dedup import new_content_hash
+from .models import ChunkedUpload
+
+# Largest chunk accepted in one request
+UPLOAD_CHUNK_MAX_SIZE = getattr(settings, 'UPLOAD_CHUNK_MAX_SIZE', 8 * 1024 * 1024)
+
+# Largest file accepted as a chunked upload
+UPLOAD_MAX_SIZE = getattr(settings, 'UPLOAD_MAX_SIZE', 2 * 1024 * 1024 * 1024)
+
+# Directory holding uploads until they are finished and attached
+UPLOAD_DIR = getattr(settings, 'UPLOAD_DIR', None) or tempfile.gettempdir()
+
+# Uploads left untouched for longer than this are removed
+UPLOAD_EXPIRY = timedelta(hours=getattr(settings, 'UPLOAD_EXPIRY_HOURS', 24))
+
+# Bytes read from a request and written at a time, bounding the memory a chunk takes
+UPLOAD_BUFFER_SIZE = 64 * 1024
+
+# Unfinished uploads whose content hash each process keeps, the least recently written dropped first
+UPLOAD_HASHES_MAX = 1000
+
+# Content hashes of the uploads this process received chunks of, with the offset each reached
+_upload_hashes = {}
+_upload_hashes_lock = threading.Lock()
+
+
+class ChunkedUploadError(Exception):
+    pass
+
+
+class UploadOffsetError(ChunkedUploadError):
+    """Raised for a chunk not starting where the upload stands, which the client resumes from"""
+
+    def __init__(self, offset):
+        self.offset = offset
+        super().__init__(f"The next chunk must start at offset {offset}")
+
+
+def start_upload(user, file_name, content_type, size):
+    """Create an empty upload that chunks are then appended to"""
+    if size > UPLOAD_MAX_SIZE:
+        raise ChunkedUploadError(f"Uploads can be at most {UPLOAD_MAX_SIZE} bytes")
+    with tempfile.NamedTemporaryFile(dir=UPLOAD_DIR, prefix='chunked-upload-', delete=False) as spool:
+        pass
+    return ChunkedUpload.objects.create(
+        user=user,
+        file_name=file_name,
+        content_type=content_type,
+        size=size,
+        path=spool.name
+    )
+
+
+def append_chunk(upload, offset, stream, length):
+    """
+    Write a chunk read from a stream at the given offset of an upload.
+    The offset only moves once the whole chunk is written, so an interrupted
+    chunk is sent again from the last acknowledged offset.
+    """
+    if upload.status != ChunkedUpload.STATUS_ACTIVE:
+        raise ChunkedUploadError("The upload is already finished")
+    if offset != upload.offset:
+        raise UploadOffsetError(upload.offset)
+    if length > UPLOAD_CHUNK_MAX_SIZE:
+        raise ChunkedUploadError(f"Chunks can be at most {UPLOAD_CHUNK_MAX_SIZE} bytes")
+    if offset + length > upload.size:
+        raise ChunkedUploadError("The chunk goes past the end of the file")
+
+    written = 0
+    content_hash = get_upload_hash(upload, offset)
+    with open(upload.path, 'r+b') as spool:
+        spool.seek(offset)
+        while written < length:
+            data = stream.read(min(UPLOAD_BUFFER_SIZE, length - written))
+            if not data:
+                break
+            spool.write(data)
+            content_hash.update(data)
+            written += len(data)
+    if written < length:
+        raise UploadOffsetError(upload.offset)
+
+    # Only one of concurrent writers of the same chunk moves the offset
+    updated = ChunkedUpload.objects.filter(
+        pk=upload.pk,
+        offset=offset,
+        status=ChunkedUpload.STATUS_ACTIVE
+    ).update(offset=offset + length, updated_at=timezone.now())
+    upload.refresh_from_db()
+    if not updated:
+        raise UploadOffsetError(upload.offset)
+    set_upload_hash(upload, offset + length, content_hash)
+    return upload
+
+
+def get_upload_hash(upload, offset):
+    """
+    Get a copy of the content hash of an upload up to the given offset.
+    Chunks this process did not receive are read back from the file, so each
+    chunk is hashed once as it arrives when a client sticks to one process.
+    """
+    with _upload_hashes_lock:
+        hashed, content_hash = _upload_hashes.get(upload.pk, (0, None))
+        content_hash = content_hash.copy() if content_hash is not None and hashed <= offset else None
+    if content_hash is None:
+        hashed, content_hash = 0, new_content_hash()
+
+    if hashed < offset:
+        with open(upload.path, 'rb') as spool:
+            spool.seek(hashed)
+            while hashed < offset:
+                data = spool.read(min(UPLOAD_BUFFER_SIZE, offset - hashed))
+                if not data:
+                    break
+                content_hash.update(data)
+                hashed += len(data)
+    return content_hash
+
+
+def set_upload_hash(upload, offset, content_hash):
+    with _upload_hashes_lock:
+        _upload_hashes.pop(upload.pk, None)
+        _upload_hashes[upload.pk] = (offset, content_hash)
+        while len(_upload_hashes) > UPLOAD_HASHES_MAX:
+            del _upload_hashes[next(iter(_upload_hashes))]
+
+
+def forget_upload_hash(upload):
+    with _upload_hashes_lock:
+        _upload_hashes.pop(upload.pk, None)
+
+
+def finalize_upload(upload):
+    """Mark an upload whose chunks were all received as ready to be attached"""
+    if upload.offset != upload.size:
+        raise UploadOffsetError(upload.offset)
+    if upload.status == ChunkedUpload.STATUS_ACTIVE:
+        ChunkedUpload.objects.filter(pk=upload.pk, status=ChunkedUpload.STATUS_ACTIVE).update(
+            status=ChunkedUpload.STATUS_COMPLETE,
+            content_hash=get_upload_hash(upload, upload.size).hexdigest(),
+            updated_at=timezone.now()
+        )
+        forget_upload_hash(upload)
+    upload.refresh_from_db()
+    if upload.status == ChunkedUpload.STATUS_ATTACHED:
+        raise ChunkedUploadError("The upload is already attached")
+    return upload
+
+
+def claim_uploads(user, upload_ids):
+    """
+    Take finished uploads of a user to attach them, in the given order.
+    Claimed uploads cannot be attached anywhere else.
+    """
+    upload_ids = list(dict.fromkeys(upload_ids))
+    with transaction.atomic():
+        uploads = {
+            upload.id: upload
+            for upload in ChunkedUpload.objects.select_for_update().filter(
+                id__in=upload_ids,
+                user=user,
+                status=ChunkedUpload.STATUS_COMPLETE
+            )
+        }
+        if len(uploads) != len(upload_ids):
+            raise ChunkedUploadError("Unknown or unfinished upload")
+        # Claiming counts as a write, so expiry does not remove uploads being attached
+        ChunkedUpload.objects.filter(id__in=upload_ids).update(
+            status=ChunkedUpload.STATUS_ATTACHED,
+            updated_at=timezone.now()
+        )
+    return [uploads[upload_id] for upload_id in upload_ids]
+
+
+def release_uploads(uploads):
+    """Give back claimed uploads that could not be attached"""
+    ChunkedUpload.objects.filter(id__in=[upload.id for upload in uploads]).update(
+        status=ChunkedUpload.STATUS_COMPLETE,
+        updated_at=timezone.now()
+    )
+
+
+def open_upload(upload):
+    """
+    Open a finished upload as an uploaded file, read in chunks like any other.
+    It carries the content hash computed as the chunks arrived and the path of its file.
+    """
+    uploaded_file = UploadedFile(
+        file=open(upload.path, 'rb'),
+        name=upload.file_name,
+        content_type=upload.content_type,
+        size=upload.size
+    )
+    uploaded_file.content_hash = upload.content_hash
+    uploaded_file.upload_path = upload.path
+    return uploaded_file
+
+
+def discard_upload(upload):
+    """Remove an upload and its temporary file"""
+    if os.path.exists(upload.path):
+        os.remove(upload.path)
+    forget_upload_hash(upload)
+    upload.delete()
+
+
+def expire_uploads(older_than=UPLOAD_EXPIRY):
+    """Remove the uploads left unfinished or unattached, returning how many were removed"""
+    expired = ChunkedUpload.objects.filter(updated_at__lt=timezone.now() - older_than)
+    count = 0
+    for upload in expired:
+        discard_upload(upload)
+        count += 1
+    return count
@@ -1,5 +1,8 @@
 from django.urls import path
-from .views import LoginView, CustomTokenRefreshView, AdminOnlyView, UserOnlyView, UpdateProfileView, user_profile
+from .views import (
+    LoginView, CustomTokenRefreshView, AdminOnlyView, UserOnlyView, UpdateProfileView, user_profile, search_users,
+    start_chunked_upload, chunked_upload_detail, finalize_chunked_upload
+)
 
 app_name = 'accounts'
 
@@ -9,5 +12,9 @@ urlpatterns = [
     path('admin-only/', AdminOnlyView.as_view(), name='admin_only'),
     path('user-only/', UserOnlyView.as_view(), name='user_only'),
     path('profile/', user_profile, name='user-profile'),
-    path('profile/update/', UpdateProfileView.as_view(), name='update_profile')
+    path('profile/update/', UpdateProfileView.as_view(), name='update_profile'),
+    path('search/', search_users, name='user_search'),
+    path('uploads/', start_chunked_upload, name='upload_start'),
+    path('uploads/<uuid:upload_id>/', chunked_upload_detail, name='upload_detail'),
+    path('uploads/<uuid:upload_id>/finalize/', finalize_chunked_upload, name='upload_finalize'),
 ]
\ No newline at end of file
@@ -1,11 +1,18 @@
-from django.shortcuts import render
+import os
+import tempfile
+from django.shortcuts import get_object_or_404, render
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
 from rest_framework_simplejwt.views import TokenRefreshView
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-from .serializers import CustomTokenObtainPairSerializer, UserSerializer
+from .dedup import find_stored_file, new_content_hash, register_stored_file
+from .images import FULL_VARIANT, ImageProcessingError, preprocess_image
+from .models import ChunkedUpload, User
+from .search import match_users
+from .serializers import ChunkedUploadSerializer, CustomTokenObtainPairSerializer, UserSerializer
+from .uploads import ChunkedUploadError, UploadOffsetError, append_chunk, finalize_upload, start_upload
 from .permissions import IsAdminUser, IsRegularUser, IsUserOrAdmin
 from cloudinary.uploader import upload as cloudinary_upload
 from cloudinary.exceptions import Error as CloudinaryError
@@ -13,6 +20,38 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 
 
+def upload_profile_image(uploaded_file):
+    """
+    Resize a profile image and upload its variants to Cloudinary.
+    Returns the URL of the full image and the URLs of the thumbnails by size.
+    An image uploaded before is reused without being processed again.
+    Unlike post media this runs synchronously: the profile update responds with the new image URLs,
+    and a single image is resized in the process pool, so the request waits without holding the GIL.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'profile' + os.path.splitext(uploaded_file.name or '')[1])
+        content_hash = new_content_hash()
+        with open(path, 'wb') as spool:
+            for chunk in uploaded_file.chunks():
+                content_hash.update(chunk)
+                spool.write(chunk)
+        content_hash = content_hash.hexdigest()
+
+        stored_file = find_stored_file(content_hash, 'user_profiles')
+        if stored_file is not None:
+            return stored_file.url, {name: variant['url'] for name, variant in stored_file.variants.items()}
+
+        variants = {}
+        for name, variant in preprocess_image(path).items():
+            upload_result = cloudinary_upload(variant, folder='user_profiles')
+            variants[name] = {'url': upload_result.get('secure_url'), 'public_id': upload_result.get('public_id')}
+
+        full = variants.pop(FULL_VARIANT)
+        register_stored_file(content_hash, 'user_profiles', full['url'], full['public_id'], os.path.getsize(path), variants)
+
+    return full['url'], {name: variant['url'] for name, variant in variants.items()}
+
+
 class LoginView(APIView):
     """
     API view for user login. Accepts either username or email with password.
@@ -104,8 +143,12 @@ class UpdateProfileView(APIView):
         profile_image_url = None
         if 'media' in request.FILES:  # Changed from 'profile_image' to 'media'
             try:
-                upload_result = cloudinary_upload(request.FILES['media'], folder='user_profiles')
-                profile_image_url = upload_result.get('secure_url')
+                profile_image_url, profile_image_variants = upload_profile_image(request.FILES['media'])
+            except ImageProcessingError as e:
+                return Response(
+                    {"error": f"Invalid profile image: {str(e)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             except CloudinaryError as e:
                 return Response(
                     {"error": f"Failed to upload profile image: {str(e)}"},
@@ -119,6 +162,7 @@ class UpdateProfileView(APIView):
         user.dob = data.get('dob', user.dob)
         if profile_image_url:
             user.profile_image = profile_image_url
+            user.profile_image_variants = profile_image_variants
 
         user.save()
 
@@ -134,6 +178,7 @@ class UpdateProfileView(APIView):
                     "bio": user.bio,
                     "dob": user.dob,
                     "profile_image": user.profile_image,
+                    "profile_image_variants": user.profile_image_variants,
                 }
             },
             status=status.HTTP_200_OK
@@ -147,3 +192,91 @@ def user_profile(request):
     user = request.user
     serializer = UserSerializer(user)
     return Response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search_users(request):
+    """Search for users by username, first name or last name, tolerating typos"""
+    query = request.query_params.get('q', '')
+    if not query:
+        return Response(
+            {"error": "Search query parameter 'q' is required"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    users = match_users(User.objects.filter(is_active=True), query)
+    serializer = UserSerializer(users, many=True)
+    return Response(serializer.data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def start_chunked_upload(request):
+    """Start a chunked upload from the name, content type and size of the file"""
+    serializer = ChunkedUploadSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    try:
+        upload = start_upload(request.user, **serializer.validated_data)
+    except ChunkedUploadError as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return Response(ChunkedUploadSerializer(upload).data, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET', 'PATCH'])
+@permission_classes([IsAuthenticated])
+def chunked_upload_detail(request, upload_id):
+    """
+    GET: Get the offset an interrupted upload resumes from.
+    PATCH: Append the raw request body at the offset given in the Upload-Offset header.
+    """
+    upload = get_object_or_404(ChunkedUpload, id=upload_id, user=request.user)
+    if request.method == 'GET':
+        return Response(ChunkedUploadSerializer(upload).data)
+
+    try:
+        offset = int(request.headers['Upload-Offset'])
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except (KeyError, ValueError):
+        return Response(
+            {"error": "The Upload-Offset and Content-Length headers are required"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        # The body is streamed to the file, never read into memory at once
+        upload = append_chunk(upload, offset, request.stream, length)
+    except UploadOffsetError as e:
+        return Response(
+            {"error": str(e), "offset": e.offset},
+            status=status.HTTP_409_CONFLICT
+        )
+    except ChunkedUploadError as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return Response(ChunkedUploadSerializer(upload).data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def finalize_chunked_upload(request, upload_id):
+    """Finalize an upload whose chunks were all sent, so it can be attached to a post or message"""
+    upload = get_object_or_404(ChunkedUpload, id=upload_id, user=request.user)
+    try:
+        upload = finalize_upload(upload)
+    except UploadOffsetError as e:
+        return Response(
+            {"error": f"The upload is missing data: {e}", "offset": e.offset},
+            status=status.HTTP_409_CONFLICT
+        )
+    except ChunkedUploadError as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return Response(ChunkedUploadSerializer(upload).data)
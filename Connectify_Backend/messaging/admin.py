@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (
     Conversation, GroupChat, GroupChatMembership, Message, 
-    MessageReaction, MessageAttachment, MessageReadStatus, UserBlock
+    MessageReaction, MessageAttachment, ChatReadState, UserBlock
 )
 
 @admin.register(Conversation)
@@ -63,10 +63,10 @@ class MessageAttachmentAdmin(admin.ModelAdmin):
     date_hierarchy = 'uploaded_at'
 
 
-@admin.register(MessageReadStatus)
-class MessageReadStatusAdmin(admin.ModelAdmin):
-    list_display = ('id', 'message', 'user', 'read_at')
-    search_fields = ('user__username', 'message__content')
+@admin.register(ChatReadState)
+class ChatReadStateAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'conversation', 'group_chat', 'last_read_id', 'read_at')
+    search_fields = ('user__username',)
     date_hierarchy = 'read_at'
 
 
@@ -0,0 +1,61 @@
+from accounts.dedup import find_stored_file, hash_uploaded_file, register_stored_file
+from accounts.uploads import discard_upload, open_upload, release_uploads
+
+from .models import MessageAttachment
+
+# Kind of upload attachments are stored as in the content table
+ATTACHMENT_FOLDER = 'message_attachments'
+
+# Attachment types named after the first part of a content type, others are documents
+MEDIA_ATTACHMENT_TYPES = ['image', 'video', 'audio']
+
+
+def get_attachment_type(content_type):
+    attachment_type = (content_type or '').split('/')[0]
+    return attachment_type if attachment_type in MEDIA_ATTACHMENT_TYPES else 'document'
+
+
+def add_message_attachments(message, attachments, attachment_types):
+    """
+    Attach uploaded files to a message.
+    A file whose content was attached before reuses the stored copy instead of being uploaded again.
+    """
+    for attachment, attachment_type in zip(attachments, attachment_types):
+        content_hash = hash_uploaded_file(attachment)
+        stored_file = find_stored_file(content_hash, ATTACHMENT_FOLDER)
+        message_attachment = MessageAttachment.objects.create(
+            message=message,
+            # A storage name is saved as is, while an uploaded file is stored first
+            file=stored_file.public_id if stored_file is not None else attachment,
+            attachment_type=attachment_type,
+            file_name=attachment.name,
+            file_size=attachment.size
+        )
+        if stored_file is None:
+            register_stored_file(
+                content_hash,
+                ATTACHMENT_FOLDER,
+                message_attachment.file.url,
+                message_attachment.file.name,
+                attachment.size
+            )
+    
+    if attachments:
+        # Chat lists flag the last message when it has attachments
+        message.get_chat_queryset().filter(last_message_id=message.id).update(last_message_has_attachments=True)
+
+
+def add_message_uploads(message, uploads):
+    """Attach finished chunked uploads to a message, removing them once stored"""
+    files = [open_upload(upload) for upload in uploads]
+    try:
+        add_message_attachments(message, files, [get_attachment_type(file.content_type) for file in files])
+    except Exception:
+        release_uploads(uploads)
+        raise
+    finally:
+        for file in files:
+            file.close()
+
+    for upload in uploads:
+        discard_upload(upload)
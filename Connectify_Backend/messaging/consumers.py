@@ -4,7 +4,8 @@ import asyncio
 from django.utils import timezone
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from .models import Conversation, Message, MessageReadStatus, MessageDeliveryStatus
+from .models import Conversation, Message, MessageDeliveryStatus
+from .reads import mark_messages_read
 
 logger = logging.getLogger(__name__)
 
@@ -394,6 +395,19 @@ class ChatConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             logger.error(f"Error sending read receipt to {self.client_id}: {str(e)}")
     
+    async def media_status(self, event):
+        """Forward post media upload results to the WebSocket"""
+        try:
+            await self.send(text_data=json.dumps({
+                'type': 'media_status',
+                'media_id': event['media_id'],
+                'post_id': event['post_id'],
+                'status': event['status'],
+                'file': event['file']
+            }))
+        except Exception as e:
+            logger.error(f"Error sending media status to {self.client_id}: {str(e)}")
+    
     async def has_access(self):
         """Override in subclasses to check access permissions"""
         return False
@@ -401,16 +415,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
     @database_sync_to_async
     def mark_messages_read(self, message_ids):
         """Mark messages as read by current user"""
-        for message_id in message_ids:
-            try:
-                message = Message.objects.get(id=message_id)
-                if message.sender_id != self.user.id:  # Don't mark own messages
-                    MessageReadStatus.objects.get_or_create(
-                        message=message,
-                        user=self.user
-                    )
-            except Message.DoesNotExist:
-                logger.warning(f"Message {message_id} not found for read status")
+        mark_messages_read(self.user, message_ids)
 
     async def handle_typing(self, data):
         """Handle typing indicator from client"""
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.db.models import Prefetch
+
+from .models import MessageDeliveryStatus, MessageReaction
+
+# Latest messages included in conversation and group chat details
+DETAIL_MESSAGES = getattr(settings, 'MESSAGING_DETAIL_MESSAGES', 20)
+
+# Reactions shown with each message
+MESSAGE_INLINE_REACTIONS = 10
+
+
+def with_message_details(messages):
+    """Load what MessageSerializer shows along with messages, in a fixed number of queries"""
+    return messages.select_related(
+        'sender',
+        'reply_to__sender'
+    ).prefetch_related(
+        'attachments',
+        'reply_to__attachments',
+        Prefetch(
+            'reactions',
+            queryset=MessageReaction.objects.select_related('user').order_by('-created_at', '-id')[:MESSAGE_INLINE_REACTIONS],
+            to_attr='latest_reactions'
+        ),
+        Prefetch(
+            'messagedeliverystatus_set',
+            queryset=MessageDeliveryStatus.objects.order_by('-timestamp', '-id')[:1],
+            to_attr='latest_delivery_statuses'
+        )
+    )
+
+
+def get_latest_messages(chat, limit=DETAIL_MESSAGES):
+    """
+    Get the latest messages of a conversation or group chat, newest first, along with
+    the ID to pass as ?before= to the messages endpoint for older ones, if there are any.
+    """
+    messages = list(with_message_details(chat.messages.order_by('-id'))[:limit + 1])
+    if len(messages) > limit:
+        messages = messages[:limit]
+        return messages, messages[-1].id
+    return messages, None
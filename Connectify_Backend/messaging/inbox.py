@@ -0,0 +1,97 @@
+import base64
+from django.conf import settings
+from django.db.models import BooleanField, OuterRef, Q, Subquery, Value
+from django.db.models import prefetch_related_objects
+from django.db.models.functions import Coalesce
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+
+from .models import Conversation, GroupChat, GroupChatMembership
+from .reads import annotate_unread_counts
+
+# Chats per inbox page, and the most a client may ask for
+INBOX_PAGE_SIZE = getattr(settings, 'MESSAGING_INBOX_PAGE_SIZE', 20)
+INBOX_MAX_PAGE_SIZE = 50
+
+# Order of chats updated at the same time, so that every chat has a single place in the inbox
+INBOX_TYPES = ['conversation', 'group_chat']
+
+
+def get_inbox_type(chat):
+    return 'conversation' if isinstance(chat, Conversation) else 'group_chat'
+
+
+def get_inbox_chats(user):
+    """Get the active conversations and group chats of a user, with all an inbox row shows"""
+    conversations = annotate_unread_counts(Conversation.objects.filter(
+        participants=user,
+        is_active=True
+    ), user).annotate(
+        # Conversations cannot be muted
+        is_muted=Value(False, output_field=BooleanField())
+    )
+    group_chats = annotate_unread_counts(GroupChat.objects.filter(
+        members=user,
+        is_active=True
+    ), user).annotate(
+        is_muted=Coalesce(Subquery(
+            GroupChatMembership.objects.filter(group_chat=OuterRef('pk'), user=user).values('is_muted')[:1]
+        ), Value(False))
+    )
+    return [
+        chats.select_related('last_message__sender').defer('last_message__content')
+        for chats in (conversations, group_chats)
+    ]
+
+
+def seek_inbox_chats(chats, inbox_type, cursor):
+    """Filter chats of one type down to those after the cursor in inbox order"""
+    timestamp, cursor_type, pk = cursor
+    rank, cursor_rank = INBOX_TYPES.index(inbox_type), INBOX_TYPES.index(cursor_type)
+    if rank < cursor_rank:
+        return chats.filter(updated_at__lte=timestamp)
+    if rank > cursor_rank:
+        return chats.filter(updated_at__lt=timestamp)
+    return chats.filter(Q(updated_at__lt=timestamp) | Q(updated_at=timestamp, id__lt=pk))
+
+
+def get_inbox_page(user, cursor=None, page_size=INBOX_PAGE_SIZE):
+    """
+    Get a page of the inbox of a user, most recently active chats first, along with
+    the cursor of the next page. Conversations and group chats are each read with one
+    keyset query of at most a page, whatever the number of chats, then merged.
+    """
+    rows = []
+    for inbox_type, chats in zip(INBOX_TYPES, get_inbox_chats(user)):
+        if cursor:
+            chats = seek_inbox_chats(chats, inbox_type, cursor)
+        rows += chats.order_by('-updated_at', '-id')[:page_size + 1]
+
+    rows.sort(key=lambda chat: (chat.updated_at, INBOX_TYPES.index(get_inbox_type(chat)), chat.id), reverse=True)
+    page, rest = rows[:page_size], rows[page_size:]
+    next_cursor = encode_inbox_cursor(page[-1]) if rest else None
+
+    # Conversations are shown by their participants
+    prefetch_related_objects([chat for chat in page if isinstance(chat, Conversation)], 'participants')
+    return page, next_cursor
+
+
+def encode_inbox_cursor(chat):
+    raw = f"{chat.updated_at.isoformat()}|{get_inbox_type(chat)}|{chat.id}"
+    return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+
+def decode_inbox_cursor(encoded):
+    """Get the position a cursor points at in the inbox, as (updated_at, type, id)"""
+    if not encoded:
+        return None
+
+    try:
+        raw = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii')
+        timestamp, inbox_type, pk = raw.split('|')
+        timestamp = parse_datetime(timestamp)
+        if timestamp is None or inbox_type not in INBOX_TYPES:
+            raise ValueError(raw)
+        return timestamp, inbox_type, int(pk)
+    except (TypeError, ValueError, UnicodeError):
+        raise NotFound('Invalid cursor')
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from messaging.reads import reconcile_unread_counts
+
+class Command(BaseCommand):
+    help = 'Recomputes the unread message counters of chat members from their messages and read watermarks'
+
+    def handle(self, *args, **options):
+        created, corrected = reconcile_unread_counts()
+        self.stdout.write(self.style.SUCCESS(f'Created {created} read states and corrected {corrected} unread counts'))
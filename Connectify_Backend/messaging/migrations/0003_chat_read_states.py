@@ -0,0 +1,62 @@
+# Generated by Django 5.1.7 on 2026-10-17 06:58
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def backfill_read_states(apps, schema_editor):
+    """Turn the per-message read rows of each user and chat into a watermark at the latest message read"""
+    MessageReadStatus = apps.get_model('messaging', 'MessageReadStatus')
+    ChatReadState = apps.get_model('messaging', 'ChatReadState')
+    latest = MessageReadStatus.objects.values(
+        'user_id', 'message__conversation_id', 'message__group_chat_id'
+    ).annotate(
+        last_read_id=Max('message_id'),
+        read_at=Max('read_at')
+    ).order_by()
+
+    batch = []
+    for row in latest.iterator():
+        batch.append(ChatReadState(
+            user_id=row['user_id'],
+            conversation_id=row['message__conversation_id'],
+            group_chat_id=row['message__group_chat_id'],
+            last_read_id=row['last_read_id'],
+            read_at=row['read_at']
+        ))
+        if len(batch) >= 1000:
+            ChatReadState.objects.bulk_create(batch)
+            batch = []
+    ChatReadState.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0002_alter_message_options_message_delivered_at_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatReadState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_id', models.PositiveBigIntegerField(default=0)),
+                ('read_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('conversation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='read_states', to='messaging.conversation')),
+                ('group_chat', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='read_states', to='messaging.groupchat')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_read_states', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'conversation'), ('user', 'group_chat')},
+            },
+        ),
+        migrations.RunPython(backfill_read_states, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='MessageReadStatus',
+        ),
+    ]
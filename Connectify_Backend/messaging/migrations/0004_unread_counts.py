@@ -0,0 +1,55 @@
+# Generated by Django 5.1.7 on 2026-10-17 07:01
+
+from django.db import migrations, models
+from django.db.models import Count, Exists, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_unread_counts(apps, schema_editor):
+    """
+    Start the read states missing for chat members, then count the messages sent by
+    others after each watermark, as reconcile_unread_counts does.
+    """
+    ChatReadState = apps.get_model('messaging', 'ChatReadState')
+    Conversation = apps.get_model('messaging', 'Conversation')
+    GroupChatMembership = apps.get_model('messaging', 'GroupChatMembership')
+    Message = apps.get_model('messaging', 'Message')
+
+    participants = Conversation.participants.through.objects.exclude(Exists(
+        ChatReadState.objects.filter(user_id=OuterRef('user_id'), conversation_id=OuterRef('conversation_id'))
+    ))
+    memberships = GroupChatMembership.objects.exclude(Exists(
+        ChatReadState.objects.filter(user_id=OuterRef('user_id'), group_chat_id=OuterRef('group_chat_id'))
+    ))
+    missing = [
+        ChatReadState(user_id=row.user_id, conversation_id=row.conversation_id)
+        for row in participants.iterator()
+    ] + [
+        ChatReadState(user_id=row.user_id, group_chat_id=row.group_chat_id)
+        for row in memberships.iterator()
+    ]
+    ChatReadState.objects.bulk_create(missing, batch_size=1000, ignore_conflicts=True)
+
+    for chat_field in ('conversation_id', 'group_chat_id'):
+        ChatReadState.objects.filter(**{f'{chat_field}__isnull': False}).update(unread_count=Coalesce(Subquery(
+            Message.objects.filter(
+                **{chat_field: OuterRef(chat_field)},
+                id__gt=OuterRef('last_read_id')
+            ).exclude(sender_id=OuterRef('user_id')).order_by().values(chat_field).annotate(total=Count('id')).values('total')
+        ), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0003_chat_read_states'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatreadstate',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_unread_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.1.7 on 2026-10-17 07:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Left
+
+
+def backfill_last_messages(apps, schema_editor):
+    """Point every chat at its latest message, with the preview of it"""
+    Message = apps.get_model('messaging', 'Message')
+    MessageAttachment = apps.get_model('messaging', 'MessageAttachment')
+    for model_name, chat_field in (('Conversation', 'conversation'), ('GroupChat', 'group_chat')):
+        chats = apps.get_model('messaging', model_name).objects.all()
+        latest = Message.objects.filter(**{chat_field: OuterRef('pk')}).order_by('-id')
+        chats.update(
+            last_message_id=Subquery(latest.values('id')[:1]),
+            last_message_preview=Coalesce(Left(Subquery(latest.values('content')[:1]), 100), Value(''))
+        )
+        chats.filter(last_message__isnull=False).update(
+            last_message_has_attachments=Exists(MessageAttachment.objects.filter(message_id=OuterRef('last_message_id')))
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0004_unread_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='messaging.message'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_has_attachments',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_preview',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='groupchat',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='messaging.message'),
+        ),
+        migrations.AddField(
+            model_name='groupchat',
+            name='last_message_has_attachments',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='groupchat',
+            name='last_message_preview',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.RunPython(backfill_last_messages, migrations.RunPython.noop),
+    ]
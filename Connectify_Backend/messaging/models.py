@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
 from django.conf import settings
 from django.utils import timezone
 from organizations.models import Organization
@@ -17,6 +18,16 @@ class Conversation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
+    # Denormalized last message, so chat lists need no query per chat to show it
+    last_message = models.ForeignKey(
+        'Message',
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True
+    )
+    last_message_preview = models.CharField(max_length=100, blank=True)
+    last_message_has_attachments = models.BooleanField(default=False)
     
     class Meta:
         ordering = ['-updated_at']
@@ -52,6 +63,16 @@ class GroupChat(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
     avatar = models.ImageField(upload_to='group_chat_avatars/', blank=True, null=True)
+    # Denormalized last message, so chat lists need no query per chat to show it
+    last_message = models.ForeignKey(
+        'Message',
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True
+    )
+    last_message_preview = models.CharField(max_length=100, blank=True)
+    last_message_has_attachments = models.BooleanField(default=False)
     
     class Meta:
         ordering = ['-updated_at']
@@ -134,20 +155,49 @@ class Message(models.Model):
     
     def save(self, *args, **kwargs):
         # Ensure message belongs to either a conversation or a group chat, not both
-        if self.conversation and self.group_chat:
+        if self.conversation_id and self.group_chat_id:
             raise ValueError("Message cannot belong to both a conversation and a group chat")
-        if not self.conversation and not self.group_chat:
+        if not self.conversation_id and not self.group_chat_id:
             raise ValueError("Message must belong to either a conversation or a group chat")
         
-        # Update the parent's updated_at timestamp
-        if self.conversation:
-            self.conversation.updated_at = self.created_at
-            self.conversation.save(update_fields=['updated_at'])
-        elif self.group_chat:
-            self.group_chat.updated_at = self.created_at
-            self.group_chat.save(update_fields=['updated_at'])
+        created = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        with transaction.atomic():
+            super().save(*args, **kwargs)
             
-        super().save(*args, **kwargs)
+            # Update the parent's updated_at timestamp, and its last message along with the insert
+            chat = self.get_chat_queryset()
+            if created:
+                self.update_chat(
+                    chat.filter(Q(last_message__isnull=True) | Q(last_message_id__lt=self.pk)),
+                    updated_at=self.created_at,
+                    last_message=self,
+                    last_message_preview=self.get_preview(),
+                    last_message_has_attachments=False
+                )
+            else:
+                self.update_chat(chat, updated_at=timezone.now())
+                if update_fields is None or 'content' in update_fields:
+                    self.update_chat(chat.filter(last_message_id=self.pk), last_message_preview=self.get_preview())
+    
+    def get_preview(self):
+        return self.content[:100]  # Truncate long messages
+    
+    def get_chat_queryset(self):
+        """Get a queryset selecting the conversation or group chat of the message"""
+        if self.conversation_id:
+            return Conversation.objects.filter(pk=self.conversation_id)
+        return GroupChat.objects.filter(pk=self.group_chat_id)
+    
+    def update_chat(self, chat, **values):
+        """Update the chat of the message, and its instance when loaded along with the message"""
+        if not chat.update(**values):
+            return
+        field = 'conversation' if self.conversation_id else 'group_chat'
+        if self._meta.get_field(field).is_cached(self):
+            parent = getattr(self, field)
+            for name, value in values.items():
+                setattr(parent, name, value)
 
 
 class MessageReaction(models.Model):
@@ -197,19 +247,42 @@ class MessageAttachment(models.Model):
         return f"{self.attachment_type} attachment for message {self.message.id}"
 
 
-class MessageReadStatus(models.Model):
+class ChatReadState(models.Model):
     """
-    Model to track which users have read which messages.
+    Model tracking how far a user has read a conversation or group chat.
+    Every message up to the last read one counts as read, so reading a chat
+    moves a single watermark instead of writing a row per message.
     """
-    message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name='read_status')
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='read_messages')
-    read_at = models.DateTimeField(auto_now_add=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='chat_read_states')
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.CASCADE,
+        related_name='read_states',
+        null=True,
+        blank=True
+    )
+    group_chat = models.ForeignKey(
+        GroupChat,
+        on_delete=models.CASCADE,
+        related_name='read_states',
+        null=True,
+        blank=True
+    )
+    # ID of the latest message read. Message IDs grow as messages are sent, and the
+    # plain ID keeps the watermark in place when that message is deleted
+    last_read_id = models.PositiveBigIntegerField(default=0)
+    read_at = models.DateTimeField(default=timezone.now)
+    
+    # Counter for performance optimization: messages by others after the watermark
+    unread_count = models.PositiveIntegerField(default=0)
     
     class Meta:
-        unique_together = ['message', 'user']
+        unique_together = [['user', 'conversation'], ['user', 'group_chat']]
     
     def __str__(self):
-        return f"Message {self.message.id} read by {self.user.username}"
+        chat_type = "conversation" if self.conversation_id else "group"
+        chat_id = self.conversation_id or self.group_chat_id
+        return f"{self.user.username} read {chat_type} {chat_id} up to message {self.last_read_id}"
 
 
 class UserBlock(models.Model):
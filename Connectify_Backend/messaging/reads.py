@@ -0,0 +1,197 @@
+from django.db import transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ChatReadState, Conversation, GroupChatMembership, Message
+
+
+def get_chat_lookup(chat):
+    """Get the lookup selecting the rows of a conversation or group chat"""
+    if isinstance(chat, Conversation):
+        return {'conversation_id': chat.pk}
+    return {'group_chat_id': chat.pk}
+
+
+def get_message_chat_lookup(message):
+    """Get the lookup selecting the rows of the chat a message was sent in"""
+    if message.conversation_id:
+        return {'conversation_id': message.conversation_id}
+    return {'group_chat_id': message.group_chat_id}
+
+
+def get_unread_after(user_id, lookup, message_id):
+    """Get an expression counting the messages of a chat sent by others after a message"""
+    chat_field = next(iter(lookup))
+    return Coalesce(Subquery(
+        Message.objects.filter(
+            **lookup,
+            id__gt=message_id
+        ).exclude(sender_id=user_id).order_by().values(chat_field).annotate(total=Count('id')).values('total')
+    ), Value(0))
+
+
+def advance_watermark(user, lookup, message_id):
+    """
+    Move the read watermark of a user in a chat up to a message, recounting what is left unread.
+    Only the read states of members exist, as membership signals create them, so users
+    outside the chat move nothing. It never moves back, so reading older messages again
+    changes nothing. Returns whether it moved.
+    """
+    with transaction.atomic():
+        # Locking the state first makes the increments of messages sent meanwhile wait, and the
+        # recount that follows sees every message committed before it, so none is counted twice or lost
+        state = ChatReadState.objects.select_for_update().filter(
+            user=user,
+            **lookup,
+            last_read_id__lt=message_id
+        ).values_list('pk', flat=True).first()
+        if state is None:
+            return False
+
+        ChatReadState.objects.filter(pk=state).update(
+            last_read_id=message_id,
+            read_at=timezone.now(),
+            unread_count=get_unread_after(user.pk, lookup, message_id)
+        )
+    return True
+
+
+def mark_chat_read(user, chat):
+    """Mark every message of a conversation or group chat as read by a user"""
+    lookup = get_chat_lookup(chat)
+    last_id = Message.objects.filter(**lookup).order_by('-id').values_list('id', flat=True).first()
+    if last_id is None:
+        return False
+    return advance_watermark(user, lookup, last_id)
+
+
+def mark_message_read(user, message):
+    """Mark a message shown to a user as read, along with every earlier message of its chat"""
+    if message.sender_id == user.pk:
+        return False
+    return advance_watermark(user, get_message_chat_lookup(message), message.id)
+
+
+def mark_messages_read(user, message_ids):
+    """Mark the given messages as read, moving the watermark of each chat they belong to once"""
+    latest = Message.objects.filter(
+        Q(conversation__participants=user) | Q(group_chat__members=user),
+        id__in=message_ids
+    ).exclude(sender=user).values('conversation_id', 'group_chat_id').annotate(last_id=Max('id'))
+    for row in latest:
+        if row['conversation_id']:
+            lookup = {'conversation_id': row['conversation_id']}
+        else:
+            lookup = {'group_chat_id': row['group_chat_id']}
+        advance_watermark(user, lookup, row['last_id'])
+
+
+def count_unread(user, chat):
+    """Get the number of messages of a chat the user has not read yet"""
+    unread_count = ChatReadState.objects.filter(
+        user=user,
+        **get_chat_lookup(chat)
+    ).values_list('unread_count', flat=True).first()
+    return unread_count or 0
+
+
+def annotate_unread_counts(chats, user):
+    """Annotate conversations or group chats with the unread counter of a user, read in the same query"""
+    chat_field = 'conversation' if chats.model is Conversation else 'group_chat'
+    return chats.annotate(unread_count=Coalesce(Subquery(
+        ChatReadState.objects.filter(user=user, **{chat_field: OuterRef('pk')}).values('unread_count')[:1]
+    ), Value(0)))
+
+
+def count_sent_message(message):
+    """Count a new message as unread for every member of its chat but its sender"""
+    ChatReadState.objects.filter(
+        **get_message_chat_lookup(message)
+    ).exclude(user_id=message.sender_id).update(unread_count=F('unread_count') + 1)
+
+
+def add_chat_members(lookup, user_ids):
+    """Start the read states of users joining a chat, which count its earlier messages as read"""
+    last_id = Message.objects.filter(**lookup).order_by('-id').values_list('id', flat=True).first() or 0
+    ChatReadState.objects.bulk_create(
+        [ChatReadState(user_id=user_id, last_read_id=last_id, **lookup) for user_id in user_ids],
+        ignore_conflicts=True
+    )
+
+
+def remove_chat_members(lookup, user_ids=None):
+    """Drop the read states of users leaving a chat, or of all its members"""
+    states = ChatReadState.objects.filter(**lookup)
+    if user_ids is not None:
+        states = states.filter(user_id__in=user_ids)
+    states.delete()
+
+
+def reconcile_unread_counts():
+    """
+    Recompute the unread counters from the messages and watermarks, starting the
+    read states missing for chat members. Returns how many were created and corrected.
+    """
+    participants = Conversation.participants.through.objects.exclude(Exists(
+        ChatReadState.objects.filter(user_id=OuterRef('user_id'), conversation_id=OuterRef('conversation_id'))
+    ))
+    memberships = GroupChatMembership.objects.exclude(Exists(
+        ChatReadState.objects.filter(user_id=OuterRef('user_id'), group_chat_id=OuterRef('group_chat_id'))
+    ))
+    missing = [
+        ChatReadState(user_id=row.user_id, conversation_id=row.conversation_id)
+        for row in participants.iterator()
+    ] + [
+        ChatReadState(user_id=row.user_id, group_chat_id=row.group_chat_id)
+        for row in memberships.iterator()
+    ]
+    ChatReadState.objects.bulk_create(missing, batch_size=1000, ignore_conflicts=True)
+
+    corrected = 0
+    for chat_field in ('conversation_id', 'group_chat_id'):
+        actual = Coalesce(Subquery(
+            Message.objects.filter(
+                **{chat_field: OuterRef(chat_field)},
+                id__gt=OuterRef('last_read_id')
+            ).exclude(sender_id=OuterRef('user_id')).order_by().values(chat_field).annotate(total=Count('id')).values('total')
+        ), Value(0))
+        drifted = ChatReadState.objects.filter(
+            **{f'{chat_field}__isnull': False}
+        ).annotate(actual=actual).exclude(unread_count=F('actual')).only('id')
+
+        batch = []
+        for state in drifted.iterator():
+            state.unread_count = state.actual
+            batch.append(state)
+            if len(batch) >= 1000:
+                ChatReadState.objects.bulk_update(batch, ['unread_count'])
+                corrected += len(batch)
+                batch = []
+        ChatReadState.objects.bulk_update(batch, ['unread_count'])
+        corrected += len(batch)
+    return len(missing), corrected
+
+
+def get_chat_read_states(chat):
+    """Get the watermarks of everyone who read part of a chat, to tell who read each of its messages"""
+    return list(ChatReadState.objects.filter(
+        **get_chat_lookup(chat),
+        last_read_id__gt=0
+    ).select_related('user'))
+
+
+def get_message_readers(message, read_states=None):
+    """
+    Get the read states of the users who read a message, other than its sender.
+    Loaded for the message alone when the read states of its chat are not given.
+    """
+    if read_states is None:
+        read_states = ChatReadState.objects.filter(
+            **get_message_chat_lookup(message),
+            last_read_id__gte=message.id
+        ).select_related('user')
+    return [
+        state for state in read_states
+        if state.last_read_id >= message.id and state.user_id != message.sender_id
+    ]
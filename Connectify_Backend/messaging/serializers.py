@@ -3,9 +3,11 @@ from django.contrib.auth import get_user_model
 from organizations.models import Organization
 from .models import (
     Conversation, GroupChat, GroupChatMembership, Message, 
-    MessageReaction, MessageAttachment, MessageReadStatus, UserBlock,
+    MessageReaction, MessageAttachment, ChatReadState, UserBlock,
     MessageDeliveryStatus
 )
+from .history import MESSAGE_INLINE_REACTIONS, get_latest_messages
+from .reads import count_unread, get_chat_read_states, get_message_readers
 
 User = get_user_model()
 
@@ -47,12 +49,12 @@ class MessageReactionSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class MessageReadStatusSerializer(serializers.ModelSerializer):
-    """Serializer for message read status"""
+class ChatReadStateSerializer(serializers.ModelSerializer):
+    """Serializer for how far a user has read a chat"""
     user = UserMinimalSerializer(read_only=True)
     
     class Meta:
-        model = MessageReadStatus
+        model = ChatReadState
         fields = ['id', 'user', 'read_at']
         read_only_fields = ['id', 'read_at']
 
@@ -85,19 +87,28 @@ class MessageSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'sender', 'created_at', 'updated_at', 'reaction_count']
     
     def get_reactions(self, obj):
-        # Return only the first few reactions to avoid large payloads
-        reactions = obj.reactions.all()[:10]
+        # Return only the first few reactions to avoid large payloads;
+        # message lists prefetch them
+        if hasattr(obj, 'latest_reactions'):
+            reactions = obj.latest_reactions
+        else:
+            reactions = obj.reactions.all()[:MESSAGE_INLINE_REACTIONS]
         return MessageReactionSerializer(reactions, many=True).data
     
     def get_read_by(self, obj):
-        # Return users who have read this message
-        read_statuses = obj.read_status.all()
-        return MessageReadStatusSerializer(read_statuses, many=True).data
+        # Users whose read watermark passed this message; views listing messages
+        # load the watermarks of the chat once and pass them as read_states
+        readers = get_message_readers(obj, self.context.get('read_states'))
+        return ChatReadStateSerializer(readers, many=True).data
     
     def get_delivery_status(self, obj):
-        latest_status = MessageDeliveryStatus.objects.filter(
-            message=obj
-        ).order_by('-timestamp').first()
+        # Message lists prefetch the latest status of each message
+        if hasattr(obj, 'latest_delivery_statuses'):
+            latest_status = next(iter(obj.latest_delivery_statuses), None)
+        else:
+            latest_status = MessageDeliveryStatus.objects.filter(
+                message=obj
+            ).order_by('-timestamp').first()
         if latest_status:
             return MessageDeliveryStatusSerializer(latest_status).data
         return None
@@ -126,10 +137,16 @@ class MessageCreateSerializer(serializers.ModelSerializer):
         required=False,
         write_only=True
     )
+    # Finished chunked uploads, attached after the files sent with the message
+    upload_ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        required=False,
+        write_only=True
+    )
     
     class Meta:
         model = Message
-        fields = ['content', 'reply_to', 'attachments', 'attachment_types']
+        fields = ['content', 'reply_to', 'attachments', 'attachment_types', 'upload_ids']
     
     def validate(self, data):
         # Validate that if attachments are provided, attachment_types must be provided too
@@ -148,6 +165,24 @@ class MessageCreateSerializer(serializers.ModelSerializer):
         return data
 
 
+def get_last_message_preview(chat):
+    """
+    Get the preview of the last message of a conversation or group chat, from the
+    pointer and snapshot kept on the chat. Lists load them with select_related.
+    """
+    last_message = chat.last_message
+    if last_message is None:
+        return None
+    return {
+        'id': last_message.id,
+        'sender': UserMinimalSerializer(last_message.sender).data,
+        'content': chat.last_message_preview,
+        'created_at': last_message.created_at,
+        'is_deleted': last_message.is_deleted,
+        'has_attachments': chat.last_message_has_attachments
+    }
+
+
 class ConversationSerializer(serializers.ModelSerializer):
     """Serializer for conversations"""
     participants = UserMinimalSerializer(many=True, read_only=True)
@@ -163,67 +198,55 @@ class ConversationSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
     
-        def get_last_message(self, obj):
-            # Get the most recent message in the group chat
-            last_message = obj.messages.order_by('-created_at').first()
-            if last_message:
-                return {
-                    'id': last_message.id,
-                    'sender': UserMinimalSerializer(last_message.sender).data,
-                    'content': last_message.content[:100],  # Truncate long messages
-                    'created_at': last_message.created_at,
-                    'is_deleted': last_message.is_deleted,
-                    'has_attachments': last_message.attachments.exists()
-                }
-            return None
-
-        def get_unread_count(self, obj):
-            request = self.context.get('request')
-            if not request or not request.user:
-                return 0
-            
-            return obj.messages.exclude(
-                read_status__user=request.user
-            ).count()
-
-        def get_user_role(self, obj):
-            request = self.context.get('request')
-            if not request or not request.user:
-                return None
-            
-            membership = obj.memberships.filter(user=request.user).first()
-            if membership:
-                return membership.role
-            return None
-
-        def get_avatar_url(self, obj):
-            # Placeholder method: can be customized to return an actual group avatar
-            return obj.avatar.url if obj.avatar else None
-
+    def get_last_message(self, obj):
+        return get_last_message_preview(obj)
+    
     def get_unread_count(self, obj):
-        # Get count of unread messages for the current user
+        # Lists annotate the counter of the current user along with the conversations
+        if hasattr(obj, 'unread_count'):
+            return obj.unread_count
         request = self.context.get('request')
         if not request or not request.user:
             return 0
         
-        # Count messages that don't have a read status for this user
-        return obj.messages.exclude(
-            read_status__user=request.user
-        ).count()
+        return count_unread(request.user, obj)
 
 
-class ConversationDetailSerializer(ConversationSerializer):
-    """Detailed serializer for conversations including messages"""
-    messages = serializers.SerializerMethodField()
+class LatestMessagesMixin:
+    """
+    Include the latest messages of a chat in its details, with the ID to pass as
+    ?before= to its messages endpoint for older ones. Messages given in the context
+    are shown instead.
+    """
     
-    class Meta(ConversationSerializer.Meta):
-        fields = ConversationSerializer.Meta.fields + ['messages']
+    def get_message_page(self, obj):
+        # Loaded once for both fields
+        if not hasattr(self, '_message_pages'):
+            self._message_pages = {}
+        pages = self._message_pages
+        if obj.pk not in pages:
+            if 'messages' in self.context:
+                pages[obj.pk] = (self.context['messages'], None)
+            else:
+                pages[obj.pk] = get_latest_messages(obj)
+        return pages[obj.pk]
     
     def get_messages(self, obj):
-        # Get paginated messages for the conversation
-        # The actual pagination is handled in the view
-        messages = self.context.get('messages', obj.messages.all())
-        return MessageSerializer(messages, many=True).data
+        messages = self.get_message_page(obj)[0]
+        context = {'read_states': get_chat_read_states(obj)}
+        return MessageSerializer(messages, many=True, context=context).data
+    
+    def get_messages_before(self, obj):
+        return self.get_message_page(obj)[1]
+
+
+class ConversationDetailSerializer(LatestMessagesMixin, ConversationSerializer):
+    """Detailed serializer for conversations including their latest messages"""
+    messages = serializers.SerializerMethodField()
+    messages_before = serializers.SerializerMethodField()
+    
+    class Meta(ConversationSerializer.Meta):
+        fields = ConversationSerializer.Meta.fields + ['messages', 'messages_before']
 
 
 class ConversationCreateSerializer(serializers.Serializer):
@@ -301,35 +324,26 @@ class GroupChatSerializer(serializers.ModelSerializer):
         return obj.members.count()
     
     def get_last_message(self, obj):
-        # Get the most recent message in the group chat
-        last_message = obj.messages.order_by('-created_at').first()
-        if last_message:
-            return {
-                'id': last_message.id,
-                'sender': UserMinimalSerializer(last_message.sender).data,
-                'content': last_message.content[:100],  # Truncate long messages
-                'created_at': last_message.created_at,
-                'is_deleted': last_message.is_deleted,
-                'has_attachments': last_message.attachments.exists()
-            }
-        return None
+        return get_last_message_preview(obj)
     
     def get_unread_count(self, obj):
-        # Get count of unread messages for the current user
-        user = self.context.get('request').user
-        if not user:
+        # Lists annotate the counter of the current user along with the group chats
+        if hasattr(obj, 'unread_count'):
+            return obj.unread_count
+        request = self.context.get('request')
+        if not request or not request.user:
             return 0
         
-        # Count messages that don't have a read status for this user
-        return obj.messages.exclude(
-            read_status__user=user
-        ).count()
+        return count_unread(request.user, obj)
     
     def get_user_role(self, obj):
-        # Get the role of the current user in this group chat
-        user = self.context.get('request').user
-        if not user:
+        # Lists annotate the role of the current user along with the group chats
+        if hasattr(obj, 'user_role'):
+            return obj.user_role
+        request = self.context.get('request')
+        if not request or not request.user:
             return None
+        user = request.user
         
         try:
             membership = GroupChatMembership.objects.get(group_chat=obj, user=user)
@@ -341,23 +355,18 @@ class GroupChatSerializer(serializers.ModelSerializer):
         return obj.avatar.url if obj.avatar else None
 
 
-class GroupChatDetailSerializer(GroupChatSerializer):
-    """Detailed serializer for group chats including messages and members"""
+class GroupChatDetailSerializer(LatestMessagesMixin, GroupChatSerializer):
+    """Detailed serializer for group chats including their latest messages and members"""
     messages = serializers.SerializerMethodField()
+    messages_before = serializers.SerializerMethodField()
     members = serializers.SerializerMethodField()
     
     class Meta(GroupChatSerializer.Meta):
-        fields = GroupChatSerializer.Meta.fields + ['messages', 'members']
-    
-    def get_messages(self, obj):
-        # Get paginated messages for the group chat
-        # The actual pagination is handled in the view
-        messages = self.context.get('messages', obj.messages.all())
-        return MessageSerializer(messages, many=True).data
+        fields = GroupChatSerializer.Meta.fields + ['messages', 'messages_before', 'members']
     
     def get_members(self, obj):
         # Get all members with their roles
-        memberships = GroupChatMembership.objects.filter(group_chat=obj)
+        memberships = GroupChatMembership.objects.filter(group_chat=obj).select_related('user')
         return GroupChatMembershipSerializer(memberships, many=True).data
 
 
@@ -386,12 +395,12 @@ class GroupChatCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Organization not found")
         
         # Check if creator belongs to the organization
-        if not organization.members.filter(id=user.id).exists():
+        if not organization.users.filter(id=user.id).exists():
             raise serializers.ValidationError("You don't belong to this organization")
         
         # Check if all members belong to the organization
         for member_id in member_ids:
-            if not organization.members.filter(id=member_id).exists():
+            if not organization.users.filter(id=member_id).exists():
                 raise serializers.ValidationError(f"User with ID {member_id} doesn't belong to this organization")
         
         # Check if any member has blocked the creator
@@ -408,6 +417,39 @@ class GroupChatCreateSerializer(serializers.ModelSerializer):
         return data
 
 
+class InboxItemSerializer(serializers.Serializer):
+    """Serializer for the conversations and group chats of the inbox, told apart by type"""
+    type = serializers.SerializerMethodField()
+    id = serializers.IntegerField(read_only=True)
+    name = serializers.SerializerMethodField()
+    avatar_url = serializers.SerializerMethodField()
+    participants = serializers.SerializerMethodField()
+    organization_id = serializers.IntegerField(read_only=True)
+    updated_at = serializers.DateTimeField(read_only=True)
+    last_message = serializers.SerializerMethodField()
+    unread_count = serializers.IntegerField(read_only=True)
+    is_muted = serializers.BooleanField(read_only=True)
+    
+    def get_type(self, obj):
+        return 'conversation' if isinstance(obj, Conversation) else 'group_chat'
+    
+    def get_name(self, obj):
+        return getattr(obj, 'name', None)
+    
+    def get_avatar_url(self, obj):
+        avatar = getattr(obj, 'avatar', None)
+        return avatar.url if avatar else None
+    
+    def get_participants(self, obj):
+        # Group chats show their name instead of their members
+        if not isinstance(obj, Conversation):
+            return None
+        return UserMinimalSerializer(obj.participants.all(), many=True).data
+    
+    def get_last_message(self, obj):
+        return get_last_message_preview(obj)
+
+
 class UserBlockSerializer(serializers.ModelSerializer):
     """Serializer for user blocks"""
     blocker = UserMinimalSerializer(read_only=True)
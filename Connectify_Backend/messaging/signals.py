@@ -1,8 +1,11 @@
-from django.db.models.signals import post_save
+from django.db.models import Exists, QuerySet, Subquery, Value
+from django.db.models.functions import Coalesce, Left
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
-from .models import Message, MessageDeliveryStatus
+from .models import Conversation, GroupChat, GroupChatMembership, Message, MessageAttachment, MessageDeliveryStatus
+from .reads import add_chat_members, count_sent_message, get_message_chat_lookup, remove_chat_members
 
 @receiver(post_save, sender=MessageDeliveryStatus)
 def notify_message_status(sender, instance, created, **kwargs):
@@ -18,3 +21,61 @@ def notify_message_status(sender, instance, created, **kwargs):
                 "timestamp": instance.timestamp.isoformat()
             }
         )
+
+
+@receiver(post_save, sender=Message)
+def count_unread_on_send(sender, instance, created, **kwargs):
+    """Add a new message to the unread counters of the other members of its chat"""
+    if created:
+        count_sent_message(instance)
+
+
+@receiver(post_delete, sender=Message)
+def repoint_last_message_on_delete(sender, instance, origin=None, **kwargs):
+    """Point a chat whose last message was deleted at the message before it, with its preview"""
+    # Messages deleted along with their chat leave nothing to point at
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model in (Conversation, GroupChat):
+        return
+
+    # The deletion set the pointer of the chat to null, earlier in the same transaction
+    messages = Message.objects.filter(**get_message_chat_lookup(instance)).order_by('-id')
+    latest = messages.values('id')[:1]
+    instance.get_chat_queryset().filter(last_message__isnull=True).update(
+        last_message_id=Subquery(latest),
+        last_message_preview=Coalesce(Left(Subquery(messages.values('content')[:1]), 100), Value('')),
+        last_message_has_attachments=Exists(MessageAttachment.objects.filter(message_id=Subquery(latest)))
+    )
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def track_reads_on_participant_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Start or drop the read states of users added to or removed from conversations"""
+    if action == 'pre_clear':
+        if reverse:
+            instance.chat_read_states.filter(conversation__isnull=False).delete()
+        else:
+            remove_chat_members({'conversation_id': instance.pk})
+        return
+    if action not in ('post_add', 'post_remove'):
+        return
+
+    update = add_chat_members if action == 'post_add' else remove_chat_members
+    if reverse:
+        for conversation_id in pk_set:
+            update({'conversation_id': conversation_id}, [instance.pk])
+    else:
+        update({'conversation_id': instance.pk}, pk_set)
+
+
+@receiver(post_save, sender=GroupChatMembership)
+def track_reads_on_join(sender, instance, created, **kwargs):
+    """Start the read state of a new group chat member"""
+    if created:
+        add_chat_members({'group_chat_id': instance.group_chat_id}, [instance.user_id])
+
+
+@receiver(post_delete, sender=GroupChatMembership)
+def track_reads_on_leave(sender, instance, **kwargs):
+    """Drop the read state of a user leaving a group chat"""
+    remove_chat_members({'group_chat_id': instance.group_chat_id}, [instance.user_id])
@@ -0,0 +1,92 @@
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APIClient
+from django.contrib.auth import get_user_model
+from organizations.models import Organization
+from messaging.models import Conversation, GroupChat, GroupChatMembership
+
+User = get_user_model()
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with an empty cache."""
+    cache.clear()
+
+@pytest.fixture
+def api_client():
+    """Return an API client for testing."""
+    return APIClient()
+
+@pytest.fixture
+def regular_user():
+    """Create a regular user for testing."""
+    return User.objects.create_user(
+        username='user_test',
+        email='user@example.com',
+        password='user123',
+        role='USER',
+        is_staff=False,
+        is_superuser=False
+    )
+
+@pytest.fixture
+def other_user():
+    """Create a second regular user for testing."""
+    return User.objects.create_user(
+        username='other_test',
+        email='other@example.com',
+        password='other123',
+        role='USER',
+        is_staff=False,
+        is_superuser=False
+    )
+
+@pytest.fixture
+def third_user():
+    """Create a third regular user for testing."""
+    return User.objects.create_user(
+        username='third_test',
+        email='third@example.com',
+        password='third123',
+        role='USER',
+        is_staff=False,
+        is_superuser=False
+    )
+
+@pytest.fixture
+def user_token(api_client, regular_user):
+    """Get authentication token for regular user."""
+    url = reverse('accounts:login')
+    data = {
+        'login': 'user_test',
+        'password': 'user123'
+    }
+    response = api_client.post(url, data)
+    return response.data['access']
+
+@pytest.fixture
+def organization(regular_user, other_user, third_user):
+    """Create an organization all test users belong to."""
+    org = Organization.objects.create(
+        name='Chat Organization',
+        description='This is an organization for messaging tests'
+    )
+    org.users.add(regular_user, other_user, third_user)
+    return org
+
+@pytest.fixture
+def conversation(organization, regular_user, other_user):
+    """Create a conversation between the regular user and the second user."""
+    conversation = Conversation.objects.create(organization=organization)
+    conversation.participants.add(regular_user, other_user)
+    return conversation
+
+@pytest.fixture
+def group_chat(organization, regular_user, other_user, third_user):
+    """Create a group chat of all test users, administered by the regular user."""
+    group_chat = GroupChat.objects.create(name='Team', organization=organization, created_by=regular_user)
+    GroupChatMembership.objects.create(group_chat=group_chat, user=regular_user, role='admin')
+    GroupChatMembership.objects.create(group_chat=group_chat, user=other_user)
+    GroupChatMembership.objects.create(group_chat=group_chat, user=third_user)
+    return group_chat
@@ -0,0 +1,102 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from messaging.history import DETAIL_MESSAGES
+from messaging.models import Message, MessageAttachment, MessageDeliveryStatus, MessageReaction
+
+def fill(group_chat, users, count):
+    """Send messages with a reply, an attachment, reactions and a delivery status each"""
+    previous = group_chat.messages.order_by('-id').first()
+    for index in range(count):
+        message = Message.objects.create(
+            group_chat=group_chat,
+            sender=users[index % len(users)],
+            content=f'Message {index}',
+            reply_to=previous
+        )
+        MessageAttachment.objects.create(message=message, file='notes.txt', attachment_type='document', file_name='notes.txt', file_size=5)
+        for user in users:
+            MessageReaction.objects.create(message=message, user=user, emoji='👍')
+        MessageDeliveryStatus.objects.create(message=message, status='sent')
+        previous = message
+
+# Test the messages included in chat details
+@pytest.mark.django_db
+class TestChatDetails:
+    def test_detail_includes_latest_messages(self, api_client, user_token, regular_user, other_user, conversation):
+        """Test that conversation details only include the latest messages, with where to continue"""
+        messages = [
+            Message.objects.create(conversation=conversation, sender=other_user, content=f'Message {index}')
+            for index in range(DETAIL_MESSAGES + 5)
+        ]
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        response = api_client.get(reverse('messaging:conversation-detail', args=[conversation.id]))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [message['id'] for message in response.data['messages']] == [message.id for message in reversed(messages[5:])]
+        assert response.data['messages_before'] == messages[5].id
+
+    def test_messages_continue_before_the_detail(self, api_client, user_token, other_user, conversation):
+        """Test that the messages endpoint returns the messages older than those of the details"""
+        messages = [
+            Message.objects.create(conversation=conversation, sender=other_user, content=f'Message {index}')
+            for index in range(DETAIL_MESSAGES + 5)
+        ]
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        before = api_client.get(reverse('messaging:conversation-detail', args=[conversation.id])).data['messages_before']
+
+        response = api_client.get(reverse('messaging:conversation-messages', args=[conversation.id]), {'before': before})
+
+        assert [message['id'] for message in response.data['results']] == [message.id for message in reversed(messages[:5])]
+
+    def test_short_chats_have_no_cursor(self, api_client, user_token, other_user, conversation):
+        """Test that details of chats with few messages include them all and nothing before"""
+        Message.objects.create(conversation=conversation, sender=other_user, content='Hello')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        response = api_client.get(reverse('messaging:conversation-detail', args=[conversation.id]))
+
+        assert len(response.data['messages']) == 1
+        assert response.data['messages_before'] is None
+
+    def test_detail_takes_fixed_queries(self, api_client, user_token, regular_user, other_user, third_user, group_chat, django_assert_num_queries):
+        """Test that group chat details cost the same whatever the messages, reactions and replies"""
+        users = [regular_user, other_user, third_user]
+        url = reverse('messaging:group-chat-detail', args=[group_chat.id])
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        # Authentication, the group chat, the member count, unread count and role of the user,
+        # the messages with their attachments, replied attachments, reactions and delivery
+        # statuses, the read states and the members
+        fill(group_chat, users, 2)
+        with django_assert_num_queries(12):
+            api_client.get(url)
+
+        fill(group_chat, users, DETAIL_MESSAGES + 5)
+        with django_assert_num_queries(12):
+            response = api_client.get(url)
+        assert len(response.data['messages']) == DETAIL_MESSAGES
+        assert all(len(message['reactions']) == 3 for message in response.data['messages'])
+
+    def test_create_endpoints_return_bounded_details(self, api_client, user_token, organization, other_user, third_user):
+        """Test that creating a conversation or group chat returns its details with the initial message"""
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        conversation = api_client.post(reverse('messaging:conversation-create'), {
+            'participant_id': other_user.id,
+            'organization_id': organization.id,
+            'initial_message': 'Hello'
+        }, format='json')
+        group_chat = api_client.post(reverse('messaging:group-chat-create'), {
+            'name': 'New group',
+            'organization_id': organization.id,
+            'member_ids': [other_user.id, third_user.id],
+            'initial_message': 'Welcome'
+        }, format='json')
+
+        assert conversation.status_code == status.HTTP_201_CREATED
+        assert [message['content'] for message in conversation.data['messages']] == ['Hello']
+        assert conversation.data['messages_before'] is None
+        assert group_chat.status_code == status.HTTP_201_CREATED
+        assert [message['content'] for message in group_chat.data['messages']] == ['Welcome']
+        assert len(group_chat.data['members']) == 3
@@ -0,0 +1,97 @@
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from messaging.models import Conversation, GroupChat, GroupChatMembership, Message
+
+@pytest.fixture
+def chats(organization, regular_user, other_user, third_user):
+    """Create two conversations and two group chats of the regular user, oldest activity first"""
+    created = []
+    for index in range(2):
+        conversation = Conversation.objects.create(organization=organization)
+        conversation.participants.add(regular_user, [other_user, third_user][index])
+        group_chat = GroupChat.objects.create(name=f'Group {index}', organization=organization, created_by=other_user)
+        GroupChatMembership.objects.create(group_chat=group_chat, user=regular_user)
+        GroupChatMembership.objects.create(group_chat=group_chat, user=other_user)
+        created += [conversation, group_chat]
+    for chat in created:
+        field = 'conversation' if isinstance(chat, Conversation) else 'group_chat'
+        Message.objects.create(sender=other_user, content=f'In {chat}', **{field: chat})
+    return created
+
+def keys(results):
+    return [(item['type'], item['id']) for item in results]
+
+def key(chat):
+    return ('conversation' if isinstance(chat, Conversation) else 'group_chat', chat.id)
+
+# Test the inbox endpoint
+@pytest.mark.django_db
+class TestInbox:
+    def test_inbox_merges_chats_by_last_activity(self, api_client, user_token, other_user, chats):
+        """Test that conversations and group chats come in one list, most recently active first"""
+        Message.objects.create(conversation=chats[0], sender=other_user, content='Latest')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        response = api_client.get(reverse('messaging:inbox'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert keys(response.data['results']) == [key(chats[0]), key(chats[3]), key(chats[2]), key(chats[1])]
+        assert response.data['next'] is None
+
+    def test_inbox_rows_show_unread_preview_and_mute(self, api_client, user_token, regular_user, chats):
+        """Test that every row carries its unread count, last message and mute state"""
+        GroupChatMembership.objects.filter(group_chat=chats[1], user=regular_user).update(is_muted=True)
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        results = {(item['type'], item['id']): item for item in api_client.get(reverse('messaging:inbox')).data['results']}
+
+        group = results[key(chats[1])]
+        assert group['is_muted'] is True
+        assert group['name'] == 'Group 0'
+        assert group['unread_count'] == 1
+        assert group['last_message']['content'] == f'In {chats[1]}'
+        conversation = results[key(chats[0])]
+        assert conversation['is_muted'] is False
+        assert sorted(user['username'] for user in conversation['participants']) == ['other_test', 'user_test']
+
+    def test_cursor_walks_every_chat_once(self, api_client, user_token, chats):
+        """Test that pages follow each other without gaps or repeats, even for chats active at the same time"""
+        now = timezone.now()
+        Conversation.objects.update(updated_at=now)
+        GroupChat.objects.update(updated_at=now)
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        seen = []
+        url = reverse('messaging:inbox') + '?page_size=3'
+        while url:
+            response = api_client.get(url)
+            assert len(response.data['results']) <= 3
+            seen += keys(response.data['results'])
+            url = response.data['next']
+
+        assert sorted(seen) == sorted(key(chat) for chat in chats)
+        assert len(seen) == len(chats)
+
+    def test_inbox_takes_fixed_queries(self, api_client, user_token, organization, regular_user, other_user, chats, django_assert_num_queries):
+        """Test that a page costs the same number of queries however many chats the user has"""
+        for index in range(10):
+            group_chat = GroupChat.objects.create(name=f'More {index}', organization=organization, created_by=other_user)
+            GroupChatMembership.objects.create(group_chat=group_chat, user=regular_user)
+            Message.objects.create(group_chat=group_chat, sender=other_user, content='More')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        # Authentication, the conversations, the group chats and the participants of the conversations
+        with django_assert_num_queries(4):
+            response = api_client.get(reverse('messaging:inbox'), {'page_size': 14})
+
+        assert len(response.data['results']) == 14
+
+    def test_invalid_cursor(self, api_client, user_token):
+        """Test that a malformed cursor is rejected"""
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        response = api_client.get(reverse('messaging:inbox'), {'cursor': 'not-a-cursor'})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,126 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from rest_framework import status
+from messaging.attachments import add_message_attachments
+from messaging.models import Conversation, GroupChat, GroupChatMembership, Message
+
+@pytest.fixture
+def inbox(organization, regular_user, other_user):
+    """Create a few more chats of the regular user, each with a message"""
+    for index in range(3):
+        conversation = Conversation.objects.create(organization=organization)
+        conversation.participants.add(regular_user, other_user)
+        Message.objects.create(conversation=conversation, sender=other_user, content=f'Hello {index}')
+        group_chat = GroupChat.objects.create(name=f'Group {index}', organization=organization, created_by=other_user)
+        GroupChatMembership.objects.create(group_chat=group_chat, user=regular_user)
+        Message.objects.create(group_chat=group_chat, sender=other_user, content=f'Hi {index}')
+
+# Test the last message kept on chats
+@pytest.mark.django_db
+class TestLastMessage:
+    def test_sending_moves_the_last_message(self, regular_user, other_user, conversation, group_chat):
+        """Test that a new message becomes the last message of its chat, with a truncated preview"""
+        Message.objects.create(conversation=conversation, sender=regular_user, content='First')
+        message = Message.objects.create(conversation=conversation, sender=other_user, content='x' * 150)
+        group_message = Message.objects.create(group_chat=group_chat, sender=other_user, content='Team')
+
+        conversation.refresh_from_db()
+        group_chat.refresh_from_db()
+        assert conversation.last_message_id == message.id
+        assert conversation.last_message_preview == 'x' * 100
+        assert group_chat.last_message_id == group_message.id
+        assert group_chat.last_message_preview == 'Team'
+
+    def test_editing_updates_the_preview_of_the_last_message_only(self, regular_user, conversation):
+        """Test that the preview follows edits of the last message and ignores older ones"""
+        first = Message.objects.create(conversation=conversation, sender=regular_user, content='First')
+        last = Message.objects.create(conversation=conversation, sender=regular_user, content='Last')
+
+        first.content = 'Edited first'
+        first.save()
+        conversation.refresh_from_db()
+        assert conversation.last_message_preview == 'Last'
+
+        last.content = 'Edited last'
+        last.save()
+        conversation.refresh_from_db()
+        assert conversation.last_message_preview == 'Edited last'
+
+    def test_attachments_flag_the_last_message(self, settings, tmp_path, regular_user, group_chat):
+        """Test that attaching files to the last message is shown in its preview"""
+        settings.MEDIA_ROOT = str(tmp_path)
+        message = Message.objects.create(group_chat=group_chat, sender=regular_user, content='Look')
+
+        add_message_attachments(message, [SimpleUploadedFile('notes.txt', b'notes')], ['document'])
+
+        group_chat.refresh_from_db()
+        assert group_chat.last_message_has_attachments
+
+    def test_deleting_the_last_message_points_at_the_one_before(self, settings, tmp_path, regular_user, conversation):
+        """Test that hard deleting the last message moves the pointer and preview back a message"""
+        settings.MEDIA_ROOT = str(tmp_path)
+        first = Message.objects.create(conversation=conversation, sender=regular_user, content='First')
+        add_message_attachments(first, [SimpleUploadedFile('notes.txt', b'notes')], ['document'])
+        middle = Message.objects.create(conversation=conversation, sender=regular_user, content='Middle')
+        last = Message.objects.create(conversation=conversation, sender=regular_user, content='Last')
+
+        middle.delete()
+        conversation.refresh_from_db()
+        assert (conversation.last_message_id, conversation.last_message_preview) == (last.id, 'Last')
+
+        last.delete()
+        conversation.refresh_from_db()
+        assert (conversation.last_message_id, conversation.last_message_preview) == (first.id, 'First')
+        assert conversation.last_message_has_attachments
+
+        first.delete()
+        conversation.refresh_from_db()
+        assert (conversation.last_message_id, conversation.last_message_preview) == (None, '')
+        assert not conversation.last_message_has_attachments
+
+    @pytest.mark.parametrize('url_name, data', [
+        ('messaging:conversation-update', {'is_active': True}),
+        ('messaging:conversation-delete', None),
+        ('messaging:group-chat-update', {'name': 'Renamed'}),
+        ('messaging:group-chat-delete', None),
+    ])
+    def test_chat_updates_leave_the_last_message(self, api_client, user_token, conversation, group_chat, url_name, data):
+        """Test that chat updates only write their own fields, so a message sent meanwhile stays the last one"""
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        chat = conversation if url_name.startswith('messaging:conversation') else group_chat
+        method = api_client.patch if data is not None else api_client.delete
+
+        with CaptureQueriesContext(connection) as queries:
+            response = method(reverse(url_name, args=[chat.id]), data, format='json')
+
+        assert status.is_success(response.status_code)
+        updates = [query['sql'] for query in queries if query['sql'].startswith(f'UPDATE "{chat._meta.db_table}"')]
+        assert updates
+        assert not any('last_message' in sql for sql in updates)
+
+    def test_conversation_list_shows_last_messages(self, api_client, user_token, other_user, conversation):
+        """Test that conversations list their last message"""
+        Message.objects.create(conversation=conversation, sender=other_user, content='Hello')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        response = api_client.get(reverse('messaging:conversation-list'))
+
+        assert response.status_code == status.HTTP_200_OK
+        last_message = response.data[0]['last_message']
+        assert last_message['content'] == 'Hello'
+        assert last_message['sender']['username'] == 'other_test'
+        assert response.data[0]['unread_count'] == 1
+
+    @pytest.mark.parametrize('url_name', ['messaging:conversation-list', 'messaging:group-chat-list'])
+    def test_lists_take_fixed_queries(self, api_client, user_token, conversation, group_chat, inbox, url_name, django_assert_num_queries):
+        """Test that chat lists do not run queries per chat"""
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        # Authentication, the chats, their members and their organizations
+        with django_assert_num_queries(4):
+            response = api_client.get(reverse(url_name))
+
+        assert len(response.data) == 4
+        assert all(chat['last_message'] is not None for chat in response.data[:3])
@@ -0,0 +1,104 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from messaging.models import ChatReadState, Conversation, Message
+from messaging.reads import count_unread, mark_chat_read, mark_message_read, mark_messages_read
+from messaging.serializers import MessageSerializer
+
+def send(chat, sender, count=1):
+    """Send messages to a conversation or group chat, returning them oldest first"""
+    field = 'conversation' if isinstance(chat, Conversation) else 'group_chat'
+    return [Message.objects.create(sender=sender, content=f'Message {index}', **{field: chat}) for index in range(count)]
+
+# Test read watermarks
+@pytest.mark.django_db
+class TestReadWatermarks:
+    def test_opening_messages_marks_the_chat_read(self, api_client, user_token, regular_user, other_user, conversation):
+        """Test that listing the messages of a conversation moves a single watermark to its latest message"""
+        messages = send(conversation, other_user, 5)
+        assert count_unread(regular_user, conversation) == 5
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        response = api_client.get(reverse('messaging:conversation-messages', args=[conversation.id]))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert count_unread(regular_user, conversation) == 0
+        state = ChatReadState.objects.get(user=regular_user)
+        assert state.conversation_id == conversation.id
+        assert state.last_read_id == messages[-1].id
+
+    def test_marking_read_takes_fixed_queries(self, regular_user, other_user, group_chat, django_assert_num_queries):
+        """Test that reading a chat costs the same however many messages are unread"""
+        send(group_chat, other_user)
+        mark_chat_read(regular_user, group_chat)
+        send(group_chat, other_user, 30)
+
+        # The latest message, then locking the watermark and its update in a savepoint
+        with django_assert_num_queries(5):
+            assert mark_chat_read(regular_user, group_chat)
+        assert count_unread(regular_user, group_chat) == 0
+
+    def test_watermark_never_moves_back(self, regular_user, other_user, conversation):
+        """Test that reading an older message leaves the watermark at the latest one read"""
+        first, second = send(conversation, other_user, 2)
+        mark_message_read(regular_user, second)
+
+        assert not mark_message_read(regular_user, first)
+        assert ChatReadState.objects.get(user=regular_user).last_read_id == second.id
+
+    def test_own_messages_are_never_unread(self, regular_user, other_user, conversation):
+        """Test that unread counts only include messages sent by others"""
+        send(conversation, regular_user, 3)
+        send(conversation, other_user, 2)
+
+        assert count_unread(regular_user, conversation) == 2
+        assert count_unread(other_user, conversation) == 3
+
+    def test_read_by_is_derived_from_watermarks(self, regular_user, other_user, third_user, group_chat):
+        """Test that a message counts as read by members whose watermark reached it, besides its sender"""
+        first, second = send(group_chat, regular_user, 2)
+        mark_message_read(other_user, first)
+        mark_chat_read(third_user, group_chat)
+        mark_chat_read(regular_user, group_chat)
+
+        readers = lambda message: sorted(reader['user']['username'] for reader in MessageSerializer(message).data['read_by'])
+        assert readers(first) == ['other_test', 'third_test']
+        assert readers(second) == ['third_test']
+
+    def test_read_receipts_skip_chats_of_others(self, regular_user, other_user, third_user, organization, conversation, group_chat):
+        """Test that read receipts only move watermarks in chats the user belongs to"""
+        private = Conversation.objects.create(organization=organization)
+        private.participants.add(other_user, third_user)
+        hidden = send(private, other_user)[0]
+        message = send(group_chat, other_user)[0]
+
+        mark_messages_read(regular_user, [hidden.id, message.id])
+
+        moved = ChatReadState.objects.filter(user=regular_user, last_read_id__gt=0)
+        assert list(moved.values_list('group_chat_id', 'last_read_id')) == [
+            (group_chat.id, message.id)
+        ]
+
+    def test_outsiders_get_no_read_state(self, regular_user, other_user, third_user, organization):
+        """Test that reading a message of a chat the user is not in creates no read state"""
+        private = Conversation.objects.create(organization=organization)
+        private.participants.add(other_user, third_user)
+        message = send(private, other_user)[0]
+
+        assert not mark_message_read(regular_user, message)
+        assert not ChatReadState.objects.filter(user=regular_user).exists()
+
+    def test_mark_read_endpoint_requires_membership(self, api_client, user_token, regular_user, other_user, third_user, organization):
+        """Test that users outside a chat cannot mark its messages as read"""
+        private = Conversation.objects.create(organization=organization)
+        private.participants.add(other_user, third_user)
+        message = send(private, other_user)[0]
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        response = api_client.post(
+            reverse('messaging:message-mark-read', args=[message.id]) + f'?conversation={private.id}'
+        )
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert not ChatReadState.objects.filter(user=regular_user).exists()
+        assert count_unread(third_user, private) == 1
@@ -0,0 +1,117 @@
+import threading
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.urls import reverse
+from rest_framework import status
+from messaging.models import ChatReadState, GroupChat, GroupChatMembership, Message
+from messaging.reads import annotate_unread_counts, count_unread, mark_chat_read, mark_message_read
+
+def send(group_chat, sender, count=1):
+    """Send messages to a group chat, returning them oldest first"""
+    return [Message.objects.create(group_chat=group_chat, sender=sender, content=f'Message {index}') for index in range(count)]
+
+# Test the unread counters
+@pytest.mark.django_db
+class TestUnreadCounters:
+    def test_sending_counts_for_other_members(self, regular_user, other_user, third_user, group_chat):
+        """Test that a message adds to the counters of every member but its sender"""
+        send(group_chat, other_user, 3)
+
+        assert count_unread(regular_user, group_chat) == 3
+        assert count_unread(third_user, group_chat) == 3
+        assert count_unread(other_user, group_chat) == 0
+
+    def test_reading_lowers_the_counter(self, regular_user, other_user, group_chat):
+        """Test that the counter keeps the messages after the watermark and is cleared by reading the chat"""
+        messages = send(group_chat, other_user, 5)
+
+        mark_message_read(regular_user, messages[1])
+        assert count_unread(regular_user, group_chat) == 3
+
+        mark_chat_read(regular_user, group_chat)
+        assert count_unread(regular_user, group_chat) == 0
+
+    def test_new_members_start_with_nothing_unread(self, regular_user, other_user, third_user, organization):
+        """Test that members joining a chat do not count the messages sent before they joined"""
+        group_chat = GroupChat.objects.create(name='Later', organization=organization, created_by=regular_user)
+        GroupChatMembership.objects.create(group_chat=group_chat, user=regular_user, role='admin')
+        send(group_chat, regular_user, 4)
+
+        GroupChatMembership.objects.create(group_chat=group_chat, user=other_user)
+        assert count_unread(other_user, group_chat) == 0
+        send(group_chat, regular_user)
+        assert count_unread(other_user, group_chat) == 1
+
+    def test_leaving_drops_the_read_state(self, other_user, group_chat):
+        """Test that removing a member removes its read state"""
+        GroupChatMembership.objects.get(group_chat=group_chat, user=other_user).delete()
+
+        assert not ChatReadState.objects.filter(user=other_user, group_chat=group_chat).exists()
+
+    def test_list_reads_counters_in_its_query(self, regular_user, other_user, organization, group_chat, django_assert_num_queries):
+        """Test that the unread counters of a list of chats come with the chats"""
+        other_chat = GroupChat.objects.create(name='Other', organization=organization, created_by=other_user)
+        GroupChatMembership.objects.create(group_chat=other_chat, user=regular_user)
+        send(group_chat, other_user, 2)
+        send(other_chat, other_user, 1)
+
+        with django_assert_num_queries(1):
+            counts = {
+                chat.id: chat.unread_count
+                for chat in annotate_unread_counts(GroupChat.objects.filter(members=regular_user), regular_user)
+            }
+        assert counts == {group_chat.id: 2, other_chat.id: 1}
+
+    def test_group_chat_list_shows_counters(self, api_client, user_token, other_user, group_chat):
+        """Test that the group chat list returns the unread counter of the current user"""
+        send(group_chat, other_user, 2)
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        response = api_client.get(reverse('messaging:group-chat-list'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [chat['unread_count'] for chat in response.data] == [2]
+
+    def test_reconcile_recomputes_counters(self, regular_user, other_user, third_user, group_chat):
+        """Test that the reconciliation command fixes drifted counters and restores missing read states"""
+        send(group_chat, other_user, 3)
+        ChatReadState.objects.filter(user=regular_user).update(unread_count=40)
+        ChatReadState.objects.filter(user=third_user).delete()
+
+        call_command('reconcile_unread_counts')
+
+        assert count_unread(regular_user, group_chat) == 3
+        assert count_unread(third_user, group_chat) == 3
+        assert count_unread(other_user, group_chat) == 0
+
+@pytest.mark.skipif(connection.vendor == 'sqlite', reason='SQLite fails concurrent writes with "table is locked"')
+@pytest.mark.django_db(transaction=True)
+def test_reading_while_messages_arrive_keeps_exact_counters(regular_user, other_user, group_chat):
+    """Test that watermarks moving while messages are sent never lose or double count them"""
+    errors = []
+    barrier = threading.Barrier(2)
+
+    def run(action):
+        try:
+            barrier.wait()
+            for _ in range(30):
+                action()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    threads = [
+        threading.Thread(target=run, args=(lambda: send(group_chat, other_user),)),
+        threading.Thread(target=run, args=(lambda: mark_chat_read(regular_user, group_chat),)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    state = ChatReadState.objects.get(user=regular_user, group_chat=group_chat)
+    actual = Message.objects.filter(group_chat=group_chat, id__gt=state.last_read_id).exclude(sender=regular_user).count()
+    assert not errors
+    assert state.unread_count == actual
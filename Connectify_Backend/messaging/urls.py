@@ -3,6 +3,9 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     MessageViewSet,
     
+    # Inbox views
+    inbox,
+    
     # Conversation views
     conversation_list, conversation_create, conversation_detail,
     conversation_update, conversation_delete, conversation_messages,
@@ -30,6 +33,9 @@ router.register(r'messages', MessageViewSet, basename='message')
 urlpatterns = [
     path('', include(router.urls)),
     
+    # Inbox URL
+    path('inbox/', inbox, name='inbox'),
+    
     # Conversation URLs
     path('conversations/', conversation_list, name='conversation-list'),
     path('conversations/create/', conversation_create, name='conversation-create'),
@@ -1,28 +1,34 @@
-from datetime import timezone
 from django.shortcuts import render
 from rest_framework import viewsets, mixins, status, filters
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
-from django.db.models import Q, Prefetch, Count
+from rest_framework.utils.urls import replace_query_param
+from django.db.models import Q, Prefetch, Count, OuterRef, Subquery
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from organizations.models import Organization
 from accounts.models import User
+from accounts.uploads import ChunkedUploadError, claim_uploads
 
 
 from .models import (
     Conversation, GroupChat, GroupChatMembership, Message, 
-    MessageReaction, MessageAttachment, MessageReadStatus, UserBlock, MessageDeliveryStatus
+    MessageReaction, UserBlock, MessageDeliveryStatus
 )
 from .serializers import (
     ConversationSerializer, ConversationDetailSerializer, ConversationCreateSerializer,
     GroupChatSerializer, GroupChatDetailSerializer, GroupChatCreateSerializer,
     MessageSerializer, MessageCreateSerializer,
-    MessageReactionSerializer, MessageAttachmentSerializer,
+    MessageReactionSerializer,
     UserBlockSerializer, UserBlockCreateSerializer,
-    GroupChatMembershipSerializer
+    GroupChatMembershipSerializer, InboxItemSerializer
 )
+from .attachments import add_message_attachments, add_message_uploads
+from .history import with_message_details
+from .inbox import INBOX_MAX_PAGE_SIZE, INBOX_PAGE_SIZE, decode_inbox_cursor, get_inbox_page
+from .reads import annotate_unread_counts, get_chat_read_states, mark_chat_read, mark_message_read
 
 
 
@@ -42,15 +48,45 @@ class MessagePagination(PageNumberPagination):
         })
 
 
+# Inbox views
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def inbox(request):
+    """
+    Get the conversations and group chats of the current user in one list,
+    most recently active first, a page at a time by cursor.
+    """
+    try:
+        page_size = int(request.query_params.get('page_size', INBOX_PAGE_SIZE))
+    except ValueError:
+        page_size = INBOX_PAGE_SIZE
+    page_size = min(max(page_size, 1), INBOX_MAX_PAGE_SIZE)
+    
+    cursor = decode_inbox_cursor(request.query_params.get('cursor'))
+    chats, next_cursor = get_inbox_page(request.user, cursor, page_size)
+    
+    next_link = None
+    if next_cursor:
+        next_link = replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor)
+    return Response({
+        'next': next_link,
+        'results': InboxItemSerializer(chats, many=True).data
+    })
+
+
 # Conversation views
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def conversation_list(request):
     """Get all conversations for the current user"""
     user = request.user
-    conversations = Conversation.objects.filter(
+    conversations = annotate_unread_counts(Conversation.objects.filter(
         participants=user,
         is_active=True
+    ), user).select_related(
+        'last_message__sender'
+    ).defer(
+        'last_message__content'
     ).prefetch_related(
         'participants',
         'organization'
@@ -114,14 +150,16 @@ def conversation_detail(request, pk):
     """Get conversation details or delete a conversation"""
     user = request.user
     conversation = get_object_or_404(
-        Conversation.objects.filter(participants=user, is_active=True),
+        Conversation.objects.filter(participants=user, is_active=True).select_related(
+            'organization', 'last_message__sender'
+        ),
         pk=pk
     )
     
     if request.method == 'DELETE':
         # Soft delete conversation
         conversation.is_active = False
-        conversation.save()
+        conversation.save(update_fields=['is_active', 'updated_at'])
         return Response(status=status.HTTP_204_NO_CONTENT)
     
     # GET method - return conversation details
@@ -142,7 +180,7 @@ def conversation_update(request, pk):
     # Only allow updating is_active field
     if 'is_active' in request.data:
         conversation.is_active = request.data.get('is_active')
-        conversation.save()
+        conversation.save(update_fields=['is_active', 'updated_at'])
     
     serializer = ConversationDetailSerializer(conversation, context={'request': request})
     return Response(serializer.data)
@@ -159,7 +197,7 @@ def conversation_delete(request, pk):
     )
     
     conversation.is_active = False
-    conversation.save()
+    conversation.save(update_fields=['is_active', 'updated_at'])
     
     return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -174,29 +212,32 @@ def conversation_messages(request, pk):
         pk=pk
     )
     
-    messages = conversation.messages.all().order_by('-created_at')
-    
-    # Mark messages as read
-    unread_messages = messages.exclude(
-        read_status__user=request.user
-    )
+    messages = with_message_details(conversation.messages.all()).order_by('-created_at')
     
-    for message in unread_messages:
-        if message.sender != request.user:
-            MessageReadStatus.objects.get_or_create(
-                message=message,
-                user=request.user
+    # Continue from the messages shown in the conversation details
+    before = request.query_params.get('before')
+    if before:
+        try:
+            messages = messages.filter(id__lt=int(before))
+        except ValueError:
+            return Response(
+                {"detail": "Invalid message ID for before"},
+                status=status.HTTP_400_BAD_REQUEST
             )
     
+    # Mark messages as read
+    mark_chat_read(user, conversation)
+    context = {'read_states': get_chat_read_states(conversation)}
+    
     # Paginate messages
     paginator = MessagePagination()
     page = paginator.paginate_queryset(messages, request)
     
     if page is not None:
-        serializer = MessageSerializer(page, many=True)
+        serializer = MessageSerializer(page, many=True, context=context)
         return paginator.get_paginated_response(serializer.data)
     
-    serializer = MessageSerializer(messages, many=True)
+    serializer = MessageSerializer(messages, many=True, context=context)
     return Response(serializer.data)
 
 
@@ -225,6 +266,15 @@ def conversation_send_message(request, pk):
             status=status.HTTP_403_FORBIDDEN
         )
     
+    # Take the finished chunked uploads to attach
+    try:
+        uploads = claim_uploads(request.user, serializer.validated_data.get('upload_ids', []))
+    except ChunkedUploadError as e:
+        return Response(
+            {"detail": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
     # Create message
     message = Message.objects.create(
         conversation=conversation,
@@ -234,17 +284,12 @@ def conversation_send_message(request, pk):
     )
     
     # Handle attachments
-    attachments = serializer.validated_data.get('attachments', [])
-    attachment_types = serializer.validated_data.get('attachment_types', [])
-    
-    for i, attachment in enumerate(attachments):
-        MessageAttachment.objects.create(
-            message=message,
-            file=attachment,
-            attachment_type=attachment_types[i],
-            file_name=attachment.name,
-            file_size=attachment.size
-        )
+    add_message_attachments(
+        message,
+        serializer.validated_data.get('attachments', []),
+        serializer.validated_data.get('attachment_types', [])
+    )
+    add_message_uploads(message, uploads)
     
     return Response(
         MessageSerializer(message).data,
@@ -258,15 +303,24 @@ def conversation_send_message(request, pk):
 def group_chat_list(request):
     """Get all group chats for the current user"""
     user = request.user
-    group_chats = GroupChat.objects.filter(
+    group_chats = annotate_unread_counts(GroupChat.objects.filter(
         members=user,
         is_active=True
+    ), user).annotate(
+        user_role=Subquery(
+            GroupChatMembership.objects.filter(group_chat=OuterRef('pk'), user=user).values('role')[:1]
+        )
+    ).select_related(
+        'created_by',
+        'last_message__sender'
+    ).defer(
+        'last_message__content'
     ).prefetch_related(
         'members',
         'organization'
     ).distinct()
     
-    serializer = GroupChatSerializer(group_chats, many=True)
+    serializer = GroupChatSerializer(group_chats, many=True, context={'request': request})
     return Response(serializer.data)
 
 
@@ -274,7 +328,7 @@ def group_chat_list(request):
 @permission_classes([IsAuthenticated])
 def group_chat_create(request):
     """Create a new group chat"""
-    serializer = GroupChatCreateSerializer(data=request.data)
+    serializer = GroupChatCreateSerializer(data=request.data, context={'request': request})
     serializer.is_valid(raise_exception=True)
     
     user = request.user
@@ -331,7 +385,9 @@ def group_chat_detail(request, pk):
     """Get group chat details"""
     user = request.user
     group_chat = get_object_or_404(
-        GroupChat.objects.filter(members=user, is_active=True),
+        GroupChat.objects.filter(members=user, is_active=True).select_related(
+            'organization', 'created_by', 'last_message__sender'
+        ),
         pk=pk
     )
     
@@ -366,17 +422,21 @@ def group_chat_update(request, pk):
             status=status.HTTP_403_FORBIDDEN
         )
     
-    # Update fields
+    # Update fields, saving only those so the last message fields are not written back
+    update_fields = ['updated_at']
     if 'name' in request.data:
         group_chat.name = request.data.get('name')
+        update_fields.append('name')
     
     if 'description' in request.data:
         group_chat.description = request.data.get('description')
+        update_fields.append('description')
     
     if 'avatar' in request.data and request.data.get('avatar'):
         group_chat.avatar = request.data.get('avatar')
+        update_fields.append('avatar')
     
-    group_chat.save()
+    group_chat.save(update_fields=update_fields)
     
     serializer = GroupChatDetailSerializer(group_chat, context={'request': request})
     return Response(serializer.data)
@@ -410,7 +470,7 @@ def group_chat_delete(request, pk):
         )
     
     group_chat.is_active = False
-    group_chat.save()
+    group_chat.save(update_fields=['is_active', 'updated_at'])
     
     return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -425,29 +485,32 @@ def group_chat_messages(request, pk):
         pk=pk
     )
     
-    messages = group_chat.messages.all().order_by('-created_at')
+    messages = with_message_details(group_chat.messages.all()).order_by('-created_at')
     
-    # Mark messages as read
-    unread_messages = messages.exclude(
-        read_status__user=request.user
-    )
-    
-    for message in unread_messages:
-        if message.sender != request.user:
-            MessageReadStatus.objects.get_or_create(
-                message=message,
-                user=request.user
+    # Continue from the messages shown in the group chat details
+    before = request.query_params.get('before')
+    if before:
+        try:
+            messages = messages.filter(id__lt=int(before))
+        except ValueError:
+            return Response(
+                {"detail": "Invalid message ID for before"},
+                status=status.HTTP_400_BAD_REQUEST
             )
     
+    # Mark messages as read
+    mark_chat_read(user, group_chat)
+    context = {'read_states': get_chat_read_states(group_chat)}
+    
     # Paginate messages
     paginator = MessagePagination()
     page = paginator.paginate_queryset(messages, request)
     
     if page is not None:
-        serializer = MessageSerializer(page, many=True)
+        serializer = MessageSerializer(page, many=True, context=context)
         return paginator.get_paginated_response(serializer.data)
     
-    serializer = MessageSerializer(messages, many=True)
+    serializer = MessageSerializer(messages, many=True, context=context)
     return Response(serializer.data)
 
 
@@ -476,6 +539,15 @@ def group_chat_send_message(request, pk):
             status=status.HTTP_403_FORBIDDEN
         )
     
+    # Take the finished chunked uploads to attach
+    try:
+        uploads = claim_uploads(request.user, serializer.validated_data.get('upload_ids', []))
+    except ChunkedUploadError as e:
+        return Response(
+            {"detail": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
     # Create message
     message = Message.objects.create(
         group_chat=group_chat,
@@ -485,17 +557,12 @@ def group_chat_send_message(request, pk):
     )
     
     # Handle attachments
-    attachments = serializer.validated_data.get('attachments', [])
-    attachment_types = serializer.validated_data.get('attachment_types', [])
-    
-    for i, attachment in enumerate(attachments):
-        MessageAttachment.objects.create(
-            message=message,
-            file=attachment,
-            attachment_type=attachment_types[i],
-            file_name=attachment.name,
-            file_size=attachment.size
-        )
+    add_message_attachments(
+        message,
+        serializer.validated_data.get('attachments', []),
+        serializer.validated_data.get('attachment_types', [])
+    )
+    add_message_uploads(message, uploads)
     
     return Response(
         MessageSerializer(message).data,
@@ -761,11 +828,7 @@ def message_detail(request, pk):
     )
     
     # Mark message as read if not sender
-    if message.sender != user:
-        MessageReadStatus.objects.get_or_create(
-            message=message,
-            user=user
-        )
+    mark_message_read(user, message)
     
     serializer = MessageSerializer(message)
     return Response(serializer.data)
@@ -1010,11 +1073,18 @@ class MessageViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         message = self.get_object()
-        MessageReadStatus.objects.get_or_create(
-            message=message,
-            user=request.user,
-            defaults={'read_at': timezone.now()}
-        )
+        # Only members of the chat can mark its messages as read
+        is_member = Message.objects.filter(
+            Q(conversation__participants=request.user) |
+            Q(group_chat__members=request.user),
+            pk=message.pk
+        ).exists()
+        if not is_member:
+            return Response(
+                {"detail": "You are not a member of this chat"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        mark_message_read(request.user, message)
         MessageDeliveryStatus.objects.create(
             message=message,
             status='read',
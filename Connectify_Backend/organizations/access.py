@@ -0,0 +1,48 @@
+from .models import Organization, OrganizationAdmins
+
+
+class AuthorizationContext:
+    """
+    Role and organizations of a user, loaded once per request so permission
+    checks are set lookups instead of queries.
+    """
+
+    def __init__(self, role, organization_ids, admin_organization_ids):
+        self.role = role
+        self.organization_ids = frozenset(organization_ids)
+        self.admin_organization_ids = frozenset(admin_organization_ids)
+
+    @property
+    def is_system_admin(self):
+        return self.role == 'ADMIN'
+
+    def is_member(self, organization):
+        """Check whether the user belongs to an organization, given as an instance or ID"""
+        return getattr(organization, 'pk', organization) in self.organization_ids
+
+    def is_admin(self, organization):
+        """Check whether the user administers an organization, given as an instance or ID"""
+        return getattr(organization, 'pk', organization) in self.admin_organization_ids
+
+
+def get_authorization_context(user):
+    """
+    Get the authorization context of a user.
+    It is kept on the user instance, which lives as long as the request, so every
+    request reads the current memberships and admin roles once.
+    """
+    context = getattr(user, '_authorization_context', None)
+    if context is not None:
+        return context
+
+    if not user.is_authenticated:
+        context = AuthorizationContext(None, [], [])
+    else:
+        context = AuthorizationContext(
+            user.role,
+            Organization.users.through.objects.filter(user_id=user.pk).values_list('organization_id', flat=True),
+            OrganizationAdmins.objects.filter(admin_id=user.pk).values_list('organization_id', flat=True)
+        )
+
+    user._authorization_context = context
+    return context
@@ -0,0 +1,66 @@
+# Generated by Django 5.1.7 on 2026-10-17 06:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from accounts.trigrams import get_trigrams
+
+SEARCH_FIELDS = ('name', 'description')
+
+
+def index_organizations(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS organizations_name_trgm_idx '
+            'ON organizations_organization USING gin (UPPER(name) gin_trgm_ops, name gin_trgm_ops)'
+        )
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS organizations_description_trgm_idx '
+            'ON organizations_organization USING gin (description gin_trgm_ops)'
+        )
+        return
+
+    Organization = apps.get_model('organizations', 'Organization')
+    OrganizationTrigram = apps.get_model('organizations', 'OrganizationTrigram')
+    rows = []
+    for organization in Organization.objects.only(*SEARCH_FIELDS).iterator():
+        for field in SEARCH_FIELDS:
+            trigrams = get_trigrams(getattr(organization, field))
+            rows.extend(
+                OrganizationTrigram(organization=organization, field=field, gram=gram, total=len(trigrams))
+                for gram in trigrams
+            )
+    OrganizationTrigram.objects.bulk_create(rows, batch_size=1000)
+
+
+def drop_organization_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS organizations_name_trgm_idx')
+        schema_editor.execute('DROP INDEX IF EXISTS organizations_description_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0002_organizationadmins'),
+        # Creates the pg_trgm extension
+        ('accounts', '0003_name_trigrams'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrganizationTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(max_length=20)),
+                ('gram', models.CharField(max_length=3)),
+                ('total', models.PositiveIntegerField()),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='organizations.organization')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['gram', 'field'], name='orgs_trigram_gram_idx')],
+                'unique_together': {('organization', 'field', 'gram')},
+            },
+        ),
+        migrations.RunPython(index_organizations, drop_organization_indexes),
+    ]
@@ -16,3 +16,22 @@ class OrganizationAdmins(models.Model):
     organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='organization_admins')
     admin = models.ForeignKey(User, on_delete=models.CASCADE, related_name='admin_organizations')
 
+
+class OrganizationTrigram(models.Model):
+    """
+    Trigram of an organization name or description, used for search on databases without pg_trgm.
+    """
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='trigrams')
+    field = models.CharField(max_length=20)
+    gram = models.CharField(max_length=3)
+    # Number of distinct trigrams of the field, for similarity ranking
+    total = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ['organization', 'field', 'gram']
+        indexes = [
+            models.Index(fields=['gram', 'field'], name='orgs_trigram_gram_idx'),
+        ]
+
+    def __str__(self):
+        return f"'{self.gram}' in {self.field} of {self.organization_id}"
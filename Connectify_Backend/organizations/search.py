@@ -0,0 +1,30 @@
+from accounts.trigrams import index_trigrams, match_trigrams
+from .models import OrganizationTrigram
+
+# Fields compared as a whole to the query
+ORGANIZATION_SEARCH_FIELDS = ('name',)
+
+# Longer fields where the query only needs to resemble a part
+ORGANIZATION_SEARCH_WORD_FIELDS = ('description',)
+
+
+def index_organization(organization):
+    """Write the search entries of an organization"""
+    index_trigrams(
+        OrganizationTrigram,
+        'organization',
+        organization,
+        ORGANIZATION_SEARCH_FIELDS + ORGANIZATION_SEARCH_WORD_FIELDS
+    )
+
+
+def match_organizations(organizations, query):
+    """Get the organizations whose name or description match the query, best matches first"""
+    return match_trigrams(
+        organizations,
+        query,
+        OrganizationTrigram,
+        'organization',
+        ORGANIZATION_SEARCH_FIELDS,
+        ORGANIZATION_SEARCH_WORD_FIELDS
+    )
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Organization
+from .search import index_organization
+
+
+@receiver(post_save, sender=Organization)
+def index_organization_on_save(sender, instance, **kwargs):
+    """Keep the search entries of an organization up to date"""
+    index_organization(instance)
+
@@ -1,4 +1,5 @@
 import pytest
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework.test import APIClient
 from django.contrib.auth import get_user_model
@@ -6,6 +7,11 @@ from organizations.models import Organization
 
 User = get_user_model()
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with an empty cache."""
+    cache.clear()
+
 @pytest.fixture
 def api_client():
     """Return an API client for testing."""
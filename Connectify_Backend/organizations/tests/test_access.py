@@ -0,0 +1,68 @@
+import pytest
+from django.contrib.auth import get_user_model
+from organizations.access import get_authorization_context
+from organizations.models import OrganizationAdmins
+
+User = get_user_model()
+
+def fresh(user):
+    """Load the user again, as the next request would"""
+    return User.objects.get(pk=user.pk)
+
+# Test the per-request authorization context
+@pytest.mark.django_db
+class TestAuthorizationContext:
+    def test_context_lists_organizations(self, regular_user, user_organization, admin_organization):
+        """Test that the context holds the organizations a user belongs to and administers"""
+        OrganizationAdmins.objects.create(organization=user_organization, admin=regular_user)
+
+        context = get_authorization_context(fresh(regular_user))
+
+        assert context.is_member(user_organization)
+        assert context.is_admin(user_organization.id)
+        assert not context.is_member(admin_organization)
+        assert not context.is_system_admin
+
+    def test_context_is_loaded_once_per_request(self, regular_user, user_organization, django_assert_num_queries):
+        """Test that checks after the first one run no queries"""
+        user = fresh(regular_user)
+        next_user = fresh(regular_user)
+        with django_assert_num_queries(2):
+            get_authorization_context(user)
+        with django_assert_num_queries(0):
+            assert get_authorization_context(user).is_member(user_organization)
+        # The next request reads the organizations again, so no other process can serve stale ones
+        with django_assert_num_queries(2):
+            assert get_authorization_context(next_user).is_member(user_organization)
+
+    def test_membership_changes_apply_to_the_next_request(self, regular_user, user_organization, admin_organization):
+        """Test that adding and removing members is seen by the next request"""
+        get_authorization_context(fresh(regular_user))
+
+        admin_organization.users.add(regular_user)
+        assert get_authorization_context(fresh(regular_user)).is_member(admin_organization)
+
+        regular_user.organizations.remove(user_organization)
+        assert not get_authorization_context(fresh(regular_user)).is_member(user_organization)
+
+        admin_organization.users.clear()
+        assert not get_authorization_context(fresh(regular_user)).is_member(admin_organization)
+
+    def test_admin_changes_apply_to_the_next_request(self, regular_user, user_organization):
+        """Test that granting and revoking admin roles is seen by the next request"""
+        get_authorization_context(fresh(regular_user))
+
+        admin = OrganizationAdmins.objects.create(organization=user_organization, admin=regular_user)
+        assert get_authorization_context(fresh(regular_user)).is_admin(user_organization)
+
+        admin.delete()
+        assert not get_authorization_context(fresh(regular_user)).is_admin(user_organization)
+
+    def test_deleted_organizations_apply_to_the_next_request(self, regular_user, user_organization):
+        """Test that members of a deleted organization no longer belong to it"""
+        organization_id = user_organization.id
+        get_authorization_context(fresh(regular_user))
+
+        user_organization.delete()
+
+        assert not get_authorization_context(fresh(regular_user)).is_member(organization_id)
@@ -0,0 +1,33 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+def search(api_client, token, query):
+    """Get the names of the organizations a search returns"""
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    response = api_client.get(reverse('organizations:organization_search'), {'q': query})
+    assert response.status_code == status.HTTP_200_OK
+    return [org['name'] for org in response.data]
+
+# Test organization search
+@pytest.mark.django_db
+class TestOrganizationSearch:
+    def test_name_prefix_and_typos(self, api_client, admin_token, user_organization, admin_organization):
+        """Test that organizations are found by name prefix and by misspelled names"""
+        assert search(api_client, admin_token, 'use') == ['User Organization']
+        assert sorted(search(api_client, admin_token, 'organisation')) == ['Admin Organization', 'User Organization']
+
+    def test_description_words(self, api_client, admin_token, user_organization):
+        """Test that a word of the description is enough to find an organization"""
+        assert search(api_client, admin_token, 'regulr') == ['User Organization']
+
+    def test_members_only_search_their_organizations(self, api_client, user_token, user_organization, admin_organization):
+        """Test that regular users only find the organizations they belong to"""
+        assert search(api_client, user_token, 'organization') == ['User Organization']
+
+    def test_entries_follow_updates(self, api_client, admin_token, user_organization):
+        """Test that renaming an organization replaces its search entries"""
+        user_organization.name = 'Chess Club'
+        user_organization.save()
+
+        assert search(api_client, admin_token, 'chess') == ['Chess Club']
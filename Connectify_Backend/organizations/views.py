@@ -7,6 +7,7 @@ from django.shortcuts import get_object_or_404
 from django.db.models import Q
 from django.contrib.auth import get_user_model
 
+from .access import get_authorization_context
 from .models import Organization, OrganizationAdmins
 from .serializers import (
     OrganizationSerializer, 
@@ -18,12 +19,13 @@ from .serializers import (
     UserSerializer
 )
 from accounts.permissions import IsAdminUser
+from .search import match_organizations
 
 User = get_user_model()
 
 def is_organization_admin(user, organization):
     """Check if a user is an admin of the organization"""
-    return OrganizationAdmins.objects.filter(organization=organization, admin=user).exists()
+    return get_authorization_context(user).is_admin(organization)
 
 # Create Organization
 @api_view(['POST'])
@@ -90,9 +92,10 @@ def get_organization_detail(request, pk):
     organization = get_object_or_404(Organization, pk=pk)
     
     # Check if user is a member or an admin of the organization
-    is_member = organization.users.filter(id=request.user.id).exists()
-    is_admin = is_organization_admin(request.user, organization)
-    is_system_admin = request.user.role == 'ADMIN'
+    context = get_authorization_context(request.user)
+    is_member = context.is_member(organization)
+    is_admin = context.is_admin(organization)
+    is_system_admin = context.is_system_admin
     
     if not (is_member or is_admin or is_system_admin):
         return Response(
@@ -350,9 +353,10 @@ def get_organization_admins(request, pk):
     organization = get_object_or_404(Organization, pk=pk)
     
     # Check if user is a member or an admin of the organization or a system admin
-    is_member = organization.users.filter(id=request.user.id).exists()
-    is_org_admin = is_organization_admin(request.user, organization)
-    is_system_admin = request.user.role == 'ADMIN'
+    context = get_authorization_context(request.user)
+    is_member = context.is_member(organization)
+    is_org_admin = context.is_admin(organization)
+    is_system_admin = context.is_system_admin
     
     if not (is_member or is_org_admin or is_system_admin):
         return Response(
@@ -382,20 +386,15 @@ def search_organizations(request):
     
     # If user is system admin, search all organizations
     if request.user.role == 'ADMIN':
-        organizations = Organization.objects.filter(
-            Q(name__icontains=query) | Q(description__icontains=query)
-        )
+        organizations = Organization.objects.all()
     else:
         # Otherwise, only search organizations the user is a member of or admin of
-        member_orgs = request.user.organizations.filter(
-            Q(name__icontains=query) | Q(description__icontains=query)
-        )
-        admin_orgs = Organization.objects.filter(
-            organization_admins__admin=request.user
-        ).filter(
-            Q(name__icontains=query) | Q(description__icontains=query)
-        )
-        organizations = (member_orgs | admin_orgs).distinct()
+        organizations = Organization.objects.filter(
+            Q(users=request.user) | Q(organization_admins__admin=request.user)
+        ).distinct()
+    
+    # Prefix and fuzzy matches on the trigram indexes, best matches first
+    organizations = match_organizations(organizations, query)
     
     serializer = OrganizationSerializer(organizations, many=True)
     return Response(serializer.data)
@@ -0,0 +1,51 @@
+from collections import defaultdict
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .models import CommentReaction, PostComment
+
+# Replies loaded along with each top-level comment of a thread page
+COMMENT_INLINE_REPLIES = getattr(settings, 'POSTS_COMMENT_INLINE_REPLIES', 3)
+
+# Latest reactions shown with each comment
+COMMENT_INLINE_REACTIONS = 5
+
+
+def get_first_replies(comment_ids, limit=COMMENT_INLINE_REPLIES):
+    """
+    Get the oldest replies of each of the given comments, in a single windowed query.
+    One reply more than the limit is returned for threads that continue.
+    """
+    rows = PostComment.objects.filter(
+        parent_comment_id__in=comment_ids
+    ).annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=[F('parent_comment_id')],
+            order_by=[F('created_at').asc(), F('id').asc()]
+        )
+    ).filter(position__lte=limit + 1).select_related('user').order_by('parent_comment_id', 'position')
+
+    replies = defaultdict(list)
+    for reply in rows:
+        replies[reply.parent_comment_id].append(reply)
+    return replies
+
+
+def get_latest_reactions(comment_ids, limit=COMMENT_INLINE_REACTIONS):
+    """Get the most recent reactions of each of the given comments, in a single windowed query"""
+    rows = CommentReaction.objects.filter(
+        comment_id__in=comment_ids
+    ).annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=[F('comment_id')],
+            order_by=[F('created_at').desc(), F('id').desc()]
+        )
+    ).filter(position__lte=limit).select_related('user', 'reaction_type').order_by('comment_id', 'position')
+
+    reactions = defaultdict(list)
+    for reaction in rows:
+        reactions[reaction.comment_id].append(reaction)
+    return reactions
@@ -0,0 +1,206 @@
+import random
+from collections import defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Post, PostCounterShard, PostReaction, PostReactionCount
+
+# Number of shard rows a hot post counter is spread over
+COUNTER_SHARDS = getattr(settings, 'POSTS_COUNTER_SHARDS', 16)
+
+# Counter writes per minute after which a post switches to sharded counters
+HOT_POST_WRITES_PER_MINUTE = getattr(settings, 'POSTS_HOT_POST_WRITES_PER_MINUTE', 600)
+
+# Shards of the per-type reaction counts use this prefix followed by the reaction type id
+REACTION_SHARD_PREFIX = 'reaction:'
+
+
+def update_counter(model, pk, field, delta):
+    """
+    Atomically add delta to a counter column, never going below zero.
+    Only the counter column is written, so updated_at and other fields are untouched.
+    """
+    model.objects.filter(pk=pk).update(**{field: Greatest(F(field) + delta, Value(0))})
+
+
+def touch_post_details(posts):
+    """
+    Give posts a new detail version after a write, so their cached detail responses are no longer served.
+    The version lives in the post row, so every process sees it at once. Hot posts are left alone so
+    their writers do not queue on the post row; their details are only cached for a short period instead.
+    """
+    posts.filter(sharded_counters=False).update(
+        detail_version=F('detail_version') + 1,
+        detail_modified_at=timezone.now()
+    )
+
+
+def update_post_counter(post, field, delta):
+    """
+    Add delta to a counter of a post.
+    Hot posts write to a random shard so concurrent writers do not queue on the post row.
+    """
+    writes = record_post_write(post.id)
+    if post.sharded_counters:
+        update_counter_shard(post.id, field, random.randrange(COUNTER_SHARDS), delta)
+        return
+
+    update_counter(Post, post.id, field, delta)
+    if writes >= HOT_POST_WRITES_PER_MINUTE:
+        Post.objects.filter(pk=post.id, sharded_counters=False).update(sharded_counters=True)
+
+
+def update_counter_shard(post_id, field, shard, delta):
+    """Add delta to one shard of a post counter"""
+    lookup = {'post_id': post_id, 'field': field, 'shard': shard}
+    if PostCounterShard.objects.filter(**lookup).update(count=F('count') + delta):
+        return
+
+    try:
+        with transaction.atomic():
+            PostCounterShard.objects.create(count=delta, **lookup)
+    except IntegrityError:
+        PostCounterShard.objects.filter(**lookup).update(count=F('count') + delta)
+
+
+def get_post_write_key(post_id):
+    return f"posts:counter_writes:{post_id}:{timezone.now().strftime('%Y%m%d%H%M')}"
+
+
+def record_post_write(post_id):
+    """Count a counter write on a post and return the writes seen this minute"""
+    key = get_post_write_key(post_id)
+    cache.add(key, 0, timeout=120)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # The key expired between add and incr
+        return 0
+
+
+def get_shard_totals(posts):
+    """Get the counter amounts still held in shards, by post and field"""
+    totals = defaultdict(dict)
+    post_ids = [post.id for post in posts if post.sharded_counters]
+    if not post_ids:
+        return totals
+
+    rows = PostCounterShard.objects.filter(
+        post_id__in=post_ids
+    ).order_by().values('post_id', 'field').annotate(total=Sum('count'))
+
+    for row in rows:
+        totals[row['post_id']][row['field']] = row['total']
+    return totals
+
+
+def fold_counter_shards(post_id):
+    """Move the amounts held in the shards of a post into its counter columns"""
+    with transaction.atomic():
+        # Lock the post first, so the sharded flag cannot change while the shards are folded
+        post = Post.objects.select_for_update().filter(pk=post_id).only('id').first()
+        if post is None:
+            return
+
+        # Locking the shards makes concurrent increments wait until they are folded
+        shards = list(PostCounterShard.objects.select_for_update().filter(post_id=post_id).exclude(count=0))
+        totals = defaultdict(int)
+        for shard in shards:
+            totals[shard.field] += shard.count
+
+        PostCounterShard.objects.filter(pk__in=[shard.pk for shard in shards]).update(count=0)
+        for field, delta in totals.items():
+            if field.startswith(REACTION_SHARD_PREFIX):
+                adjust_reaction_count(post_id, int(field[len(REACTION_SHARD_PREFIX):]), delta)
+            else:
+                update_counter(Post, post_id, field, delta)
+        if totals:
+            touch_post_details(Post.objects.filter(pk=post_id))
+
+        # Posts that cooled down go back to writing their row directly, with a new detail
+        # version since the writes made while they were hot did not renew it
+        if (cache.get(get_post_write_key(post_id)) or 0) < HOT_POST_WRITES_PER_MINUTE:
+            Post.objects.filter(pk=post_id, sharded_counters=True).update(
+                sharded_counters=False,
+                detail_version=F('detail_version') + 1,
+                detail_modified_at=timezone.now()
+            )
+
+
+def fold_all_counter_shards():
+    """Fold the shards of every hot post or post with pending amounts, returning how many were folded"""
+    post_ids = set(
+        PostCounterShard.objects.exclude(count=0).order_by().values_list('post_id', flat=True).distinct()
+    )
+    post_ids.update(Post.objects.filter(sharded_counters=True).values_list('id', flat=True))
+    for post_id in post_ids:
+        fold_counter_shards(post_id)
+    return len(post_ids)
+
+
+def adjust_reaction_count(post_id, reaction_type_id, delta):
+    """Add delta to the number of reactions of one type on a post"""
+    updated = PostReactionCount.objects.filter(
+        post_id=post_id,
+        reaction_type_id=reaction_type_id
+    ).update(count=F('count') + delta)
+
+    if updated or delta <= 0:
+        return
+
+    # First reaction of this type: create the row, unless a concurrent request just did
+    try:
+        with transaction.atomic():
+            PostReactionCount.objects.create(post_id=post_id, reaction_type_id=reaction_type_id, count=delta)
+    except IntegrityError:
+        PostReactionCount.objects.filter(
+            post_id=post_id,
+            reaction_type_id=reaction_type_id
+        ).update(count=F('count') + delta)
+
+
+def record_reaction_change(post, old_type_id=None, new_type_id=None):
+    """
+    Update the reaction breakdown of a post after a reaction was added, changed or removed.
+    Hot posts write to a shard of the type's count, like their other counters.
+    """
+    if old_type_id == new_type_id:
+        return
+    for reaction_type_id, delta in ((old_type_id, -1), (new_type_id, 1)):
+        if reaction_type_id is None:
+            continue
+        if post.sharded_counters:
+            field = f"{REACTION_SHARD_PREFIX}{reaction_type_id}"
+            update_counter_shard(post.id, field, random.randrange(COUNTER_SHARDS), delta)
+        else:
+            adjust_reaction_count(post.id, reaction_type_id, delta)
+
+
+def rebuild_reaction_counts(post_ids=None):
+    """Recompute the reaction breakdown from the reactions table"""
+    reactions = PostReaction.objects.all()
+    counts = PostReactionCount.objects.all()
+    shards = PostCounterShard.objects.filter(field__startswith=REACTION_SHARD_PREFIX)
+    if post_ids is not None:
+        reactions = reactions.filter(post_id__in=post_ids)
+        counts = counts.filter(post_id__in=post_ids)
+        shards = shards.filter(post_id__in=post_ids)
+
+    rows = reactions.order_by().values('post_id', 'reaction_type_id').annotate(total=Count('id'))
+
+    with transaction.atomic():
+        counts.delete()
+        # The recount already includes the amounts pending in shards
+        shards.update(count=0)
+        PostReactionCount.objects.bulk_create(
+            [
+                PostReactionCount(post_id=row['post_id'], reaction_type_id=row['reaction_type_id'], count=row['total'])
+                for row in rows.iterator()
+            ],
+            batch_size=1000
+        )
+        touch_post_details(Post.objects.filter(pk__in=post_ids) if post_ids is not None else Post.objects.all())
@@ -0,0 +1,99 @@
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .counters import touch_post_details
+from .models import CommentReaction, Post, PostComment, PostReaction, PostShare, PostTag
+from .serializers import PostDetailSerializer
+
+# Seconds a post detail response is cached; writes to the post replace it sooner
+POST_DETAIL_CACHE_TIMEOUT = getattr(settings, 'POSTS_POST_DETAIL_CACHE_TIMEOUT', 300)
+
+# Posts whose detail version is renewed per statement after a change to a user they show
+DETAIL_TOUCH_BATCH_SIZE = 500
+
+# Seconds the detail of a hot post is served unchanged, since writes to it do not renew its version
+HOT_POST_DETAIL_CACHE_TIMEOUT = getattr(settings, 'POSTS_HOT_POST_DETAIL_CACHE_TIMEOUT', 10)
+
+
+def get_hot_post_period(post):
+    """Get the start of the period the detail of a hot post is served unchanged for, or None for other posts"""
+    if not post.sharded_counters:
+        return None
+    return int(time.time() // HOT_POST_DETAIL_CACHE_TIMEOUT) * HOT_POST_DETAIL_CACHE_TIMEOUT
+
+
+def get_post_detail_tag(post):
+    """
+    Get the ETag value of a post's detail response, from the version stored in the post row.
+    Hot posts also change tag every period, as their writers leave the post row alone.
+    """
+    period = get_hot_post_period(post)
+    if period is None:
+        return f"{post.id}-{post.detail_version}"
+    return f"{post.id}-{post.detail_version}-{period}"
+
+
+def get_post_detail_modified(post):
+    """Get the timestamp of the last change of a post's detail response"""
+    return max(post.detail_modified_at.timestamp(), get_hot_post_period(post) or 0)
+
+
+def touch_post_detail(post_id):
+    """Give a post a new detail version after a write, so its cached response is no longer served"""
+    touch_post_details(Post.objects.filter(pk=post_id))
+
+
+def get_posts_showing_user(user_id):
+    """Get the posts whose detail shows a user, as author, commenter, reacting user, sharer or tagged user"""
+    return Post.objects.filter(
+        Q(user=user_id) |
+        Q(pk__in=PostComment.objects.filter(user=user_id).values('post_id')) |
+        Q(pk__in=CommentReaction.objects.filter(user=user_id).values('comment__post_id')) |
+        Q(pk__in=PostReaction.objects.filter(user=user_id).values('post_id')) |
+        Q(pk__in=PostShare.objects.filter(user=user_id).values('post_id')) |
+        Q(pk__in=PostTag.objects.filter(user=user_id).values('post_id'))
+    )
+
+
+def touch_user_post_details(user_id):
+    """Renew the details of the posts showing a user, a batch at a time so no statement locks them all"""
+    post_ids = get_posts_showing_user(user_id).order_by('id').values_list('id', flat=True)
+    batch = []
+    for post_id in post_ids.iterator():
+        batch.append(post_id)
+        if len(batch) == DETAIL_TOUCH_BATCH_SIZE:
+            touch_post_details(Post.objects.filter(pk__in=batch))
+            batch = []
+    if batch:
+        touch_post_details(Post.objects.filter(pk__in=batch))
+
+
+def start_user_post_details_touch(user_id):
+    """Renew the details showing a user in a background thread, once the change to the user is committed"""
+    transaction.on_commit(
+        lambda: threading.Thread(target=run_user_post_details_touch, args=(user_id,), daemon=True).start()
+    )
+
+
+def run_user_post_details_touch(user_id):
+    try:
+        touch_user_post_details(user_id)
+    finally:
+        # The thread had its own database connection
+        connection.close()
+
+
+def get_post_detail_data(post, tag):
+    """Get the serialized detail of a post for its current version, serializing it on a miss"""
+    key = f"posts:detail:{tag}"
+    data = cache.get(key)
+    if data is None:
+        timeout = HOT_POST_DETAIL_CACHE_TIMEOUT if post.sharded_counters else POST_DETAIL_CACHE_TIMEOUT
+        post = Post.objects.select_related('user').defer('search_vector').get(pk=post.id)
+        data = PostDetailSerializer(post).data
+        cache.set(key, data, timeout)
+    return data
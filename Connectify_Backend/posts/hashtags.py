@@ -0,0 +1,108 @@
+import re
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from accounts.models import User
+from .models import Hashtag, PostHashtag, PostTag, Trend
+from .suggest import hashtag_index
+from .trending import invalidate_trends_cache, record_hashtag_activity, trim_trend_posts
+
+# A hashtag starts a word: "#django," and "##Django" both give DJANGO
+HASHTAG_PATTERN = re.compile(r'(?<!\S)#+(\w+)')
+
+HASHTAG_MAX_LENGTH = Hashtag._meta.get_field('name').max_length
+
+
+def extract_hashtags(content):
+    """Get the normalized hashtag names of a text, without duplicates, in order of appearance"""
+    names = []
+    for match in HASHTAG_PATTERN.finditer(content or ''):
+        # Hashtags are stored uppercase for case-insensitive lookups
+        name = match.group(1).upper()[:HASHTAG_MAX_LENGTH]
+        if name not in names:
+            names.append(name)
+    return names
+
+
+def resolve_hashtags(names):
+    """Get the Hashtag rows of the given names, creating the missing ones in bulk"""
+    if not names:
+        return []
+    Hashtag.objects.bulk_create([Hashtag(name=name) for name in names], ignore_conflicts=True)
+    return list(Hashtag.objects.filter(name__in=names))
+
+
+def set_post_hashtags(post, content, created=False):
+    """
+    Make the hashtags of a post match its content.
+    Only the difference with the stored hashtags is written, and trends are updated once.
+    """
+    hashtags = resolve_hashtags(extract_hashtags(content))
+    wanted_ids = {hashtag.id for hashtag in hashtags}
+    current_ids = set() if created else set(
+        PostHashtag.objects.filter(post=post).values_list('hashtag_id', flat=True)
+    )
+
+    added_ids = wanted_ids - current_ids
+    removed_ids = current_ids - wanted_ids
+
+    with transaction.atomic():
+        if removed_ids:
+            PostHashtag.objects.filter(post=post, hashtag_id__in=removed_ids).delete()
+        if added_ids:
+            PostHashtag.objects.bulk_create(
+                [PostHashtag(post=post, hashtag_id=hashtag_id) for hashtag_id in added_ids],
+                ignore_conflicts=True
+            )
+        update_trends(post, added_ids, removed_ids)
+
+    # New hashtags become suggestions right away, and used ones move up
+    hashtag_index.add([hashtag.name for hashtag in hashtags if hashtag.id in added_ids], used=True)
+
+    return [hashtag.name for hashtag in hashtags]
+
+
+def update_trends(post, added_ids=(), removed_ids=()):
+    """Add a post to and remove it from the trends of the given hashtags"""
+    now = timezone.now()
+    TrendPost = Trend.posts.through
+
+    if added_ids:
+        Trend.objects.bulk_create(
+            [Trend(hashtag_id=hashtag_id) for hashtag_id in added_ids],
+            ignore_conflicts=True
+        )
+        trend_ids = list(Trend.objects.filter(hashtag_id__in=added_ids).values_list('id', flat=True))
+        TrendPost.objects.bulk_create(
+            [TrendPost(trend_id=trend_id, post_id=post.id) for trend_id in trend_ids],
+            ignore_conflicts=True
+        )
+        Trend.objects.filter(id__in=trend_ids).update(post_count=F('post_count') + 1, updated_at=now)
+        trim_trend_posts(trend_ids)
+        record_hashtag_activity(added_ids, post.created_at, 1)
+
+    if removed_ids:
+        trend_ids = list(Trend.objects.filter(hashtag_id__in=removed_ids).values_list('id', flat=True))
+        TrendPost.objects.filter(trend_id__in=trend_ids, post_id=post.id).delete()
+        Trend.objects.filter(id__in=trend_ids).update(
+            post_count=Greatest(F('post_count') - 1, Value(0)),
+            updated_at=now
+        )
+        record_hashtag_activity(removed_ids, post.created_at, -1)
+        # Trends without posts are dropped
+        Trend.objects.filter(id__in=trend_ids, post_count=0).delete()
+        # Old posts leave the post lists without changing any score
+        invalidate_trends_cache()
+
+
+def set_post_tags(post, user_ids):
+    """Tag the given users in a post, ignoring unknown users and existing tags"""
+    if not user_ids:
+        return
+    users = User.objects.filter(id__in=user_ids).values_list('id', flat=True)
+    PostTag.objects.bulk_create(
+        [PostTag(post=post, user_id=user_id) for user_id in users],
+        ignore_conflicts=True
+    )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from accounts.models import User
+from posts.timeline import rebuild_timeline, rebuild_public_timeline
+
+class Command(BaseCommand):
+    help = 'Rebuilds the materialized home timelines from existing posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help='Only rebuild the timeline of this user ID (can be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+
+        if not user_ids:
+            rebuild_public_timeline()
+            self.stdout.write(self.style.SUCCESS('Public timeline rebuilt'))
+            user_ids = list(User.objects.values_list('id', flat=True))
+
+        count = 0
+        for user_id in user_ids:
+            rebuild_timeline(user_id)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} user timelines'))
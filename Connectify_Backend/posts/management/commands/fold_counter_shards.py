@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from posts.counters import fold_all_counter_shards
+
+class Command(BaseCommand):
+    help = 'Folds sharded counters of hot posts back into their post rows'
+
+    def handle(self, *args, **options):
+        count = fold_all_counter_shards()
+        self.stdout.write(self.style.SUCCESS(f'Folded counter shards of {count} posts'))
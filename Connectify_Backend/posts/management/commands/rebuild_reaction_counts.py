@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from posts.counters import rebuild_reaction_counts
+
+class Command(BaseCommand):
+    help = 'Rebuilds the per-post reaction breakdown from existing reactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--post',
+            type=int,
+            action='append',
+            dest='post_ids',
+            help='Only rebuild the breakdown of this post ID (can be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        rebuild_reaction_counts(options['post_ids'])
+        self.stdout.write(self.style.SUCCESS('Reaction counts rebuilt'))
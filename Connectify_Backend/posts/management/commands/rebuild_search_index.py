@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from posts.search import rebuild_search_index
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index of posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of posts indexed per batch'
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_search_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} posts'))
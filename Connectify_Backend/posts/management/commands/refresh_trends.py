@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from posts.trending import rebuild_hashtag_activity, refresh_trends
+
+class Command(BaseCommand):
+    help = 'Prunes expired hashtag activity and recomputes trend scores (also started in the background by the trends endpoints when stale)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Recompute the hourly activity buckets from existing posts first'
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            rebuild_hashtag_activity()
+            self.stdout.write(self.style.SUCCESS('Hashtag activity rebuilt'))
+
+        count = refresh_trends()
+        self.stdout.write(self.style.SUCCESS(f'Refreshed {count} trends'))
@@ -0,0 +1,18 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from posts.media import resume_pending_uploads
+
+class Command(BaseCommand):
+    help = 'Uploads the post media left pending by a stopped process'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than',
+            type=int,
+            default=15,
+            help='Only resume media pending for more than this many minutes'
+        )
+
+    def handle(self, *args, **options):
+        count = resume_pending_uploads(older_than=timedelta(minutes=options['older_than']))
+        self.stdout.write(self.style.SUCCESS(f'Resumed {count} uploads'))
@@ -0,0 +1,377 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from accounts.dedup import find_stored_file, forget_stored_file, new_content_hash, register_stored_file
+from accounts.images import FULL_VARIANT, ImageProcessingError, discard_variants, preprocess_image
+
+from .detail import touch_post_detail
+from .models import PostMedia
+from .utils import delete_from_cloudinary, upload_to_cloudinary
+
+logger = logging.getLogger(__name__)
+
+# Class storing uploaded media, replaceable by LocalMediaStorage in development and tests
+MEDIA_STORAGE_BACKEND = getattr(settings, 'POSTS_MEDIA_STORAGE_BACKEND', 'posts.media.CloudinaryMediaStorage')
+
+# Background upload threads per process; 0 uploads inline once the post is committed
+MEDIA_UPLOAD_WORKERS = getattr(settings, 'POSTS_MEDIA_UPLOAD_WORKERS', 4)
+
+# Attempts made at uploading a file before its media is marked as failed
+MEDIA_UPLOAD_ATTEMPTS = getattr(settings, 'POSTS_MEDIA_UPLOAD_ATTEMPTS', 3)
+
+# Seconds waited before the first retry, doubled for each following one
+MEDIA_UPLOAD_RETRY_DELAY = getattr(settings, 'POSTS_MEDIA_UPLOAD_RETRY_DELAY', 2)
+
+# Most files attached to a single post
+MEDIA_MAX_FILES = getattr(settings, 'POSTS_MEDIA_MAX_FILES', 10)
+
+# Kinds of files posts accept, from the first part of their content type
+MEDIA_TYPES = [media_type for media_type, label in PostMedia.MEDIA_TYPES]
+
+# Directory holding uploads until they reach the storage backend
+MEDIA_SPOOL_DIR = getattr(settings, 'POSTS_MEDIA_SPOOL_DIR', None) or tempfile.gettempdir()
+
+
+class MediaUploadError(Exception):
+    pass
+
+
+class CloudinaryMediaStorage:
+    """Store media on Cloudinary"""
+
+    def upload(self, path, folder):
+        result = upload_to_cloudinary(path, folder=folder)
+        if not result['success']:
+            raise MediaUploadError(result['error'])
+        return {'url': result['url'], 'public_id': result['public_id']}
+
+    def delete(self, public_id):
+        delete_from_cloudinary(public_id)
+
+
+class LocalMediaStorage:
+    """Store media under MEDIA_ROOT, as a stand-in for Cloudinary"""
+
+    def __init__(self):
+        self.storage = FileSystemStorage()
+
+    def upload(self, path, folder):
+        with open(path, 'rb') as source:
+            name = self.storage.save(f'{folder}/{os.path.basename(path)}', source)
+        return {'url': self.storage.url(name), 'public_id': name}
+
+    def delete(self, public_id):
+        self.storage.delete(public_id)
+
+
+def get_media_storage():
+    return import_string(MEDIA_STORAGE_BACKEND)()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Get the pool running the uploads of this process, starting it on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MEDIA_UPLOAD_WORKERS, thread_name_prefix='media-upload')
+        return _executor
+
+
+def spool_upload(uploaded_file):
+    """
+    Copy an uploaded file to the spool directory, where it outlives the request.
+    Returns its path and the hash of its content, computed while copying unless already known.
+    """
+    suffix = os.path.splitext(uploaded_file.name or '')[1]
+    with tempfile.NamedTemporaryFile(dir=MEDIA_SPOOL_DIR, prefix='post-media-', suffix=suffix, delete=False) as spool:
+        # A finished chunked upload was hashed as it arrived, so its file is moved instead
+        upload_path = getattr(uploaded_file, 'upload_path', None)
+        if upload_path and uploaded_file.content_hash:
+            try:
+                os.replace(upload_path, spool.name)
+                return spool.name, uploaded_file.content_hash
+            except OSError:
+                # The upload directory is on another file system
+                pass
+
+        content_hash = new_content_hash()
+        for chunk in uploaded_file.chunks():
+            content_hash.update(chunk)
+            spool.write(chunk)
+    return spool.name, content_hash.hexdigest()
+
+
+def validate_media_files(uploaded_files):
+    """Check the files attached to a new post, raising MediaUploadError with the reason"""
+    if len(uploaded_files) > MEDIA_MAX_FILES:
+        raise MediaUploadError(f"A post can have at most {MEDIA_MAX_FILES} media files")
+    for uploaded_file in uploaded_files:
+        if get_media_type(uploaded_file) not in MEDIA_TYPES:
+            raise MediaUploadError(f"Unsupported media type for {uploaded_file.name}")
+
+
+def get_media_type(uploaded_file):
+    return (uploaded_file.content_type or '').split('/')[0]  # 'image' or 'video'
+
+
+def add_post_media(post, uploaded_files):
+    """
+    Attach uploaded files to a post as pending media, in the order they were sent.
+    Their uploads start together once the post is committed, so a post is ready
+    after about as long as its slowest file takes.
+    """
+    sources = []
+    try:
+        for uploaded_file in uploaded_files:
+            sources.append(spool_upload(uploaded_file))
+    except Exception:
+        for uploaded_file, (source, content_hash) in zip(uploaded_files, sources):
+            upload_path = getattr(uploaded_file, 'upload_path', None)
+            if upload_path and not os.path.exists(upload_path):
+                # Give a moved chunked upload its file back, so it can be attached again
+                os.replace(source, upload_path)
+            else:
+                discard_spool(source)
+        raise
+
+    media = PostMedia.objects.bulk_create([
+        PostMedia(
+            post=post,
+            media_type=get_media_type(uploaded_file),
+            status=PostMedia.STATUS_PENDING,
+            source=source,
+            content_hash=content_hash,
+            position=position
+        )
+        for position, (uploaded_file, (source, content_hash)) in enumerate(zip(uploaded_files, sources))
+    ])
+    # Fetched back since bulk_create does not set primary keys on every database
+    media_ids = list(PostMedia.objects.filter(post=post).order_by('position').values_list('id', flat=True))
+
+    def schedule_uploads():
+        for media_id in media_ids:
+            schedule_upload(media_id)
+
+    transaction.on_commit(schedule_uploads)
+    return media
+
+
+def schedule_upload(media_id):
+    """Hand the upload of pending media to the worker pool, returning its future"""
+    if MEDIA_UPLOAD_WORKERS:
+        return get_executor().submit(run_upload, media_id)
+    process_upload(media_id)
+
+
+def run_upload(media_id):
+    """Run an upload in a worker thread, which owns its database connection"""
+    close_old_connections()
+    try:
+        process_upload(media_id)
+    except Exception:
+        logger.exception(f"Upload of media {media_id} crashed")
+    finally:
+        close_old_connections()
+
+
+def process_upload(media_id):
+    """Resize and upload pending media to the storage backend, retrying uploads before giving up"""
+    media = PostMedia.objects.select_related('post').filter(id=media_id, status=PostMedia.STATUS_PENDING).first()
+    if media is None:
+        # Already processed, or deleted with its post
+        return
+
+    storage = get_media_storage()
+    files = {}
+    stored_file = find_stored_file(media.content_hash, 'posts')
+    if stored_file is not None:
+        # The same content was stored before, so neither resize nor upload it again
+        media.file = stored_file.url
+        media.public_id = stored_file.public_id
+        media.variants = stored_file.variants
+        media.status = PostMedia.STATUS_READY
+    else:
+        try:
+            files = prepare_media_files(media)
+        except ImageProcessingError as e:
+            # Retrying cannot fix a file that is not a valid image
+            media.error = str(e)
+            media.status = PostMedia.STATUS_FAILED
+
+    while files:
+        media.attempts += 1
+        try:
+            stored = store_media_files(storage, files)
+        except Exception as e:
+            media.error = str(e)
+            if media.attempts >= MEDIA_UPLOAD_ATTEMPTS:
+                media.status = PostMedia.STATUS_FAILED
+                break
+            PostMedia.objects.filter(id=media.id).update(attempts=media.attempts, error=media.error)
+            time.sleep(MEDIA_UPLOAD_RETRY_DELAY * 2 ** (media.attempts - 1))
+        else:
+            full = stored.pop(FULL_VARIANT)
+            media.file = full['url']
+            media.public_id = full['public_id']
+            media.variants = stored
+            media.status = PostMedia.STATUS_READY
+            media.error = ''
+            break
+
+    # Only pending media is updated: the post may have been deleted, or another
+    # of its files may have failed, during the upload
+    updated = PostMedia.objects.filter(id=media.id, status=PostMedia.STATUS_PENDING).update(
+        file=media.file,
+        public_id=media.public_id,
+        variants=media.variants,
+        status=media.status,
+        attempts=media.attempts,
+        error=media.error,
+        source=''
+    )
+    if not updated:
+        delete_stored_media(storage, media)
+    elif files and media.status == PostMedia.STATUS_READY:
+        register_stored_file(
+            media.content_hash,
+            'posts',
+            media.file,
+            media.public_id,
+            os.path.getsize(media.source),
+            media.variants
+        )
+    discard_variants(files)
+    discard_spool(media.source)
+    if not updated:
+        return
+
+    if media.status == PostMedia.STATUS_FAILED:
+        fail_post_media(media.post_id, storage)
+    # The post detail shows the status of its media
+    touch_post_detail(media.post_id)
+    notify_media_status(media)
+
+
+def prepare_media_files(media):
+    """Get the local files to store for media by variant name, resizing images first"""
+    if media.media_type == 'image':
+        return preprocess_image(media.source)
+    return {FULL_VARIANT: media.source}
+
+
+def store_media_files(storage, files):
+    """Upload all the files of one media, removing the stored ones if any of them fails"""
+    stored = {}
+    try:
+        for name, path in files.items():
+            stored[name] = storage.upload(path, folder='posts')
+    except Exception:
+        for result in stored.values():
+            storage.delete(result['public_id'])
+        raise
+    return stored
+
+
+def delete_stored_media(storage, media):
+    """
+    Remove the stored file of media and its variants from the storage backend,
+    unless other media reusing the same content still show them.
+    """
+    if not media.public_id:
+        return
+    if PostMedia.objects.filter(public_id=media.public_id, status=PostMedia.STATUS_READY).exclude(id=media.id).exists():
+        return
+    forget_stored_file(media.public_id)
+    public_ids = [media.public_id] + [variant['public_id'] for variant in media.variants.values()]
+    for public_id in public_ids:
+        storage.delete(public_id)
+
+
+def fail_post_media(post_id, storage):
+    """
+    Roll back the other media of a post once one of its files failed to upload,
+    so a post never shows only part of its media.
+    """
+    error = 'Another file of the post could not be uploaded'
+    with transaction.atomic():
+        siblings = list(PostMedia.objects.select_for_update().filter(
+            post_id=post_id,
+            status__in=[PostMedia.STATUS_PENDING, PostMedia.STATUS_READY]
+        ))
+        PostMedia.objects.filter(id__in=[sibling.id for sibling in siblings]).update(
+            status=PostMedia.STATUS_FAILED,
+            file='',
+            public_id='',
+            variants={},
+            source='',
+            error=error
+        )
+
+    for sibling in siblings:
+        if sibling.status == PostMedia.STATUS_READY:
+            delete_stored_media(storage, sibling)
+        # Uploads still running see the failure when they finish and delete their files
+        discard_spool(sibling.source)
+
+
+def discard_spool(path):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def notify_media_status(media):
+    """Tell the author's connected clients that an upload finished"""
+    try:
+        async_to_sync(get_channel_layer().group_send)(
+            f"user_{media.post.user_id}",
+            {
+                "type": "media.status",
+                "media_id": media.id,
+                "post_id": media.post_id,
+                "status": media.status,
+                "file": media.file,
+            }
+        )
+    except Exception as e:
+        # Clients can still poll the media status
+        logger.warning(f"Could not notify media status for {media.id}: {e}")
+
+
+def resume_pending_uploads(older_than=timedelta(minutes=15)):
+    """
+    Upload the media left pending by a stopped process, returning how many were resumed.
+    Only media pending for longer than any upload takes is picked up.
+    """
+    resumed = 0
+    pending = PostMedia.objects.filter(
+        status=PostMedia.STATUS_PENDING,
+        uploaded_at__lt=timezone.now() - older_than
+    ).values_list('id', 'post_id', 'source')
+    for media_id, post_id, source in pending:
+        if source and os.path.exists(source):
+            process_upload(media_id)
+            resumed += 1
+        else:
+            PostMedia.objects.filter(id=media_id).update(
+                status=PostMedia.STATUS_FAILED,
+                error='The uploaded file was lost before it could be stored',
+                source=''
+            )
+            touch_post_detail(post_id)
+    return resumed
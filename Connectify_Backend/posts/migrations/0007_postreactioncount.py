@@ -0,0 +1,41 @@
+# Generated by Django 5.1.7 on 2026-10-17 06:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_reaction_counts(apps, schema_editor):
+    PostReaction = apps.get_model('posts', 'PostReaction')
+    PostReactionCount = apps.get_model('posts', 'PostReactionCount')
+    rows = PostReaction.objects.order_by().values('post_id', 'reaction_type_id').annotate(total=Count('id'))
+    PostReactionCount.objects.bulk_create(
+        [
+            PostReactionCount(post_id=row['post_id'], reaction_type_id=row['reaction_type_id'], count=row['total'])
+            for row in rows.iterator()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostReactionCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reaction_counts', to='posts.post')),
+                ('reaction_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_counts', to='posts.reactiontype')),
+            ],
+            options={
+                'unique_together': {('post', 'reaction_type')},
+            },
+        ),
+        migrations.RunPython(populate_reaction_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.7 on 2026-10-17 06:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_postreactioncount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='sharded_counters',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='PostCounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(max_length=20)),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counter_shards', to='posts.post')),
+            ],
+            options={
+                'unique_together': {('post', 'field', 'shard')},
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.7 on 2026-10-17 06:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_post_counter_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trend',
+            name='score',
+            field=models.FloatField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='trend',
+            name='window_count',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.CreateModel(
+            name='HashtagActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(db_index=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('hashtag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='posts.hashtag')),
+            ],
+            options={
+                'unique_together': {('hashtag', 'bucket')},
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.7 on 2026-10-17 06:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_media_status'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='postmedia',
+            options={'ordering': ['position', 'id']},
+        ),
+        migrations.AddField(
+            model_name='postmedia',
+            name='position',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-17 06:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_media_position'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postmedia',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
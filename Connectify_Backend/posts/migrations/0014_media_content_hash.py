@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-17 06:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postmedia',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
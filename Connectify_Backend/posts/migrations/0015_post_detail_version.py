@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-17 07:47
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_media_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='detail_modified_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='detail_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,8 +1,8 @@
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.utils import timezone
 from accounts.models import User
 from organizations.models import Organization
-from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
 
 
 class Post(models.Model):
@@ -32,6 +32,13 @@ class Post(models.Model):
     reaction_count = models.PositiveIntegerField(default=0)
     comment_count = models.PositiveIntegerField(default=0)
     share_count = models.PositiveIntegerField(default=0)
+    # Hot posts spread counter writes over PostCounterShard rows
+    sharded_counters = models.BooleanField(default=False)
+    # Full-text document, maintained by posts.search and GIN-indexed on PostgreSQL
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Bumped by every write shown in the post detail, which its ETag and cache key derive from
+    detail_version = models.PositiveBigIntegerField(default=0, editable=False)
+    detail_modified_at = models.DateTimeField(default=timezone.now, editable=False)
     
     def __str__(self):
         return f"Post by {self.user.username} at {self.created_at.strftime('%Y-%m-%d %H:%M')}"
@@ -40,6 +47,24 @@ class Post(models.Model):
         ordering = ['-created_at']
 
 
+class PostCounterShard(models.Model):
+    """
+    Model holding one slice of a hot post's counter.
+    The exact value of the counter is the post column plus the sum of its shards.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='counter_shards')
+    field = models.CharField(max_length=20)
+    shard = models.PositiveSmallIntegerField()
+    # Signed, since a shard may receive more decrements than increments
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['post', 'field', 'shard']
+    
+    def __str__(self):
+        return f"{self.field} shard {self.shard} of post {self.post.id}"
+
+
 class PostMedia(models.Model):
     """
     Model for storing media (images/videos) associated with posts.
@@ -48,12 +73,37 @@ class PostMedia(models.Model):
         ('image', 'Image'),
         ('video', 'Video'),
     ]
+    STATUS_PENDING = 'pending'
+    STATUS_READY = 'ready'
+    STATUS_FAILED = 'failed'
+    STATUSES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_READY, 'Ready'),
+        (STATUS_FAILED, 'Failed'),
+    ]
     
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='media')
-    file = models.URLField()  # Changed to URLField for Cloudinary URLs
+    file = models.URLField(blank=True)  # Changed to URLField for Cloudinary URLs; empty until uploaded
     media_type = models.CharField(max_length=5, choices=MEDIA_TYPES)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     
+    # Uploads run in the background (see posts.media)
+    status = models.CharField(max_length=10, choices=STATUSES, default=STATUS_READY)
+    public_id = models.CharField(max_length=255, blank=True)
+    # Local copy of the upload, kept until it reaches the storage backend
+    source = models.CharField(max_length=500, blank=True)
+    # SHA-256 of the uploaded content, to reuse an already stored copy of it
+    content_hash = models.CharField(max_length=64, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    # Resized images by size name, each {'url': ..., 'public_id': ...}
+    variants = models.JSONField(default=dict, blank=True)
+    # Order of the file among the media of the post
+    position = models.PositiveSmallIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['position', 'id']
+    
     def __str__(self):
         return f"{self.media_type} for post {self.post.id}"
 
@@ -114,6 +164,22 @@ class PostReaction(models.Model):
         return f"{self.user.username} reacted with {self.reaction_type.name} on post {self.post.id}"
 
 
+class PostReactionCount(models.Model):
+    """
+    Model keeping the number of reactions of each type on a post.
+    Maintained alongside PostReaction so summaries never scan the reactions.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='reaction_counts')
+    reaction_type = models.ForeignKey(ReactionType, on_delete=models.CASCADE, related_name='post_counts')
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['post', 'reaction_type']
+    
+    def __str__(self):
+        return f"{self.count} {self.reaction_type.name} on post {self.post.id}"
+
+
 class CommentReaction(models.Model):
     """
     Model representing reactions on comments.
@@ -198,32 +264,71 @@ class Trend(models.Model):
     post_count = models.PositiveIntegerField(default=0)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Precomputed from HashtagActivity so trending reads are a single indexed query
+    window_count = models.PositiveIntegerField(default=0, db_index=True)
+    score = models.FloatField(default=0, db_index=True)
+
     def __str__(self):
         return f"Trend: #{self.hashtag.name} ({self.post_count} posts)"
 
 
-# --- SIGNALS TO KEEP TRENDS IN SYNC WITH HASHTAGS ---
+class HashtagActivity(models.Model):
+    """
+    Model counting the posts created with a hashtag during one hour.
+    """
+    hashtag = models.ForeignKey(Hashtag, on_delete=models.CASCADE, related_name='activity')
+    bucket = models.DateTimeField(db_index=True)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['hashtag', 'bucket']
+
+    def __str__(self):
+        return f"#{self.hashtag.name}: {self.count} posts at {self.bucket.strftime('%Y-%m-%d %H:00')}"
+
+
+class TimelineEntry(models.Model):
+    """
+    Model representing a post materialized into a user's home timeline.
+    Entries without a user form the shared public timeline.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        null=True,
+        blank=True
+    )
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    # Copied from the post so a timeline page is read from this table alone
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ['user', 'post']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post'], name='posts_timeline_user_idx'),
+        ]
 
-@receiver(post_save, sender=PostHashtag)
-def update_trend_on_posthashtag_create(sender, instance, created, **kwargs):
-    if created:
-        trend, _ = Trend.objects.get_or_create(hashtag=instance.hashtag)
-        trend.posts.add(instance.post)
-        trend.post_count = trend.posts.count()
-        trend.save()
+    def __str__(self):
+        owner = self.user.username if self.user else 'public'
+        return f"Post {self.post_id} in {owner} timeline"
 
-@receiver(post_delete, sender=PostHashtag)
-def update_trend_on_posthashtag_delete(sender, instance, **kwargs):
-    try:
-        trend = Trend.objects.get(hashtag=instance.hashtag)
-        trend.posts.remove(instance.post)
-        trend.post_count = trend.posts.count()
-        trend.save()
-        # Optionally, delete the trend if no posts remain
-        if trend.post_count == 0:
-            trend.delete()
-    except Trend.DoesNotExist:
-        pass
 
+class PostSearchTerm(models.Model):
+    """
+    Model representing a word of a post in the inverted search index.
+    Used instead of the search_vector column on databases other than PostgreSQL.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='search_terms')
+    term = models.CharField(max_length=100)
+    # Relevance of the word in the post, from its occurrences and where it appears
+    weight = models.PositiveSmallIntegerField(default=1)
 
+    class Meta:
+        unique_together = ['post', 'term']
+        indexes = [
+            models.Index(fields=['term', 'post'], name='posts_search_term_idx'),
+        ]
 
+    def __str__(self):
+        return f"{self.term} in post {self.post_id}"
@@ -0,0 +1,123 @@
+import base64
+from django.core import signing
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class PostPagination(PageNumberPagination):
+    """
+    Pagination for post lists.
+
+    Page numbers are used by default. Passing ?pagination=cursor, or a cursor
+    returned by a previous page, switches to keyset pagination on
+    (created_at, id): no count query is run and every page is an index seek,
+    whatever its depth.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+
+    mode_query_param = 'pagination'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    # Keyset ordering as (timestamp field, tie-breaker field)
+    cursor_ordering = ('-created_at', '-id')
+    # Optional cap on the number of results reachable in either mode
+    max_results = None
+
+    def wants_cursor(self, request):
+        """Check whether a request asks for keyset pagination"""
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor' or
+            self.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.use_cursor = self.wants_cursor(request)
+
+        if not self.use_cursor:
+            if self.max_results is not None:
+                queryset = queryset[:self.max_results]
+            return super().paginate_queryset(queryset, request, view)
+
+        return self.paginate_queryset_by_cursor(queryset, request)
+
+    def paginate_queryset_by_cursor(self, queryset, request):
+        page_size = self.get_page_size(request)
+        time_field, id_field = self.cursor_ordering
+        descending = time_field.startswith('-')
+        time_field, id_field = time_field.lstrip('-'), id_field.lstrip('-')
+        lookup = 'lt' if descending else 'gt'
+
+        # Seek past the last row of the previous page
+        position = 0
+        cursor = self.decode_cursor(request)
+        if cursor:
+            timestamp, pk, position = cursor
+            queryset = queryset.filter(
+                Q(**{f'{time_field}__{lookup}': timestamp}) |
+                Q(**{time_field: timestamp, f'{id_field}__{lookup}': pk})
+            )
+
+        if self.max_results is not None:
+            page_size = max(min(page_size, self.max_results - position), 0)
+
+        queryset = queryset.order_by(*self.cursor_ordering)
+        # Fetch one extra row to know whether there is a next page
+        results = list(queryset[:page_size + 1]) if page_size else []
+
+        self.next_cursor = None
+        if len(results) > page_size:
+            results = results[:page_size]
+            last = results[-1]
+            self.next_cursor = self.encode_cursor(
+                getattr(last, time_field), getattr(last, id_field), position + len(results)
+            )
+
+        return results
+
+    def encode_cursor(self, timestamp, pk, position):
+        # Signed, since the position counts toward max_results and must not be forged
+        raw = signing.Signer(salt='posts.pagination').sign(f"{timestamp.isoformat()}|{pk}|{position}")
+        return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii')
+            raw = signing.Signer(salt='posts.pagination').unsign(raw)
+            timestamp, pk, position = raw.split('|')
+            timestamp = parse_datetime(timestamp)
+            if timestamp is None:
+                raise ValueError(raw)
+            pk, position = int(pk), int(position)
+            if position < 0 or (self.max_results is not None and position > self.max_results):
+                raise ValueError(raw)
+            return timestamp, pk, position
+        except (TypeError, ValueError, UnicodeError, signing.BadSignature):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_cursor_link(self):
+        if not self.next_cursor:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+
+        return Response({
+            'next': self.get_next_cursor_link(),
+            'results': data,
+        })
@@ -0,0 +1,144 @@
+import re
+from collections import Counter
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection, transaction
+from django.db.models import Case, F, Max, Q, Sum, Value, When
+
+from .hashtags import extract_hashtags
+from .models import Post, PostSearchTerm
+
+# Words are matched as typed, without stemming, on every database
+SEARCH_CONFIG = 'simple'
+
+SEARCH_TERM_MAX_LENGTH = PostSearchTerm._meta.get_field('term').max_length
+
+# Weight of a word in the inverted index, by where it appears in the post
+HASHTAG_WEIGHT = 4
+AUTHOR_WEIGHT = 2
+CONTENT_WEIGHT = 1
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def uses_search_vector():
+    """Check whether posts are searched through the PostgreSQL search_vector column"""
+    return connection.vendor == 'postgresql'
+
+
+def tokenize(text):
+    """Get the normalized words of a text, in order"""
+    return [word.lower()[:SEARCH_TERM_MAX_LENGTH] for word in WORD_PATTERN.findall(text or '')]
+
+
+def get_search_document(post):
+    """Get the hashtags, author names and content of a post as searchable texts"""
+    user = post.user
+    return {
+        'hashtags': ' '.join(extract_hashtags(post.content)),
+        'author': ' '.join(filter(None, [user.username, user.first_name, user.last_name])),
+        'content': post.content,
+    }
+
+
+def get_search_terms(post):
+    """Get the words of a post with their weight for the inverted index"""
+    document = get_search_document(post)
+    weights = Counter()
+    for field, weight in (('hashtags', HASHTAG_WEIGHT), ('author', AUTHOR_WEIGHT), ('content', CONTENT_WEIGHT)):
+        for word in tokenize(document[field]):
+            weights[word] += weight
+    return weights
+
+
+def get_search_vector(post):
+    """Get the expression computing the search_vector of a post"""
+    document = get_search_document(post)
+    return (
+        SearchVector(Value(document['hashtags']), weight='A', config=SEARCH_CONFIG) +
+        SearchVector(Value(document['author']), weight='B', config=SEARCH_CONFIG) +
+        SearchVector(Value(document['content']), weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def index_posts(posts):
+    """Write the search index entries of the given posts, replacing their previous ones"""
+    posts = list(posts)
+    if not posts:
+        return
+
+    if uses_search_vector():
+        for post in posts:
+            post.search_vector = get_search_vector(post)
+        Post.objects.bulk_update(posts, ['search_vector'], batch_size=500)
+        return
+
+    with transaction.atomic():
+        PostSearchTerm.objects.filter(post_id__in=[post.id for post in posts]).delete()
+        PostSearchTerm.objects.bulk_create(
+            [
+                PostSearchTerm(post=post, term=term, weight=min(weight, 32767))
+                for post in posts
+                for term, weight in get_search_terms(post).items()
+            ],
+            batch_size=1000
+        )
+
+
+def index_post(post):
+    """Write the search index entries of a created or edited post"""
+    index_posts([post])
+
+
+def rebuild_search_index(batch_size=500):
+    """Recompute the search index of every post, returning how many were indexed"""
+    posts = Post.objects.select_related('user').order_by('id')
+    indexed = 0
+    last_id = 0
+    while True:
+        batch = list(posts.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return indexed
+        index_posts(batch)
+        indexed += len(batch)
+        last_id = batch[-1].id
+
+
+def get_prefix_range(word):
+    """Get the lookups matching the indexed words that start with a word, using the term index"""
+    return Q(search_terms__term__gte=word, search_terms__term__lt=word + '\U0010ffff')
+
+
+def match_posts(posts, query):
+    """
+    Filter posts down to those matching every word of a query, most relevant first.
+    Each word also matches the indexed words it is a prefix of.
+    """
+    words = list(dict.fromkeys(tokenize(query)))
+    if not words:
+        return posts.none()
+
+    if uses_search_vector():
+        search_query = SearchQuery(
+            ' & '.join(f"'{word}':*" for word in words),
+            search_type='raw',
+            config=SEARCH_CONFIG
+        )
+        return posts.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-search_rank', '-created_at')
+
+    # Restricting the join to matching words first keeps the aggregates on those rows only
+    matching = Q()
+    for word in words:
+        matching |= get_prefix_range(word)
+
+    matched_words = {
+        f'search_match_{index}': Max(Case(When(get_prefix_range(word), then=Value(1)), default=Value(0)))
+        for index, word in enumerate(words)
+    }
+    return posts.filter(matching).annotate(
+        search_rank=Sum('search_terms__weight'),
+        **matched_words
+    ).filter(
+        **{name: 1 for name in matched_words}
+    ).order_by('-search_rank', '-created_at')
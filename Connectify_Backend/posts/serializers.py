@@ -1,11 +1,14 @@
+from collections import defaultdict
+from django.db.models import Prefetch, prefetch_related_objects
+from django.db.models.manager import BaseManager
 from rest_framework import serializers
-from accounts.models import User
 from .models import (
     Post, PostMedia, PostComment, ReactionType, 
-    PostReaction, CommentReaction, PostShare, 
+    PostReaction, PostReactionCount, CommentReaction, PostShare, 
     PostTag, Hashtag, PostHashtag
 )
 from accounts.serializers import UserSerializer
+from .counters import REACTION_SHARD_PREFIX, get_shard_totals
 
 
 class HashtagSerializer(serializers.ModelSerializer):
@@ -23,9 +26,15 @@ class PostMediaSerializer(serializers.ModelSerializer):
     """
     Serializer for PostMedia model.
     """
+    variants = serializers.SerializerMethodField()
+    
     class Meta:
         model = PostMedia
-        fields = ['id', 'file', 'media_type', 'uploaded_at']
+        fields = ['id', 'file', 'variants', 'media_type', 'status', 'uploaded_at']
+    
+    def get_variants(self, obj):
+        """Get the URLs of the resized images by size"""
+        return {name: variant['url'] for name, variant in obj.variants.items()}
 
 
 class ReactionTypeSerializer(serializers.ModelSerializer):
@@ -99,11 +108,41 @@ class PostCommentSerializer(serializers.ModelSerializer):
         ]
     
     def get_reactions(self, obj):
+        # Use the reactions loaded for the whole thread page when given
+        reactions = self.context.get('reactions')
+        if reactions is not None:
+            return CommentReactionSerializer(reactions.get(obj.id, []), many=True).data
+        
         # Get the most recent reactions (limit to 5)
         reactions = CommentReaction.objects.filter(comment=obj).order_by('-created_at')[:5]
         return CommentReactionSerializer(reactions, many=True).data
 
 
+class PostCommentThreadSerializer(PostCommentSerializer):
+    """
+    Serializer for a top-level comment with its first replies, read from the
+    replies and reactions loaded for the whole page (see posts.comments).
+    """
+    replies = serializers.SerializerMethodField()
+    replies_cursor = serializers.SerializerMethodField()
+    
+    class Meta(PostCommentSerializer.Meta):
+        fields = PostCommentSerializer.Meta.fields + ['replies', 'replies_cursor']
+    
+    def get_inline_replies(self, obj):
+        return self.context['replies'].get(obj.id, [])[:self.context['reply_limit']]
+    
+    def get_replies(self, obj):
+        return PostCommentSerializer(self.get_inline_replies(obj), many=True, context=self.context).data
+    
+    def get_replies_cursor(self, obj):
+        """Get the cursor continuing the thread on the replies endpoint, if it has more replies"""
+        if len(self.context['replies'].get(obj.id, [])) <= self.context['reply_limit']:
+            return None
+        last = self.get_inline_replies(obj)[-1]
+        return self.context['paginator'].encode_cursor(last.created_at, last.id, self.context['reply_limit'])
+
+
 class PostCommentCreateSerializer(serializers.Serializer):
     """
     Serializer for creating a PostComment.
@@ -112,6 +151,65 @@ class PostCommentCreateSerializer(serializers.Serializer):
     parent_comment_id = serializers.IntegerField(required=False, allow_null=True)
 
 
+def get_reaction_summaries(posts, shard_totals):
+    """
+    Get the reaction counts by type of several posts from the maintained breakdown,
+    plus the amounts hot posts still hold in shards.
+    """
+    summaries = defaultdict(dict)
+    rows = PostReactionCount.objects.filter(
+        post__in=posts,
+        count__gt=0
+    ).values_list('post_id', 'reaction_type__name', 'count')
+    
+    for post_id, reaction_type, count in rows:
+        summaries[post_id][reaction_type] = count
+    
+    pending = [
+        (post_id, int(field[len(REACTION_SHARD_PREFIX):]), amount)
+        for post_id, totals in shard_totals.items()
+        for field, amount in totals.items()
+        if field.startswith(REACTION_SHARD_PREFIX) and amount
+    ]
+    if pending:
+        names = dict(
+            ReactionType.objects.filter(
+                pk__in={reaction_type_id for _, reaction_type_id, _ in pending}
+            ).values_list('id', 'name')
+        )
+        for post_id, reaction_type_id, amount in pending:
+            summary = summaries[post_id]
+            name = names.get(reaction_type_id)
+            if name is None:
+                continue
+            count = summary.get(name, 0) + amount
+            if count > 0:
+                summary[name] = count
+            else:
+                summary.pop(name, None)
+    return summaries
+
+
+class PostListSerializer(serializers.ListSerializer):
+    """
+    List serializer that hydrates a whole page of posts in a fixed number of queries.
+    """
+    def to_representation(self, data):
+        posts = list(data.all() if isinstance(data, BaseManager) else data)
+        
+        # Load the related rows of every post at once
+        prefetch_related_objects(
+            posts,
+            'user',
+            'media',
+            Prefetch('hashtags', queryset=PostHashtag.objects.select_related('hashtag'))
+        )
+        self.shard_totals = get_shard_totals(posts)
+        self.reaction_summaries = get_reaction_summaries(posts, self.shard_totals)
+        
+        return [self.child.to_representation(post) for post in posts]
+
+
 class PostSerializer(serializers.ModelSerializer):
     """
     Serializer for Post model (list view).
@@ -129,6 +227,22 @@ class PostSerializer(serializers.ModelSerializer):
             'media', 'hashtags', 'reactions_summary', 'type',
             'created_at', 'updated_at'
         ]
+        list_serializer_class = PostListSerializer
+    
+    def to_representation(self, obj):
+        data = super().to_representation(obj)
+        
+        # Hot posts hold part of their counters in shards until they are folded
+        if obj.sharded_counters:
+            shard_totals = getattr(self.parent, 'shard_totals', None)
+            if shard_totals is None:
+                shard_totals = get_shard_totals([obj])
+            for field, amount in shard_totals.get(obj.id, {}).items():
+                # Per-type reaction shards are added to the reactions summary instead
+                if not field.startswith(REACTION_SHARD_PREFIX):
+                    data[field] = max(data[field] + amount, 0)
+        
+        return data
     
     def get_user(self, obj):
         return {
@@ -140,22 +254,19 @@ class PostSerializer(serializers.ModelSerializer):
         }
     
     def get_hashtags(self, obj):
-        hashtags = Hashtag.objects.filter(posts__post=obj)
+        # Lists prefetch the hashtags of the whole page
+        if isinstance(self.parent, PostListSerializer):
+            hashtags = [post_hashtag.hashtag for post_hashtag in obj.hashtags.all()]
+        else:
+            hashtags = Hashtag.objects.filter(posts__post=obj)
         return HashtagSerializer(hashtags, many=True).data
     
     def get_reactions_summary(self, obj):
-        # Get counts of each reaction type
-        reaction_counts = {}
-        reactions = PostReaction.objects.filter(post=obj)
-        
-        for reaction in reactions:
-            reaction_type = reaction.reaction_type.name
-            if reaction_type in reaction_counts:
-                reaction_counts[reaction_type] += 1
-            else:
-                reaction_counts[reaction_type] = 1
-        
-        return reaction_counts
+        # Use the counts loaded for the whole page when serializing a list
+        summaries = getattr(self.parent, 'reaction_summaries', None)
+        if summaries is None:
+            summaries = get_reaction_summaries([obj], get_shard_totals([obj]))
+        return summaries.get(obj.id, {})
 
 
 class PostDetailSerializer(PostSerializer):
@@ -199,6 +310,12 @@ class PostCreateSerializer(serializers.Serializer):
         required=False,
         default=[]
     )
+    # Finished chunked uploads attached after the media files
+    upload_ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        required=False,
+        default=[]
+    )
 
 
 class PostUpdateSerializer(serializers.ModelSerializer):
@@ -207,4 +324,11 @@ class PostUpdateSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = Post
-        fields = ['content', 'ispublic']
\ No newline at end of file
+        fields = ['content', 'ispublic']
+    
+    def update(self, instance, validated_data):
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        # Only write the edited columns so counters updated concurrently are kept
+        instance.save(update_fields=list(validated_data) + ['updated_at'])
+        return instance
\ No newline at end of file
@@ -0,0 +1,114 @@
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from accounts.models import User
+from organizations.models import Organization
+from .counters import touch_post_details
+from .detail import start_user_post_details_touch, touch_post_detail
+from .hashtags import update_trends
+from .media import discard_spool
+from .models import CommentReaction, Post, PostComment, PostHashtag, PostMedia, PostReaction, PostShare, PostTag
+from .search import index_posts
+from .timeline import rebuild_timeline
+
+# Author fields that are part of the search document of posts
+SEARCH_USER_FIELDS = ('username', 'first_name', 'last_name')
+
+# User fields shown in post details, by the post and its comments, reactions, shares and tags
+DETAIL_USER_FIELDS = (
+    'username', 'email', 'first_name', 'last_name', 'role', 'bio', 'dob', 'profile_image', 'profile_image_variants'
+)
+
+
+@receiver(m2m_changed, sender=Organization.users.through)
+def rebuild_timelines_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Rebuild the timelines of users who joined or left an organization"""
+    if action == 'pre_clear':
+        # The members are gone by post_clear, so remember them now
+        if reverse:
+            instance._timeline_user_ids = {instance.pk}
+        else:
+            instance._timeline_user_ids = set(instance.users.values_list('id', flat=True))
+        return
+
+    if action in ('post_add', 'post_remove'):
+        user_ids = {instance.pk} if reverse else pk_set
+    elif action == 'post_clear':
+        user_ids = getattr(instance, '_timeline_user_ids', set())
+    else:
+        return
+
+    for user_id in user_ids or ():
+        rebuild_timeline(user_id)
+
+
+@receiver(pre_delete, sender=Post)
+def remove_post_from_trends(sender, instance, **kwargs):
+    """Update the trends of a deleted post's hashtags in one pass"""
+    hashtag_ids = list(PostHashtag.objects.filter(post=instance).values_list('hashtag_id', flat=True))
+    if hashtag_ids:
+        update_trends(instance, removed_ids=hashtag_ids)
+
+
+@receiver(pre_save, sender=User)
+def remember_shown_fields(sender, instance, update_fields=None, **kwargs):
+    """Keep the stored fields of a user that posts show, to tell whether they change"""
+    if instance.pk is None or (update_fields is not None and not set(update_fields) & set(DETAIL_USER_FIELDS)):
+        return
+    instance._shown_fields = User.objects.filter(pk=instance.pk).values(*DETAIL_USER_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def update_posts_on_profile_change(sender, instance, created, **kwargs):
+    """Reindex the posts of a user whose names changed, and renew the details showing a changed user"""
+    fields = getattr(instance, '_shown_fields', None)
+    if created or fields is None:
+        return
+    del instance._shown_fields
+    changed = {field for field in DETAIL_USER_FIELDS if fields[field] != getattr(instance, field)}
+
+    if changed & set(SEARCH_USER_FIELDS):
+        index_posts(instance.posts.select_related('user'))
+    if changed:
+        # A user may show in very many posts, so they are renewed in batches off the request
+        start_user_post_details_touch(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def touch_detail_on_post_save(sender, instance, created, **kwargs):
+    """Renew the detail of a post saved through the ORM or the admin"""
+    if not created:
+        touch_post_detail(instance.pk)
+
+
+@receiver(post_save, sender=PostComment)
+@receiver(post_save, sender=PostReaction)
+@receiver(post_save, sender=PostShare)
+@receiver(post_save, sender=PostTag)
+@receiver(post_save, sender=PostMedia)
+@receiver(post_save, sender=CommentReaction)
+@receiver(post_delete, sender=PostComment)
+@receiver(post_delete, sender=PostReaction)
+@receiver(post_delete, sender=PostShare)
+@receiver(post_delete, sender=PostTag)
+@receiver(post_delete, sender=PostMedia)
+@receiver(post_delete, sender=CommentReaction)
+def touch_detail_on_related_change(sender, instance, origin=None, **kwargs):
+    """Renew the detail of the post a comment, reaction, share, tag or media shown in it belongs to"""
+    # Rows deleted along with their post or comment are covered by the deletion that started it
+    if origin is not None:
+        origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+        if origin_model is not sender:
+            return
+
+    if sender is CommentReaction:
+        touch_post_details(Post.objects.filter(comments=instance.comment_id))
+    else:
+        touch_post_detail(instance.post_id)
+
+
+@receiver(post_delete, sender=PostMedia)
+def discard_media_spool(sender, instance, **kwargs):
+    """Remove the local copy of media deleted before its upload finished"""
+    discard_spool(instance.source)
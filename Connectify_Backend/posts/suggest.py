@@ -0,0 +1,139 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from django.conf import settings
+from django.db import connection
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+
+from .models import Hashtag
+
+# Hashtags kept in memory by each process, the most used ones first
+HASHTAG_SUGGEST_MAX_ENTRIES = getattr(settings, 'POSTS_HASHTAG_SUGGEST_MAX_ENTRIES', 50000)
+
+# Seconds after which the index is reloaded to pick up usage from other processes
+HASHTAG_SUGGEST_REFRESH_SECONDS = getattr(settings, 'POSTS_HASHTAG_SUGGEST_REFRESH_SECONDS', 300)
+
+# Most suggestions returned for a prefix
+HASHTAG_SUGGEST_LIMIT = 10
+
+# Prefixes up to this length match too many names to rank on each request,
+# so their best suggestions are kept precomputed
+PRECOMPUTED_PREFIX_LENGTH = 2
+
+
+class HashtagIndex:
+    """
+    In-memory prefix index of hashtag names, weighted by recent usage.
+
+    Names are kept in a sorted list so the names starting with a prefix are a
+    contiguous slice found by binary search. Reads take no lock: writers build
+    new lists and swap them in, or update them under the lock in place.
+    Once loaded, a stale index keeps serving while a background thread reloads it.
+    """
+
+    def __init__(self, max_entries=HASHTAG_SUGGEST_MAX_ENTRIES, refresh_seconds=HASHTAG_SUGGEST_REFRESH_SECONDS):
+        self.max_entries = max_entries
+        self.refresh_seconds = refresh_seconds
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+        self.reloading = False
+        self.names = []
+        self.weights = {}
+        self.top = {}
+        self.loaded_at = None
+
+    def load(self):
+        """Reload the most used hashtags from the database"""
+        rows = Hashtag.objects.annotate(
+            weight=Coalesce('trend__window_count', Value(0))
+        ).order_by('-weight', 'name').values_list('name', 'weight')[:self.max_entries]
+
+        weights = dict(rows)
+        top = {}
+        # Rows come by decreasing weight, so the first names seen for a prefix are its best
+        for name in weights:
+            for prefix in self.get_short_prefixes(name):
+                suggestions = top.setdefault(prefix, [])
+                if len(suggestions) < HASHTAG_SUGGEST_LIMIT:
+                    suggestions.append(name)
+
+        with self.lock:
+            self.names = sorted(weights)
+            self.weights = weights
+            self.top = top
+            self.loaded_at = time.monotonic()
+
+    def ensure_loaded(self):
+        """Load the index on first use, and start reloading it once it is stale"""
+        if self.loaded_at is None:
+            # Requests arriving during the first load wait for it rather than load it again
+            with self.load_lock:
+                if self.loaded_at is None:
+                    self.load()
+        elif time.monotonic() - self.loaded_at > self.refresh_seconds:
+            self.start_reload()
+
+    def start_reload(self):
+        """Reload the index in a background thread, unless a reload is already running"""
+        with self.lock:
+            if self.reloading:
+                return
+            self.reloading = True
+        threading.Thread(target=self.reload, daemon=True).start()
+
+    def reload(self):
+        try:
+            self.load()
+        finally:
+            self.reloading = False
+            # The thread had its own database connection
+            connection.close()
+
+    def get_short_prefixes(self, name):
+        return [name[:length] for length in range(1, min(len(name), PRECOMPUTED_PREFIX_LENGTH) + 1)]
+
+    def add(self, names, used=False):
+        """Add hashtags to the index, counting one more use of each if used"""
+        if self.loaded_at is None:
+            # Loading reads them from the database anyway
+            return
+
+        with self.lock:
+            for name in names:
+                if name not in self.weights:
+                    if len(self.weights) >= self.max_entries:
+                        # The next load decides whether it is used enough to be kept
+                        continue
+                    insort(self.names, name)
+                    self.weights[name] = 0
+                if used:
+                    self.weights[name] += 1
+                self.update_top(name)
+
+    def update_top(self, name):
+        """Move a name into or within the precomputed suggestions of its short prefixes"""
+        for prefix in self.get_short_prefixes(name):
+            suggestions = [other for other in self.top.get(prefix, []) if other != name] + [name]
+            suggestions.sort(key=lambda other: (-self.weights[other], other))
+            self.top[prefix] = suggestions[:HASHTAG_SUGGEST_LIMIT]
+
+    def suggest(self, prefix, limit=HASHTAG_SUGGEST_LIMIT):
+        """Get the most used hashtag names starting with a prefix"""
+        self.ensure_loaded()
+        limit = min(limit, HASHTAG_SUGGEST_LIMIT)
+        if len(prefix) <= PRECOMPUTED_PREFIX_LENGTH:
+            return self.top.get(prefix, [])[:limit]
+
+        names = self.names
+        start = bisect_left(names, prefix)
+        end = bisect_left(names, prefix + '\U0010ffff', start)
+        weights = self.weights
+        return heapq.nsmallest(limit, names[start:end], key=lambda name: (-weights.get(name, 0), name))
+
+    def get_weight(self, name):
+        return self.weights.get(name, 0)
+
+
+hashtag_index = HashtagIndex()
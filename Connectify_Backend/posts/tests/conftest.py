@@ -0,0 +1,86 @@
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APIClient
+from django.contrib.auth import get_user_model
+from organizations.models import Organization
+
+User = get_user_model()
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with an empty cache."""
+    cache.clear()
+
+@pytest.fixture
+def api_client():
+    """Return an API client for testing."""
+    return APIClient()
+
+@pytest.fixture
+def admin_user():
+    """Create an admin user for testing."""
+    return User.objects.create_user(
+        username='admin_test',
+        email='admin@example.com',
+        password='admin123',
+        role='ADMIN',
+        is_staff=True,
+        is_superuser=True
+    )
+
+@pytest.fixture
+def regular_user():
+    """Create a regular user for testing."""
+    return User.objects.create_user(
+        username='user_test',
+        email='user@example.com',
+        password='user123',
+        role='USER',
+        is_staff=False,
+        is_superuser=False
+    )
+
+@pytest.fixture
+def other_user():
+    """Create a second regular user for testing."""
+    return User.objects.create_user(
+        username='other_test',
+        email='other@example.com',
+        password='other123',
+        role='USER',
+        is_staff=False,
+        is_superuser=False
+    )
+
+@pytest.fixture
+def user_token(api_client, regular_user):
+    """Get authentication token for regular user."""
+    url = reverse('accounts:login')
+    data = {
+        'login': 'user_test',
+        'password': 'user123'
+    }
+    response = api_client.post(url, data)
+    return response.data['access']
+
+@pytest.fixture
+def other_token(api_client, other_user):
+    """Get authentication token for the second regular user."""
+    url = reverse('accounts:login')
+    data = {
+        'login': 'other_test',
+        'password': 'other123'
+    }
+    response = api_client.post(url, data)
+    return response.data['access']
+
+@pytest.fixture
+def user_organization(regular_user):
+    """Create an organization the regular user belongs to."""
+    org = Organization.objects.create(
+        name='User Organization',
+        description='This is an organization created by a regular user'
+    )
+    org.users.add(regular_user)
+    return org
@@ -0,0 +1,60 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from posts.models import CommentReaction, Post, PostComment, ReactionType
+
+@pytest.fixture
+def threads(regular_user, other_user):
+    """Create a post with three top-level comments having 0, 2 and 5 replies, each reacted to"""
+    post = Post.objects.create(user=regular_user, content='Hello')
+    like = ReactionType.objects.get(name='LIKE')
+    for reply_count in (0, 2, 5):
+        comment = PostComment.objects.create(post=post, user=other_user, content='Comment', reply_count=reply_count)
+        CommentReaction.objects.create(comment=comment, user=regular_user, reaction_type=like)
+        for index in range(reply_count):
+            reply = PostComment.objects.create(post=post, user=regular_user, parent_comment=comment, content=f'Reply {index}')
+            CommentReaction.objects.create(comment=reply, user=other_user, reaction_type=like)
+    return post
+
+# Test the comment threads endpoint
+@pytest.mark.django_db
+class TestCommentThreads:
+    def test_threads_include_first_replies(self, api_client, user_token, threads):
+        """Test that each comment comes with its oldest replies and a cursor when it has more"""
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        response = api_client.get(reverse('posts:comment_threads', args=[threads.id]), {'replies': 3})
+
+        assert response.status_code == status.HTTP_200_OK
+        results = response.data['results']
+        assert [len(thread['replies']) for thread in results] == [0, 2, 3]
+        assert [reply['content'] for reply in results[2]['replies']] == ['Reply 0', 'Reply 1', 'Reply 2']
+        assert [thread['replies_cursor'] is None for thread in results] == [True, True, False]
+        assert all(len(thread['reactions']) == 1 for thread in results)
+        assert all(len(reply['reactions']) == 1 for reply in results[2]['replies'])
+
+    def test_thread_cursor_continues_on_replies(self, api_client, user_token, threads):
+        """Test that the cursor of a thread gets the replies after the inline ones"""
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        thread = api_client.get(reverse('posts:comment_threads', args=[threads.id]), {'replies': 3}).data['results'][2]
+
+        response = api_client.get(
+            reverse('posts:comment_replies', args=[thread['id']]),
+            {'cursor': thread['replies_cursor']}
+        )
+
+        assert [reply['content'] for reply in response.data['results']] == ['Reply 3', 'Reply 4']
+
+    def test_threads_use_a_fixed_number_of_queries(self, api_client, user_token, threads, regular_user, other_user, django_assert_num_queries):
+        """Test that more threads, replies and reactions do not add queries"""
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        url = reverse('posts:comment_threads', args=[threads.id])
+        # Authentication, the post, the count and the page, the replies and the reactions
+        with django_assert_num_queries(6):
+            api_client.get(url)
+
+        for index in range(3):
+            comment = PostComment.objects.create(post=threads, user=other_user, content='More')
+            PostComment.objects.create(post=threads, user=regular_user, parent_comment=comment, content='Reply')
+        with django_assert_num_queries(6):
+            api_client.get(url)
@@ -0,0 +1,224 @@
+import threading
+from contextlib import contextmanager
+from types import SimpleNamespace
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.urls import reverse
+from rest_framework import status
+from posts import counters
+from posts.counters import update_counter, update_post_counter
+from posts.models import Post, PostComment, PostCounterShard, PostReactionCount, ReactionType
+from posts.serializers import PostSerializer
+
+# Test engagement counters
+@pytest.mark.django_db
+class TestEngagementCounters:
+    def test_counters_follow_engagement(self, api_client, user_token, regular_user):
+        """Test that comments, replies, reactions and shares update their counters"""
+        post = Post.objects.create(user=regular_user, content='Hello')
+        updated_at = post.updated_at
+        like = ReactionType.objects.get(name='LIKE')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        response = api_client.post(reverse('posts:create_comment', args=[post.id]), {'content': 'Nice'}, format='json')
+        comment_id = response.data['id']
+        reply = api_client.post(
+            reverse('posts:create_comment', args=[post.id]),
+            {'content': 'Thanks', 'parent_comment_id': comment_id},
+            format='json'
+        )
+        api_client.post(reverse('posts:react_to_post', args=[post.id]), {'reaction_type_id': like.id}, format='json')
+        api_client.post(reverse('posts:react_to_comment', args=[comment_id]), {'reaction_type_id': like.id}, format='json')
+        api_client.post(reverse('posts:share_post', args=[post.id]), {}, format='json')
+
+        post.refresh_from_db()
+        comment = PostComment.objects.get(id=comment_id)
+        assert (post.comment_count, post.reaction_count, post.share_count) == (1, 1, 1)
+        assert (comment.reply_count, comment.reaction_count) == (1, 1)
+        assert post.updated_at == updated_at
+
+        api_client.delete(reverse('posts:delete_comment', args=[reply.data['id']]))
+        api_client.delete(reverse('posts:remove_comment_reaction', args=[comment_id]))
+        api_client.delete(reverse('posts:remove_post_reaction', args=[post.id]))
+        response = api_client.delete(reverse('posts:delete_comment', args=[comment_id]))
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+
+        post.refresh_from_db()
+        assert (post.comment_count, post.reaction_count, post.share_count) == (0, 0, 1)
+
+    def test_counter_never_goes_negative(self, regular_user):
+        """Test that decrementing an empty counter leaves it at zero"""
+        post = Post.objects.create(user=regular_user, content='Hello')
+
+        update_counter(Post, post.id, 'share_count', -1)
+
+        post.refresh_from_db()
+        assert post.share_count == 0
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_increments_are_not_lost(regular_user):
+    """Test that concurrent writers never overwrite each other's increments"""
+    post = Post.objects.create(user=regular_user, content='Hello')
+    writers, increments = 8, 25
+    barrier = threading.Barrier(writers)
+    errors = []
+
+    def write():
+        try:
+            barrier.wait()
+            for _ in range(increments):
+                update_counter(Post, post.id, 'reaction_count', 1)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=write) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    post.refresh_from_db()
+    assert not errors
+    assert post.reaction_count == writers * increments
+
+# Test sharded counters of hot posts
+@pytest.mark.django_db
+class TestShardedCounters:
+    @pytest.fixture(autouse=True)
+    def low_threshold(self, monkeypatch):
+        monkeypatch.setattr(counters, 'HOT_POST_WRITES_PER_MINUTE', 3)
+        cache.clear()
+
+    def test_post_is_promoted_when_hot(self, regular_user):
+        """Test that a post switches to sharded counters past the write rate threshold"""
+        post = Post.objects.create(user=regular_user, content='Hello')
+        for _ in range(3):
+            update_post_counter(post, 'reaction_count', 1)
+
+        post.refresh_from_db()
+        assert post.sharded_counters
+        assert post.reaction_count == 3
+
+    def test_sharded_counts_stay_exact(self, regular_user):
+        """Test that reads add pending shard amounts and folding moves them to the post row"""
+        post = Post.objects.create(user=regular_user, content='Hello', sharded_counters=True)
+        for _ in range(10):
+            update_post_counter(post, 'reaction_count', 1)
+        update_post_counter(post, 'reaction_count', -1)
+
+        post.refresh_from_db()
+        assert post.reaction_count == 0
+        assert PostSerializer(post).data['reaction_count'] == 9
+        assert PostSerializer([post], many=True).data[0]['reaction_count'] == 9
+
+        cache.clear()
+        call_command('fold_counter_shards')
+
+        post.refresh_from_db()
+        assert post.reaction_count == 9
+        assert not post.sharded_counters
+        assert not PostCounterShard.objects.filter(post=post).exclude(count=0).exists()
+
+    def test_reaction_breakdown_is_sharded(self, regular_user):
+        """Test that hot posts keep the per-type reaction counts in shards until they are folded"""
+        like = ReactionType.objects.get(name='LIKE')
+        love = ReactionType.objects.get(name='LOVE')
+        post = Post.objects.create(user=regular_user, content='Hello', sharded_counters=True)
+        for _ in range(4):
+            counters.record_reaction_change(post, new_type_id=like.id)
+        counters.record_reaction_change(post, old_type_id=like.id, new_type_id=love.id)
+
+        assert not PostReactionCount.objects.filter(post=post).exists()
+        assert PostSerializer(post).data['reactions_summary'] == {'LIKE': 3, 'LOVE': 1}
+        assert PostSerializer([post], many=True).data[0]['reactions_summary'] == {'LIKE': 3, 'LOVE': 1}
+
+        cache.clear()
+        call_command('fold_counter_shards')
+
+        counts = dict(PostReactionCount.objects.filter(post=post).values_list('reaction_type__name', 'count'))
+        assert counts == {'LIKE': 3, 'LOVE': 1}
+        post.refresh_from_db()
+        assert PostSerializer(post).data['reactions_summary'] == {'LIKE': 3, 'LOVE': 1}
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_sharded_increments_are_not_lost(regular_user):
+    """Test that concurrent writers on a hot post keep an exact total"""
+    post = Post.objects.create(user=regular_user, content='Hello', sharded_counters=True)
+    # Start from existing shards: concurrent inserts fail with "table is locked"
+    # on the shared-cache SQLite test database instead of waiting
+    PostCounterShard.objects.bulk_create(
+        [PostCounterShard(post=post, field='reaction_count', shard=shard) for shard in range(counters.COUNTER_SHARDS)]
+    )
+    run_sharded_writers(post)
+
+    assert PostSerializer(Post.objects.get(id=post.id)).data['reaction_count'] == 8 * 25
+
+@pytest.mark.skipif(connection.vendor == 'sqlite', reason='SQLite fails concurrent inserts with "table is locked"')
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_shard_inserts_are_not_lost(regular_user):
+    """Test that writers racing to create the same shards keep an exact total"""
+    post = Post.objects.create(user=regular_user, content='Hello', sharded_counters=True)
+    run_sharded_writers(post)
+
+    assert PostSerializer(Post.objects.get(id=post.id)).data['reaction_count'] == 8 * 25
+    assert PostCounterShard.objects.filter(post=post).count() <= counters.COUNTER_SHARDS
+
+@pytest.mark.django_db
+def test_shard_insert_race_falls_back_to_update(regular_user, monkeypatch):
+    """Test that a shard created by another writer between the update and the insert still gets the amount"""
+    post = Post.objects.create(user=regular_user, content='Hello', sharded_counters=True)
+    lookup = {'post': post, 'field': 'reaction_count', 'shard': 0}
+
+    @contextmanager
+    def racing_atomic():
+        # Another writer inserts the same shard just before this one does
+        PostCounterShard.objects.create(count=5, **lookup)
+        with transaction.atomic():
+            yield
+
+    monkeypatch.setattr(counters, 'transaction', SimpleNamespace(atomic=racing_atomic))
+    counters.update_counter_shard(post.id, 'reaction_count', 0, 1)
+
+    assert PostCounterShard.objects.get(**lookup).count == 6
+
+@pytest.mark.django_db
+def test_fold_keeps_hot_posts_sharded(regular_user, monkeypatch):
+    """Test that folding a post still written to often leaves it sharded"""
+    monkeypatch.setattr(counters, 'HOT_POST_WRITES_PER_MINUTE', 3)
+    cache.clear()
+    post = Post.objects.create(user=regular_user, content='Hello', sharded_counters=True)
+    for _ in range(5):
+        update_post_counter(post, 'reaction_count', 1)
+
+    counters.fold_counter_shards(post.id)
+
+    post.refresh_from_db()
+    assert post.reaction_count == 5
+    assert post.sharded_counters
+
+def run_sharded_writers(post, writers=8, increments=25):
+    """Increment a counter of a post from concurrent threads"""
+    barrier = threading.Barrier(writers)
+    errors = []
+
+    def write():
+        try:
+            barrier.wait()
+            for _ in range(increments):
+                update_post_counter(post, 'reaction_count', 1)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=write) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
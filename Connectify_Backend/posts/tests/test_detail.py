@@ -0,0 +1,183 @@
+import pytest
+from types import SimpleNamespace
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from posts.counters import fold_counter_shards, rebuild_reaction_counts, update_post_counter
+from posts.detail import HOT_POST_DETAIL_CACHE_TIMEOUT, touch_user_post_details
+from posts.models import Post, PostComment, ReactionType
+
+# Test the cached, conditional post detail
+@pytest.mark.django_db
+class TestPostDetailCache:
+    def test_unchanged_post_is_not_modified(self, api_client, user_token, regular_user):
+        """Test that a matching If-None-Match is answered with 304"""
+        post = Post.objects.create(user=regular_user, content='Hello')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        url = reverse('posts:post_detail', args=[post.id])
+
+        response = api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag']
+        assert response['Last-Modified']
+
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_cached_detail_skips_serialization(self, api_client, user_token, regular_user, django_assert_max_num_queries):
+        """Test that a cached detail is served with the access check as its only post query"""
+        post = Post.objects.create(user=regular_user, content='Hello')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        url = reverse('posts:post_detail', args=[post.id])
+        first = api_client.get(url)
+
+        # Authentication and the access check
+        with django_assert_max_num_queries(2):
+            response = api_client.get(url)
+
+        assert response.data == first.data
+
+    def test_writes_change_the_etag(self, api_client, user_token, regular_user):
+        """Test that comments and reactions make the cached detail stale"""
+        post = Post.objects.create(user=regular_user, content='Hello')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        url = reverse('posts:post_detail', args=[post.id])
+        etag = api_client.get(url)['ETag']
+
+        api_client.post(reverse('posts:create_comment', args=[post.id]), {'content': 'Nice'}, format='json')
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['comment_count'] == 1
+        assert response['ETag'] != etag
+        etag = response['ETag']
+
+        like = ReactionType.objects.get(name='LIKE')
+        api_client.post(reverse('posts:react_to_post', args=[post.id]), {'reaction_type_id': like.id}, format='json')
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['reactions_summary'] == {'LIKE': 1}
+
+    def test_view_writes_renew_the_version_once(self, api_client, user_token, regular_user):
+        """Test that a write through the views renews the detail version a single time"""
+        post = Post.objects.create(user=regular_user, content='Hello')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        like = ReactionType.objects.get(name='LIKE')
+
+        api_client.post(reverse('posts:react_to_post', args=[post.id]), {'reaction_type_id': like.id}, format='json')
+        assert Post.objects.get(pk=post.pk).detail_version == post.detail_version + 1
+
+        api_client.post(reverse('posts:share_post', args=[post.id]), {}, format='json')
+        assert Post.objects.get(pk=post.pk).detail_version == post.detail_version + 2
+
+    def test_private_posts_are_checked_before_304(self, api_client, other_token, regular_user, user_token):
+        """Test that users without access get 403 even with a valid ETag"""
+        post = Post.objects.create(user=regular_user, content='Hello', ispublic=False)
+        url = reverse('posts:post_detail', args=[post.id])
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        etag = api_client.get(url)['ETag']
+
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {other_token}')
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_version_is_kept_in_the_database(self, api_client, user_token, regular_user):
+        """Test that the ETag does not depend on the cache, which other processes do not share"""
+        post = Post.objects.create(user=regular_user, content='Hello')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        url = reverse('posts:post_detail', args=[post.id])
+        etag = api_client.get(url)['ETag']
+
+        cache.clear()
+
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_if_modified_since_alone_is_not_trusted(self, api_client, user_token, regular_user):
+        """Test that writes within the same second as the last one are not answered with 304"""
+        post = Post.objects.create(user=regular_user, content='Hello')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        url = reverse('posts:post_detail', args=[post.id])
+        last_modified = api_client.get(url)['Last-Modified']
+
+        PostComment.objects.create(post=post, user=regular_user, content='Nice')
+        response = api_client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['comments']) == 1
+
+    def test_orm_and_maintenance_writes_change_the_etag(self, regular_user, other_user):
+        """Test that writes outside the views renew the detail version"""
+        post = Post.objects.create(user=regular_user, content='Hello')
+        versions = [post.detail_version]
+
+        def changed():
+            versions.append(Post.objects.get(pk=post.pk).detail_version)
+            return versions[-1] != versions[-2]
+
+        comment = PostComment.objects.create(post=post, user=other_user, content='Nice')
+        assert changed()
+        comment.delete()
+        assert changed()
+        Post.objects.filter(pk=post.pk).update(sharded_counters=True)
+        post.sharded_counters = True
+        update_post_counter(post, 'reaction_count', 1)
+        fold_counter_shards(post.id)
+        assert changed()
+        rebuild_reaction_counts([post.id])
+        assert changed()
+
+    def test_hot_posts_leave_the_version_alone(self, api_client, user_token, regular_user, monkeypatch):
+        """Test that writes to a hot post skip its row, its detail being renewed every period instead"""
+        now = [1000.0]
+        monkeypatch.setattr('posts.detail.time.time', lambda: now[0])
+        post = Post.objects.create(user=regular_user, content='Hello', sharded_counters=True)
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        url = reverse('posts:post_detail', args=[post.id])
+        etag = api_client.get(url)['ETag']
+
+        PostComment.objects.create(post=post, user=regular_user, content='Nice')
+        assert Post.objects.get(pk=post.pk).detail_version == post.detail_version
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_304_NOT_MODIFIED
+
+        now[0] += HOT_POST_DETAIL_CACHE_TIMEOUT
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['comments']) == 1
+
+    def test_profile_changes_change_the_etag(self, api_client, user_token, regular_user, other_user, monkeypatch,
+                                             django_capture_on_commit_callbacks):
+        """Test that renaming the author or a commenter makes the cached detail stale"""
+        # Run the background renewal in the test's thread and database connection
+        monkeypatch.setattr('posts.detail.threading.Thread', lambda target, args, daemon: SimpleNamespace(
+            start=lambda: touch_user_post_details(*args)
+        ))
+        monkeypatch.setattr('posts.detail.DETAIL_TOUCH_BATCH_SIZE', 1)
+        post = Post.objects.create(user=regular_user, content='Hello')
+        other_post = Post.objects.create(user=regular_user, content='Bye')
+        PostComment.objects.create(post=post, user=other_user, content='Nice')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        url = reverse('posts:post_detail', args=[post.id])
+        etag = api_client.get(url)['ETag']
+
+        with django_capture_on_commit_callbacks(execute=True):
+            regular_user.profile_image = 'https://example.com/avatar.png'
+            regular_user.save()
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['user']['profile_image'] == 'https://example.com/avatar.png'
+        assert Post.objects.get(pk=other_post.pk).detail_version == other_post.detail_version + 1
+        etag = response['ETag']
+
+        with django_capture_on_commit_callbacks(execute=True):
+            other_user.username = 'renamed'
+            other_user.save()
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['comments'][0]['user']['username'] == 'renamed'
+        etag = response['ETag']
+
+        # Saves of fields posts do not show leave the detail alone
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            other_user.save(update_fields=['last_login'])
+        assert not callbacks
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_304_NOT_MODIFIED
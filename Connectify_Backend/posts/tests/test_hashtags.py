@@ -0,0 +1,76 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from posts.hashtags import extract_hashtags, set_post_hashtags
+from posts.models import Post, PostHashtag, Trend
+
+def hashtag_names(post):
+    """Get the stored hashtag names of a post"""
+    return set(PostHashtag.objects.filter(post=post).values_list('hashtag__name', flat=True))
+
+# Test hashtag extraction
+class TestExtractHashtags:
+    def test_normalizes_and_deduplicates(self):
+        """Test that hashtags are uppercased, stripped of punctuation and deduplicated"""
+        content = 'Hello #Django, #django! ##Python #py-thon not#this #'
+        assert extract_hashtags(content) == ['DJANGO', 'PYTHON', 'PY']
+
+# Test the hashtag pipeline
+@pytest.mark.django_db
+class TestPostHashtags:
+    def test_create_cost_does_not_grow_with_hashtags(self, api_client, user_token):
+        """Test that creating a post runs the same queries for 2 or 20 hashtags"""
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        url = reverse('posts:post_create')
+
+        with CaptureQueriesContext(connection) as few:
+            response = api_client.post(url, {'content': '#A1 #A2'}, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+
+        content = ' '.join(f'#B{i}' for i in range(20))
+        with CaptureQueriesContext(connection) as many:
+            response = api_client.post(url, {'content': content}, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+        assert len(response.data['hashtags']) == 20
+
+        assert len(many.captured_queries) == len(few.captured_queries)
+
+    def test_update_only_writes_the_difference(self, regular_user):
+        """Test that unchanged hashtags keep their rows when the content is edited"""
+        post = Post.objects.create(user=regular_user, content='#KEEP #DROP')
+        set_post_hashtags(post, post.content, created=True)
+        kept = PostHashtag.objects.get(post=post, hashtag__name='KEEP')
+
+        set_post_hashtags(post, '#keep #ADD')
+
+        assert hashtag_names(post) == {'KEEP', 'ADD'}
+        assert PostHashtag.objects.get(post=post, hashtag__name='KEEP').id == kept.id
+        assert not Trend.objects.filter(hashtag__name='DROP').exists()
+
+    def test_trends_follow_posts(self, regular_user):
+        """Test that trend counts are updated when posts are tagged and deleted"""
+        first = Post.objects.create(user=regular_user, content='#NEWS')
+        second = Post.objects.create(user=regular_user, content='#NEWS')
+        set_post_hashtags(first, first.content, created=True)
+        set_post_hashtags(second, second.content, created=True)
+
+        trend = Trend.objects.get(hashtag__name='NEWS')
+        assert trend.post_count == 2
+        assert set(trend.posts.values_list('id', flat=True)) == {first.id, second.id}
+
+        first.delete()
+        trend.refresh_from_db()
+        assert trend.post_count == 1
+
+    def test_tagged_users(self, api_client, user_token, other_user):
+        """Test that tagged users are stored and unknown IDs are ignored"""
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        response = api_client.post(reverse('posts:post_create'), {
+            'content': 'Hello',
+            'tagged_user_ids': [other_user.id, 999999]
+        }, format='json')
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert [tag['user']['id'] for tag in response.data['tags']] == [other_user.id]
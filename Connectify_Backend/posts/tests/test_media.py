@@ -0,0 +1,245 @@
+import hashlib
+import io
+import os
+import time
+import pytest
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from rest_framework import status
+from accounts import images
+from accounts import uploads
+from accounts.models import ChunkedUpload, StoredFile
+from posts import media as media_pipeline
+from posts.models import Post, PostMedia
+
+class FailingStorage:
+    """Storage backend whose uploads always fail"""
+    attempts = 0
+
+    def upload(self, path, folder):
+        FailingStorage.attempts += 1
+        raise media_pipeline.MediaUploadError('Storage unavailable')
+
+    def delete(self, public_id):
+        pass
+
+class PartlyFailingStorage(media_pipeline.LocalMediaStorage):
+    """Local storage failing the uploads of videos"""
+
+    def upload(self, path, folder):
+        if path.endswith('.mp4'):
+            raise media_pipeline.MediaUploadError('Video rejected')
+        return super().upload(path, folder)
+
+@pytest.fixture(autouse=True)
+def local_storage(monkeypatch, settings, tmp_path):
+    """Upload inline to a temporary MEDIA_ROOT"""
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    monkeypatch.setattr(media_pipeline, 'MEDIA_STORAGE_BACKEND', 'posts.media.LocalMediaStorage')
+    monkeypatch.setattr(media_pipeline, 'MEDIA_UPLOAD_WORKERS', 0)
+    monkeypatch.setattr(media_pipeline, 'MEDIA_UPLOAD_RETRY_DELAY', 0)
+    monkeypatch.setattr(media_pipeline, 'MEDIA_SPOOL_DIR', str(tmp_path))
+    monkeypatch.setattr(images, 'IMAGE_PROCESSING_WORKERS', 0)
+    monkeypatch.setattr(uploads, 'UPLOAD_DIR', str(tmp_path))
+
+def image(name='photo.jpg', size=(64, 48)):
+    content = io.BytesIO()
+    Image.new('RGB', size, 'red').save(content, 'JPEG')
+    return SimpleUploadedFile(name, content.getvalue(), content_type='image/jpeg')
+
+def create_post_with_media(api_client, token, files=None):
+    """Create a post with media files through the API"""
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    data = {'content': 'Look', 'media': files or [image()]}
+    return api_client.post(reverse('posts:post_create'), data, format='multipart')
+
+# Test the media pipeline
+@pytest.mark.django_db
+class TestMediaPipeline:
+    def test_post_is_created_before_the_upload(self, api_client, user_token, settings, django_capture_on_commit_callbacks):
+        """Test that the post is returned with pending media, uploaded once committed"""
+        with django_capture_on_commit_callbacks() as callbacks:
+            response = create_post_with_media(api_client, user_token)
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['media'][0]['status'] == PostMedia.STATUS_PENDING
+        media = PostMedia.objects.get()
+        assert os.path.exists(media.source)
+
+        for callback in callbacks:
+            callback()
+
+        media.refresh_from_db()
+        assert media.status == PostMedia.STATUS_READY
+        assert media.file.startswith('/media/posts/')
+        assert media.file.endswith('.webp')
+        assert set(media.variants) == set(images.IMAGE_THUMBNAIL_SIZES)
+        assert not media.source
+        assert os.path.exists(os.path.join(settings.MEDIA_ROOT, media.public_id))
+        # Only the stored files remain, the spool and local variants are removed
+        assert os.listdir(media_pipeline.MEDIA_SPOOL_DIR) == ['media']
+
+    def test_failed_uploads_are_retried(self, api_client, user_token, monkeypatch, django_capture_on_commit_callbacks):
+        """Test that uploads are retried, then the media is marked as failed and the post kept"""
+        monkeypatch.setattr(media_pipeline, 'MEDIA_STORAGE_BACKEND', f'{__name__}.FailingStorage')
+        FailingStorage.attempts = 0
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = create_post_with_media(api_client, user_token)
+
+        assert response.status_code == status.HTTP_201_CREATED
+        media = PostMedia.objects.get()
+        assert media.status == PostMedia.STATUS_FAILED
+        assert media.attempts == FailingStorage.attempts == media_pipeline.MEDIA_UPLOAD_ATTEMPTS
+        assert media.post_id == response.data['id']
+
+        response = api_client.get(reverse('posts:media_status', args=[media.id]))
+        assert response.data['status'] == PostMedia.STATUS_FAILED
+        assert response.data['error'] == 'Storage unavailable'
+
+    def test_media_status_endpoint(self, api_client, user_token, django_capture_on_commit_callbacks):
+        """Test that clients can poll the status of an upload"""
+        with django_capture_on_commit_callbacks(execute=True):
+            media_id = create_post_with_media(api_client, user_token).data['media'][0]['id']
+
+        response = api_client.get(reverse('posts:media_status', args=[media_id]))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['status'] == PostMedia.STATUS_READY
+        assert response.data['file'].startswith('/media/posts/')
+
+    def test_files_keep_their_order(self, api_client, user_token, settings, django_capture_on_commit_callbacks):
+        """Test that several files are attached in the order they were sent"""
+        files = [image(f'photo{index}.jpg', size=(10 + index, 10)) for index in range(3)]
+        with django_capture_on_commit_callbacks(execute=True):
+            response = create_post_with_media(api_client, user_token, files)
+
+        assert response.status_code == status.HTTP_201_CREATED
+        media = list(PostMedia.objects.all())
+        assert [item['id'] for item in response.data['media']] == [item.id for item in media]
+        assert [item.status for item in media] == [PostMedia.STATUS_READY] * 3
+        widths = []
+        for item in media:
+            with Image.open(os.path.join(settings.MEDIA_ROOT, item.public_id)) as stored:
+                widths.append(stored.width)
+        assert widths == [10, 11, 12]
+
+    def test_invalid_files_are_rejected(self, api_client, user_token, monkeypatch):
+        """Test that too many or unsupported files are rejected before the post is created"""
+        monkeypatch.setattr(media_pipeline, 'MEDIA_MAX_FILES', 2)
+
+        response = create_post_with_media(api_client, user_token, [image(), image(), image()])
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        document = SimpleUploadedFile('notes.pdf', b'%PDF', content_type='application/pdf')
+        response = create_post_with_media(api_client, user_token, [document])
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        assert not Post.objects.exists()
+
+    def test_partial_failure_rolls_back(self, api_client, user_token, settings, monkeypatch, django_capture_on_commit_callbacks):
+        """Test that one failed file fails the whole media set and removes the stored files"""
+        monkeypatch.setattr(media_pipeline, 'MEDIA_STORAGE_BACKEND', f'{__name__}.PartlyFailingStorage')
+        video = SimpleUploadedFile('clip.mp4', b'fake video', content_type='video/mp4')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            create_post_with_media(api_client, user_token, [image(), video])
+
+        assert set(PostMedia.objects.values_list('status', 'file')) == {(PostMedia.STATUS_FAILED, '')}
+        assert not os.listdir(os.path.join(settings.MEDIA_ROOT, 'posts'))
+
+    def test_same_content_is_stored_once(self, api_client, user_token, settings, django_capture_on_commit_callbacks):
+        """Test that uploading content again reuses the stored files instead of uploading them"""
+        with django_capture_on_commit_callbacks(execute=True):
+            create_post_with_media(api_client, user_token, [image('first.jpg')])
+            create_post_with_media(api_client, user_token, [image('second.jpg')])
+
+        first, second = PostMedia.objects.order_by('id')
+        assert second.status == PostMedia.STATUS_READY
+        assert (second.file, second.public_id, second.variants) == (first.file, first.public_id, first.variants)
+        # One full image and its thumbnails
+        assert len(os.listdir(os.path.join(settings.MEDIA_ROOT, 'posts'))) == 1 + len(images.IMAGE_THUMBNAIL_SIZES)
+
+        stored_file = StoredFile.objects.get()
+        assert stored_file.hits == 1
+        assert stored_file.bytes_saved == stored_file.size
+
+    def test_shared_files_are_kept_on_rollback(self, api_client, user_token, settings, monkeypatch, django_capture_on_commit_callbacks):
+        """Test that a failed post does not delete files reused by other posts"""
+        with django_capture_on_commit_callbacks(execute=True):
+            create_post_with_media(api_client, user_token)
+        monkeypatch.setattr(media_pipeline, 'MEDIA_STORAGE_BACKEND', f'{__name__}.PartlyFailingStorage')
+        video = SimpleUploadedFile('clip.mp4', b'fake video', content_type='video/mp4')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            create_post_with_media(api_client, user_token, [image(), video])
+
+        first = PostMedia.objects.order_by('id').first()
+        assert first.status == PostMedia.STATUS_READY
+        assert os.path.exists(os.path.join(settings.MEDIA_ROOT, first.public_id))
+
+    def test_chunked_uploads_are_attached(self, api_client, user_token, regular_user, settings, django_capture_on_commit_callbacks):
+        """Test that a finished chunked upload is attached to a post and then removed"""
+        upload = uploads.start_upload(regular_user, 'clip.mp4', 'video/mp4', 10)
+        uploads.append_chunk(upload, 0, io.BytesIO(b'fake video'), 10)
+        uploads.finalize_upload(upload)
+
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client.post(
+                reverse('posts:post_create'),
+                {'content': 'Watch', 'upload_ids': [str(upload.id)]},
+                format='json'
+            )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        media = PostMedia.objects.get()
+        assert media.media_type == 'video'
+        assert media.status == PostMedia.STATUS_READY
+        assert media.content_hash == hashlib.sha256(b'fake video').hexdigest()
+        with open(os.path.join(settings.MEDIA_ROOT, media.public_id), 'rb') as stored:
+            assert stored.read() == b'fake video'
+        assert not ChunkedUpload.objects.exists()
+        assert not os.path.exists(upload.path)
+
+    def test_unknown_uploads_are_rejected(self, api_client, user_token, other_user):
+        """Test that uploads of other users cannot be attached"""
+        upload = uploads.start_upload(other_user, 'clip.mp4', 'video/mp4', 0)
+        uploads.finalize_upload(upload)
+
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        response = api_client.post(
+            reverse('posts:post_create'),
+            {'content': 'Watch', 'upload_ids': [str(upload.id)]},
+            format='json'
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not Post.objects.exists()
+
+    def test_invalid_images_fail_without_retry(self, api_client, user_token, django_capture_on_commit_callbacks):
+        """Test that a file which is not an image fails at once"""
+        broken = SimpleUploadedFile('photo.jpg', b'not an image', content_type='image/jpeg')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            create_post_with_media(api_client, user_token, [broken])
+
+        media = PostMedia.objects.get()
+        assert media.status == PostMedia.STATUS_FAILED
+        assert media.attempts == 0
+        assert media.error.startswith('Invalid image')
+
+def test_uploads_run_concurrently(monkeypatch):
+    """Test that the files of a post upload in parallel on the worker pool"""
+    monkeypatch.setattr(media_pipeline, 'MEDIA_UPLOAD_WORKERS', 4)
+    monkeypatch.setattr(media_pipeline, '_executor', None)
+    monkeypatch.setattr(media_pipeline, 'process_upload', lambda media_id: time.sleep(0.2))
+
+    started = time.monotonic()
+    futures = [media_pipeline.schedule_upload(media_id) for media_id in range(4)]
+    for future in futures:
+        future.result()
+
+    assert time.monotonic() - started < 0.6
+    media_pipeline.get_executor().shutdown()
@@ -0,0 +1,96 @@
+import base64
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from posts import timeline
+from posts.models import Post
+from posts.pagination import PostPagination
+from posts.timeline import fan_out_post
+
+def collect_cursor_pages(api_client, url):
+    """Follow the next links of a cursor-paginated endpoint"""
+    ids = []
+    response = api_client.get(url, {'pagination': 'cursor', 'page_size': 2})
+    while True:
+        assert response.status_code == status.HTTP_200_OK
+        ids.extend(post['id'] for post in response.data['results'])
+        if not response.data['next']:
+            return ids
+        response = api_client.get(response.data['next'])
+
+# Test keyset pagination
+@pytest.mark.django_db
+class TestCursorPagination:
+    def test_cursor_pages_match_page_numbers(self, api_client, user_token, regular_user):
+        """Test that walking cursor pages returns every post once, newest first"""
+        posts = [Post.objects.create(user=regular_user, content=f'Post {i}') for i in range(5)]
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        ids = collect_cursor_pages(api_client, reverse('posts:user_posts'))
+
+        assert ids == [post.id for post in reversed(posts)]
+
+    def test_cursor_mode_skips_count(self, api_client, user_token, regular_user):
+        """Test that cursor mode does not run a COUNT query"""
+        Post.objects.create(user=regular_user, content='Post')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(reverse('posts:user_posts'), {'pagination': 'cursor'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert 'count' not in response.data
+        assert not any('__count' in query['sql'] for query in queries.captured_queries)
+
+    def test_page_number_format_unchanged(self, api_client, user_token, regular_user):
+        """Test that clients without a cursor still get page-number responses"""
+        Post.objects.create(user=regular_user, content='Post')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        response = api_client.get(reverse('posts:user_posts'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert set(response.data) == {'count', 'next', 'previous', 'results'}
+
+    def test_invalid_cursor(self, api_client, user_token):
+        """Test that a malformed cursor is rejected"""
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        response = api_client.get(reverse('posts:user_posts'), {'cursor': 'not-a-cursor'})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_feed_cursor_stops_at_timeline_cap(self, api_client, user_token, regular_user, monkeypatch):
+        """Test that cursor paging through the feed never goes past the timeline cap"""
+        monkeypatch.setattr(timeline, 'TIMELINE_MAX_LENGTH', 3)
+        monkeypatch.setattr('posts.views.TIMELINE_MAX_LENGTH', 3)
+        for i in range(5):
+            fan_out_post(Post.objects.create(user=regular_user, content=f'Post {i}', ispublic=i % 2 == 0))
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        ids = collect_cursor_pages(api_client, reverse('posts:feed'))
+
+        assert len(ids) == 3
+        assert ids == sorted(ids, reverse=True)
+
+    def test_forged_cursor_is_rejected(self, api_client, user_token):
+        """Test that a cursor not issued by the server, such as one with a negative position, is rejected"""
+        raw = f"{timezone.now().isoformat()}|1|-100"
+        forged = base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        response = api_client.get(reverse('posts:feed'), {'cursor': forged})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_cursor_position_out_of_range_is_rejected(self, api_client, user_token, monkeypatch):
+        """Test that even a signed cursor must carry a position within the cap"""
+        monkeypatch.setattr('posts.views.TIMELINE_MAX_LENGTH', 3)
+        paginator = PostPagination()
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        for position in (-1, 4):
+            cursor = paginator.encode_cursor(timezone.now(), 1, position)
+            response = api_client.get(reverse('posts:feed'), {'cursor': cursor})
+            assert response.status_code == status.HTTP_404_NOT_FOUND
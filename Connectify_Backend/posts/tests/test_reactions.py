@@ -0,0 +1,50 @@
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from posts.models import Post, PostReaction, PostReactionCount, ReactionType
+from posts.serializers import PostSerializer
+
+def breakdown(post):
+    """Get the maintained reaction breakdown of a post"""
+    return dict(
+        PostReactionCount.objects.filter(post=post, count__gt=0).values_list('reaction_type__name', 'count')
+    )
+
+# Test the reaction breakdown
+@pytest.mark.django_db
+class TestReactionBreakdown:
+    def test_react_change_and_remove(self, api_client, user_token, regular_user):
+        """Test that adding, changing and removing a reaction keeps the breakdown in sync"""
+        post = Post.objects.create(user=regular_user, content='Hello')
+        like = ReactionType.objects.get(name='LIKE')
+        love = ReactionType.objects.get(name='LOVE')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        react_url = reverse('posts:react_to_post', args=[post.id])
+
+        response = api_client.post(react_url, {'reaction_type_id': like.id}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert breakdown(post) == {'LIKE': 1}
+
+        api_client.post(react_url, {'reaction_type_id': love.id}, format='json')
+        assert breakdown(post) == {'LOVE': 1}
+
+        api_client.post(react_url, {'reaction_type_id': love.id}, format='json')
+        assert breakdown(post) == {'LOVE': 1}
+
+        response = api_client.delete(reverse('posts:remove_post_reaction', args=[post.id]))
+        assert response.status_code == status.HTTP_200_OK
+        assert breakdown(post) == {}
+        assert PostSerializer(post).data['reactions_summary'] == {}
+
+    def test_rebuild_command(self, regular_user, other_user):
+        """Test that the rebuild command recomputes the breakdown from reactions"""
+        post = Post.objects.create(user=regular_user, content='Hello')
+        like = ReactionType.objects.get(name='LIKE')
+        PostReaction.objects.create(post=post, user=regular_user, reaction_type=like)
+        PostReaction.objects.create(post=post, user=other_user, reaction_type=like)
+
+        call_command('rebuild_reaction_counts')
+
+        assert breakdown(post) == {'LIKE': 2}
+        assert PostSerializer(post).data['reactions_summary'] == {'LIKE': 2}
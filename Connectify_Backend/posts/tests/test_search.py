@@ -0,0 +1,124 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from posts.models import Post, PostSearchTerm
+from posts.search import index_post, match_posts, tokenize
+
+def create_post(user, content, **kwargs):
+    """Create a post and index it like the create view does"""
+    post = Post.objects.create(user=user, content=content, **kwargs)
+    index_post(post)
+    return post
+
+def search(query):
+    """Get the IDs of the posts matching a query, best first"""
+    return list(match_posts(Post.objects.all(), query).values_list('id', flat=True))
+
+# Test tokenization
+class TestTokenize:
+    def test_words_are_lowercased(self):
+        """Test that words are split on punctuation and lowercased"""
+        assert tokenize('Hello, #Django-World!') == ['hello', 'django', 'world']
+
+# Test the search index
+@pytest.mark.django_db
+class TestSearch:
+    def test_every_word_must_match(self, regular_user):
+        """Test that posts must contain all the words of a query"""
+        both = create_post(regular_user, 'Django tips for beginners')
+        create_post(regular_user, 'Django release notes')
+
+        assert search('django beginners') == [both.id]
+
+    def test_prefix_matching(self, regular_user):
+        """Test that a word matches the indexed words it starts"""
+        post = create_post(regular_user, 'Learning Django')
+
+        assert search('djan') == [post.id]
+        assert search('jango') == []
+
+    def test_hashtags_rank_above_mentions(self, regular_user):
+        """Test that posts using a word as a hashtag rank first"""
+        mention = create_post(regular_user, 'I heard about python today')
+        hashtag = create_post(regular_user, 'Weekend project #python')
+
+        assert search('python') == [hashtag.id, mention.id]
+
+    def test_author_names_are_searchable(self, regular_user):
+        """Test that posts are found by the names of their author"""
+        post = create_post(regular_user, 'Hello')
+
+        assert search('user_test') == [post.id]
+
+    def test_author_rename_reindexes_posts(self, regular_user):
+        """Test that renaming a user updates the index of their posts"""
+        post = create_post(regular_user, 'Hello')
+
+        regular_user.first_name = 'Ada'
+        regular_user.save()
+
+        assert search('ada') == [post.id]
+
+    def test_terms_are_removed_with_the_post(self, regular_user):
+        """Test that deleting a post drops its index entries"""
+        post = create_post(regular_user, 'Hello world')
+        post.delete()
+
+        assert not PostSearchTerm.objects.exists()
+
+    def test_rebuild_command(self, regular_user):
+        """Test that the index can be rebuilt from existing posts"""
+        post = Post.objects.create(user=regular_user, content='Unindexed post')
+
+        call_command('rebuild_search_index')
+
+        assert search('unindexed') == [post.id]
+
+# Test the search endpoint
+@pytest.mark.django_db
+class TestSearchEndpoint:
+    def test_update_reindexes_post(self, api_client, user_token):
+        """Test that editing a post replaces its indexed words"""
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        response = api_client.post(reverse('posts:post_create'), {'content': 'Old words'}, format='json')
+        post_id = response.data['id']
+
+        api_client.put(reverse('posts:post_update', args=[post_id]), {'content': 'New words'}, format='json')
+
+        assert search('old') == []
+        assert search('new') == [post_id]
+
+    def test_search_respects_visibility(self, api_client, other_token, regular_user, user_organization):
+        """Test that private posts are only found by users who can see them"""
+        create_post(regular_user, 'Secret plans', organization=user_organization, ispublic=False)
+        public = create_post(regular_user, 'Public plans')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {other_token}')
+
+        response = api_client.get(reverse('posts:search_posts'), {'q': 'plans'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['count'] == 1
+        assert [post['id'] for post in response.data['results']] == [public.id]
+
+    def test_search_rejects_cursor_pagination(self, api_client, user_token, regular_user):
+        """Test that search, ranked by relevance, does not switch to recency-ordered cursor pages"""
+        create_post(regular_user, 'Public plans')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        response = api_client.get(reverse('posts:search_posts'), {'q': 'plans', 'pagination': 'cursor'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_list_queries_skip_search_vector(self, api_client, user_token, regular_user):
+        """Test that post lists do not load the search vector column"""
+        create_post(regular_user, 'Hello')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(reverse('posts:user_posts'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert not any('search_vector' in query['sql'] for query in queries.captured_queries)
@@ -0,0 +1,65 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from posts.models import Post, PostMedia, PostReaction, ReactionType, Hashtag, PostHashtag
+from posts.serializers import PostSerializer
+from posts.counters import record_reaction_change
+
+def create_posts(user, reactors, count):
+    """Create posts with media, hashtags and reactions"""
+    like = ReactionType.objects.get(name='LIKE')
+    love = ReactionType.objects.get(name='LOVE')
+    for i in range(count):
+        post = Post.objects.create(user=user, content=f'Post {i} #TEST #POST{i}')
+        PostMedia.objects.create(post=post, file=f'https://example.com/{i}.jpg', media_type='image')
+        for name in ['TEST', f'POST{i}']:
+            hashtag, _ = Hashtag.objects.get_or_create(name=name)
+            PostHashtag.objects.create(post=post, hashtag=hashtag)
+        for j, reactor in enumerate(reactors):
+            reaction = PostReaction.objects.create(post=post, user=reactor, reaction_type=like if j % 2 else love)
+            record_reaction_change(post, new_type_id=reaction.reaction_type_id)
+
+# Test batch hydration of post lists
+@pytest.mark.django_db
+class TestPostListSerialization:
+    def test_list_uses_fixed_number_of_queries(self, regular_user, other_user, django_assert_num_queries):
+        """Test that serializing a page costs the same number of queries for any page size"""
+        create_posts(regular_user, [regular_user, other_user], 8)
+
+        # Posts, users, media, hashtags and reaction counts
+        with django_assert_num_queries(5):
+            data = PostSerializer(Post.objects.all(), many=True).data
+
+        assert len(data) == 8
+        assert data[0]['reactions_summary'] == {'LIKE': 1, 'LOVE': 1}
+        assert {hashtag['name'] for hashtag in data[0]['hashtags']} == {'TEST', 'POST7'}
+        assert len(data[0]['media']) == 1
+
+    def test_single_post_serialization(self, regular_user, other_user):
+        """Test that a single post still serializes without a list"""
+        create_posts(regular_user, [regular_user, other_user], 1)
+
+        data = PostSerializer(Post.objects.get()).data
+
+        assert data['reactions_summary'] == {'LIKE': 1, 'LOVE': 1}
+        assert {hashtag['name'] for hashtag in data['hashtags']} == {'TEST', 'POST0'}
+
+    def test_list_endpoint_query_count_is_constant(self, api_client, user_token, regular_user, other_user):
+        """Test that a list endpoint runs the same queries for small and full pages"""
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        url = reverse('posts:user_posts')
+
+        create_posts(regular_user, [other_user], 2)
+        with CaptureQueriesContext(connection) as small_page:
+            response = api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+
+        create_posts(regular_user, [other_user], 8)
+        with CaptureQueriesContext(connection) as full_page:
+            response = api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['results']) == 10
+
+        assert len(full_page.captured_queries) == len(small_page.captured_queries)
@@ -0,0 +1,99 @@
+import pytest
+from types import SimpleNamespace
+from django.urls import reverse
+from rest_framework import status
+from posts.hashtags import set_post_hashtags
+from posts.models import Hashtag, Post
+from posts.suggest import HashtagIndex, hashtag_index
+
+def tag_post(user, content):
+    """Create a post and store its hashtags"""
+    post = Post.objects.create(user=user, content=content)
+    set_post_hashtags(post, post.content, created=True)
+    return post
+
+@pytest.fixture(autouse=True)
+def unloaded_index():
+    """Make the shared index reload from the test database"""
+    hashtag_index.loaded_at = None
+
+# Test the hashtag prefix index
+@pytest.mark.django_db
+class TestHashtagIndex:
+    def test_suggestions_are_ranked_by_usage(self, regular_user):
+        """Test that hashtags starting with the prefix come most used first"""
+        tag_post(regular_user, '#DJANGO #DATA')
+        tag_post(regular_user, '#DATA #DATABASE')
+        tag_post(regular_user, '#DATA #PYTHON')
+
+        assert hashtag_index.suggest('D') == ['DATA', 'DATABASE', 'DJANGO']
+        assert hashtag_index.suggest('DAT') == ['DATA', 'DATABASE']
+        assert hashtag_index.suggest('DATAB') == ['DATABASE']
+        assert hashtag_index.suggest('X') == []
+
+    def test_updates_are_incremental(self, regular_user, django_assert_num_queries):
+        """Test that new and used hashtags are reflected without reloading"""
+        tag_post(regular_user, '#DJANGO')
+        assert hashtag_index.suggest('DJ') == ['DJANGO']
+
+        tag_post(regular_user, '#DJANGOCON')
+        tag_post(regular_user, '#DJANGOCON')
+
+        with django_assert_num_queries(0):
+            assert hashtag_index.suggest('DJ') == ['DJANGOCON', 'DJANGO']
+            assert hashtag_index.suggest('DJANGO') == ['DJANGOCON', 'DJANGO']
+
+    def test_memory_is_bounded(self, regular_user):
+        """Test that only the most used hashtags are kept"""
+        tag_post(regular_user, '#ALPHA #BETA')
+        tag_post(regular_user, '#ALPHA')
+        index = HashtagIndex(max_entries=1)
+
+        assert index.suggest('A') == ['ALPHA']
+        assert index.suggest('B') == []
+
+        index.add(['GAMMA'], used=True)
+        assert index.suggest('G') == []
+
+    def test_stale_index_is_reloaded_in_background(self, regular_user, monkeypatch):
+        """Test that a stale index keeps serving while a single reload is started"""
+        started = []
+        monkeypatch.setattr('posts.suggest.threading.Thread', lambda target, daemon: SimpleNamespace(
+            start=lambda: started.append(target)
+        ))
+        tag_post(regular_user, '#DJANGO')
+        index = HashtagIndex(refresh_seconds=0)
+        assert index.suggest('DJ') == ['DJANGO']
+
+        Hashtag.objects.create(name='DJANGOCON')
+        assert index.suggest('DJ') == ['DJANGO']
+        assert index.suggest('DJ') == ['DJANGO']
+        assert started == [index.reload]
+
+        index.load()
+        assert index.suggest('DJ') == ['DJANGO', 'DJANGOCON']
+
+# Test the suggestion endpoint
+@pytest.mark.django_db
+class TestSuggestEndpoint:
+    def test_suggest(self, api_client, user_token, regular_user):
+        """Test that the prefix is normalized and suggestions carry their usage weight"""
+        tag_post(regular_user, '#Django #DjangoCon')
+        tag_post(regular_user, '#Django')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        response = api_client.get(reverse('posts:suggest_hashtags'), {'prefix': '#djan'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == [
+            {'name': 'DJANGO', 'weight': 2},
+            {'name': 'DJANGOCON', 'weight': 1},
+        ]
+
+    def test_prefix_is_required(self, api_client, user_token):
+        """Test that a missing prefix is rejected"""
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        response = api_client.get(reverse('posts:suggest_hashtags'))
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
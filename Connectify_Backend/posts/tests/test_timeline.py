@@ -0,0 +1,106 @@
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from posts import timeline
+from posts.models import Post, TimelineEntry
+from posts.timeline import fan_out_post
+
+def create_post(user, organization=None, ispublic=True, content='Hello'):
+    """Create a post and distribute it like the create endpoint does"""
+    post = Post.objects.create(user=user, organization=organization, content=content, ispublic=ispublic)
+    fan_out_post(post)
+    return post
+
+# Test timeline fan-out
+@pytest.mark.django_db
+class TestTimelineFanOut:
+    def test_public_post_goes_to_shared_timeline(self, regular_user):
+        """Test that a public post is written once to the public timeline"""
+        post = create_post(regular_user)
+
+        entries = TimelineEntry.objects.filter(post=post)
+        assert entries.count() == 1
+        assert entries.get().user is None
+
+    def test_private_post_goes_to_organization_members(self, regular_user, other_user, user_organization):
+        """Test that a private organization post reaches every member"""
+        user_organization.users.add(other_user)
+        post = create_post(regular_user, organization=user_organization, ispublic=False)
+
+        user_ids = set(TimelineEntry.objects.filter(post=post).values_list('user_id', flat=True))
+        assert user_ids == {regular_user.id, other_user.id}
+
+    def test_create_endpoint_fans_out(self, api_client, user_token, regular_user, user_organization):
+        """Test that creating a post through the API fills the timeline"""
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        response = api_client.post(reverse('posts:post_create'), {
+            'content': 'Members only',
+            'organization_id': user_organization.id,
+            'ispublic': False
+        }, format='json')
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert TimelineEntry.objects.filter(post_id=response.data['id'], user=regular_user).exists()
+
+    def test_visibility_change_moves_post(self, api_client, user_token, regular_user):
+        """Test that making a public post private moves it to the author's timeline"""
+        post = create_post(regular_user)
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        response = api_client.put(reverse('posts:post_update', args=[post.id]), {'ispublic': False}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert list(TimelineEntry.objects.filter(post=post).values_list('user_id', flat=True)) == [regular_user.id]
+
+    def test_timeline_is_capped(self, regular_user, monkeypatch):
+        """Test that the oldest entries are dropped beyond the cap"""
+        monkeypatch.setattr(timeline, 'TIMELINE_MAX_LENGTH', 3)
+        posts = [create_post(regular_user, ispublic=False) for _ in range(5)]
+
+        kept = set(TimelineEntry.objects.filter(user=regular_user).values_list('post_id', flat=True))
+        assert kept == {post.id for post in posts[-3:]}
+
+# Test timeline rebuilds
+@pytest.mark.django_db
+class TestTimelineRebuild:
+    def test_joining_organization_adds_its_posts(self, regular_user, other_user, user_organization):
+        """Test that a new member sees the organization's private posts"""
+        post = create_post(regular_user, organization=user_organization, ispublic=False)
+        user_organization.users.add(other_user)
+
+        assert TimelineEntry.objects.filter(post=post, user=other_user).exists()
+
+    def test_leaving_organization_removes_its_posts(self, regular_user, other_user, user_organization):
+        """Test that a former member no longer sees the organization's private posts"""
+        user_organization.users.add(other_user)
+        post = create_post(regular_user, organization=user_organization, ispublic=False)
+        other_user.organizations.remove(user_organization)
+
+        assert not TimelineEntry.objects.filter(post=post, user=other_user).exists()
+
+    def test_backfill_command(self, regular_user, user_organization):
+        """Test that the backfill command rebuilds timelines from existing posts"""
+        public_post = Post.objects.create(user=regular_user, content='Public')
+        private_post = Post.objects.create(user=regular_user, organization=user_organization, content='Private', ispublic=False)
+
+        call_command('backfill_timelines')
+
+        assert TimelineEntry.objects.filter(post=public_post, user__isnull=True).exists()
+        assert TimelineEntry.objects.filter(post=private_post, user=regular_user).exists()
+
+# Test the feed endpoint
+@pytest.mark.django_db
+class TestFeed:
+    def test_feed_reads_timeline(self, api_client, other_token, regular_user, other_user, user_organization):
+        """Test that the feed shows public posts and member posts but hides other private posts"""
+        public_post = create_post(regular_user, content='Public')
+        hidden_post = create_post(regular_user, organization=user_organization, ispublic=False, content='Hidden')
+        own_post = create_post(other_user, ispublic=False, content='Own')
+
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {other_token}')
+        response = api_client.get(reverse('posts:feed'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['count'] == 2
+        assert [post['id'] for post in response.data['results']] == [own_post.id, public_post.id]
+        assert hidden_post.id not in [post['id'] for post in response.data['results']]
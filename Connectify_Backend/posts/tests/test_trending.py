@@ -0,0 +1,168 @@
+import pytest
+from datetime import timedelta
+from types import SimpleNamespace
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from posts.hashtags import set_post_hashtags
+from posts.models import HashtagActivity, Post, Trend
+from posts.trending import get_bucket, get_top_trends, refresh_trends, run_trends_refresh, TRENDS_REFRESHED_KEY
+
+@pytest.fixture(autouse=True)
+def fresh_trends(clear_cache):
+    """Keep requests from starting background refreshes, unless a test clears this"""
+    cache.set(TRENDS_REFRESHED_KEY, True)
+
+def tag_post(user, content, age=timedelta(0)):
+    """Create a post of the given age and store its hashtags"""
+    post = Post.objects.create(user=user, content=content)
+    if age:
+        Post.objects.filter(id=post.id).update(created_at=timezone.now() - age)
+        post.refresh_from_db()
+    set_post_hashtags(post, post.content, created=True)
+    return post
+
+# Test the trending engine
+@pytest.mark.django_db
+class TestTrending:
+    def test_activity_is_counted_per_hour(self, regular_user):
+        """Test that tagging posts fills the hourly buckets and the trend window"""
+        post = tag_post(regular_user, '#NEWS')
+        tag_post(regular_user, '#NEWS #SPORT')
+
+        activity = HashtagActivity.objects.get(hashtag__name='NEWS')
+        assert activity.bucket == get_bucket(post.created_at)
+        assert activity.count == 2
+        assert Trend.objects.get(hashtag__name='NEWS').window_count == 2
+
+        post.delete()
+        assert HashtagActivity.objects.get(hashtag__name='NEWS').count == 1
+        assert Trend.objects.get(hashtag__name='NEWS').window_count == 1
+
+    def test_recent_posts_weigh_more(self, regular_user):
+        """Test that the decayed score ranks recent activity above older activity"""
+        for _ in range(3):
+            tag_post(regular_user, '#OLD', age=timedelta(days=3))
+        for _ in range(2):
+            tag_post(regular_user, '#NEW')
+
+        assert [trend.hashtag.name for trend in get_top_trends()] == ['NEW', 'OLD']
+        refresh_trends()
+        assert [trend.hashtag.name for trend in get_top_trends()] == ['NEW', 'OLD']
+
+    def test_refresh_prunes_expired_buckets(self, regular_user):
+        """Test that buckets leaving the window are deleted and stop counting"""
+        tag_post(regular_user, '#NEWS', age=timedelta(days=6))
+        tag_post(regular_user, '#NEWS')
+
+        refresh_trends(now=timezone.now() + timedelta(days=2))
+
+        trend = Trend.objects.get(hashtag__name='NEWS')
+        assert HashtagActivity.objects.filter(hashtag=trend.hashtag).count() == 1
+        assert trend.window_count == 1
+
+    def test_rebuild_command(self, regular_user):
+        """Test that the refresh command can rebuild activity from existing posts"""
+        tag_post(regular_user, '#NEWS')
+        HashtagActivity.objects.all().delete()
+        Trend.objects.update(window_count=0, score=0)
+
+        call_command('refresh_trends', '--rebuild')
+
+        trend = Trend.objects.get(hashtag__name='NEWS')
+        assert trend.window_count == 1
+        assert trend.score > 0
+
+    def test_trending_hashtags_endpoint(self, api_client, user_token, regular_user, django_assert_max_num_queries):
+        """Test that trending hashtags are read from the precomputed counts"""
+        tag_post(regular_user, '#NEWS #SPORT')
+        tag_post(regular_user, '#NEWS')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        # Authentication and the trends query
+        with django_assert_max_num_queries(2):
+            response = api_client.get(reverse('posts:trending_hashtags'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [(tag['name'], tag['post_count']) for tag in response.data] == [('NEWS', 2), ('SPORT', 1)]
+
+    def test_trends_endpoint_query_count(self, api_client, user_token, regular_user, django_assert_num_queries):
+        """Test that trends and their posts are read in a fixed number of queries"""
+        for index in range(8):
+            tag_post(regular_user, f'#TAG{index} #COMMON')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        # Authentication, trends, trend posts, then media, hashtags and reactions of the posts
+        with django_assert_num_queries(6):
+            response = api_client.get(reverse('posts:trends'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data[0]['hashtag'] == 'COMMON'
+        assert len(response.data[0]['posts']) == 5
+        assert len(response.data) == 9
+
+    def test_trends_respect_visibility(self, api_client, other_token, regular_user, user_organization):
+        """Test that private posts only appear in the trends of users who can see them"""
+        private = Post.objects.create(user=regular_user, organization=user_organization, content='#NEWS', ispublic=False)
+        set_post_hashtags(private, private.content, created=True)
+        public = tag_post(regular_user, '#NEWS')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {other_token}')
+
+        response = api_client.get(reverse('posts:trends'))
+
+        assert [post['id'] for post in response.data[0]['posts']] == [public.id]
+
+    def test_hidden_posts_do_not_crowd_out_visible_ones(self, api_client, other_token, regular_user, user_organization, monkeypatch):
+        """Test that visible posts are shown even when newer private posts fill the trend's post cap"""
+        monkeypatch.setattr('posts.trending.TREND_MAX_POSTS', 2)
+        public = tag_post(regular_user, '#NEWS')
+        for _ in range(3):
+            private = Post.objects.create(user=regular_user, organization=user_organization, content='#NEWS', ispublic=False)
+            set_post_hashtags(private, private.content, created=True)
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {other_token}')
+
+        response = api_client.get(reverse('posts:trends'))
+
+        assert [post['id'] for post in response.data[0]['posts']] == [public.id]
+
+    def test_stale_trends_are_refreshed_in_background(self, api_client, user_token, regular_user, monkeypatch):
+        """Test that the first read of stale trends starts a single background refresh"""
+        started = []
+        monkeypatch.setattr('posts.trending.threading.Thread', lambda target, daemon: SimpleNamespace(
+            start=lambda: started.append(target)
+        ))
+        tag_post(regular_user, '#NEWS')
+        Trend.objects.update(window_count=0, score=0)
+        cache.delete(TRENDS_REFRESHED_KEY)
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+
+        # The request reads the trends as they are
+        assert api_client.get(reverse('posts:trending_hashtags')).data == []
+        assert api_client.get(reverse('posts:trends')).data == []
+        assert started == [run_trends_refresh]
+        assert cache.get(TRENDS_REFRESHED_KEY)
+
+        refresh_trends()
+        response = api_client.get(reverse('posts:trending_hashtags'))
+        assert [(tag['name'], tag['post_count']) for tag in response.data] == [('NEWS', 1)]
+
+    def test_trends_cache_is_invalidated(self, api_client, user_token, regular_user):
+        """Test that the cached response is dropped when a trend's score changes"""
+        tag_post(regular_user, '#NEWS')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        assert len(api_client.get(reverse('posts:trends')).data[0]['posts']) == 1
+
+        tag_post(regular_user, '#NEWS')
+
+        assert len(api_client.get(reverse('posts:trends')).data[0]['posts']) == 2
+
+    def test_trend_posts_are_capped(self, regular_user, monkeypatch):
+        """Test that trends only keep their most recent posts"""
+        monkeypatch.setattr('posts.trending.TREND_MAX_POSTS', 3)
+        posts = [tag_post(regular_user, '#NEWS') for _ in range(5)]
+
+        trend = Trend.objects.get(hashtag__name='NEWS')
+        assert set(trend.posts.values_list('id', flat=True)) == {post.id for post in posts[2:]}
+        assert trend.post_count == 5
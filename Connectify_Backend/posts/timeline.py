@@ -0,0 +1,123 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from organizations.models import Organization
+from .models import Post, TimelineEntry
+
+# Maximum number of entries kept in each materialized timeline
+TIMELINE_MAX_LENGTH = getattr(settings, 'POSTS_TIMELINE_MAX_LENGTH', 800)
+
+# Only regular posts are served from the home timeline
+TIMELINE_POST_TYPE = 'post'
+
+
+def get_timeline(user):
+    """
+    Get the home timeline entries of a user, newest first.
+
+    Public posts live in a single shared timeline (user=None) so they are written
+    once instead of once per user; the home timeline is the merge of both lists.
+    Only its first TIMELINE_MAX_LENGTH entries are exact, so readers must not
+    page past them.
+    """
+    return TimelineEntry.objects.filter(
+        Q(user=user) | Q(user__isnull=True)
+    ).order_by('-created_at', '-post_id')
+
+
+def get_timeline_audience(post):
+    """Get the IDs of the users whose private timeline should contain the post"""
+    audience = {post.user_id}
+    if post.organization_id:
+        audience.update(
+            Organization.users.through.objects.filter(
+                organization_id=post.organization_id
+            ).values_list('user_id', flat=True)
+        )
+    return audience
+
+
+def fan_out_post(post):
+    """Write a newly created post into the timelines that can see it"""
+    if post.type != TIMELINE_POST_TYPE:
+        return
+
+    if post.ispublic:
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user=None, post=post, created_at=post.created_at)],
+            ignore_conflicts=True
+        )
+        trim_timelines(public=True)
+        return
+
+    user_ids = get_timeline_audience(post)
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post=post, created_at=post.created_at) for user_id in user_ids],
+        ignore_conflicts=True
+    )
+    trim_timelines(user_ids=user_ids)
+
+
+def refresh_post(post):
+    """Re-distribute a post whose visibility has changed"""
+    with transaction.atomic():
+        TimelineEntry.objects.filter(post=post).delete()
+        fan_out_post(post)
+
+
+def trim_timelines(user_ids=None, public=False):
+    """Drop the entries that fall beyond the cap of the given timelines"""
+    if public:
+        entries = TimelineEntry.objects.filter(user__isnull=True)
+    else:
+        entries = TimelineEntry.objects.filter(user_id__in=user_ids)
+
+    overflow = entries.annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=[F('user_id')],
+            order_by=[F('created_at').desc(), F('post_id').desc()]
+        )
+    ).filter(position__gt=TIMELINE_MAX_LENGTH).values_list('pk', flat=True)
+
+    overflow_ids = list(overflow)
+    if overflow_ids:
+        TimelineEntry.objects.filter(pk__in=overflow_ids).delete()
+
+
+def rebuild_timeline(user_id):
+    """Recompute the private timeline of a user from the posts table"""
+    org_ids = Organization.users.through.objects.filter(
+        user_id=user_id
+    ).values_list('organization_id', flat=True)
+
+    posts = Post.objects.filter(
+        type=TIMELINE_POST_TYPE,
+        ispublic=False
+    ).filter(
+        Q(user_id=user_id) | Q(organization_id__in=org_ids)
+    ).order_by('-created_at', '-id').values_list('id', 'created_at')[:TIMELINE_MAX_LENGTH]
+
+    with transaction.atomic():
+        TimelineEntry.objects.filter(user_id=user_id).delete()
+        TimelineEntry.objects.bulk_create([
+            TimelineEntry(user_id=user_id, post_id=post_id, created_at=created_at)
+            for post_id, created_at in posts
+        ])
+
+
+def rebuild_public_timeline():
+    """Recompute the shared public timeline from the posts table"""
+    posts = Post.objects.filter(
+        type=TIMELINE_POST_TYPE,
+        ispublic=True
+    ).order_by('-created_at', '-id').values_list('id', 'created_at')[:TIMELINE_MAX_LENGTH]
+
+    with transaction.atomic():
+        TimelineEntry.objects.filter(user__isnull=True).delete()
+        TimelineEntry.objects.bulk_create([
+            TimelineEntry(user=None, post_id=post_id, created_at=created_at)
+            for post_id, created_at in posts
+        ])
@@ -0,0 +1,228 @@
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Value, Window
+from django.db.models.functions import Greatest, RowNumber, TruncHour
+from django.utils import timezone
+
+from .models import HashtagActivity, PostHashtag, Trend
+
+# Posts older than this no longer count towards trends
+TRENDING_WINDOW = timedelta(hours=getattr(settings, 'POSTS_TRENDING_WINDOW_HOURS', 7 * 24))
+
+# Age after which a post weighs half as much in the trend score
+TRENDING_HALF_LIFE = timedelta(hours=getattr(settings, 'POSTS_TRENDING_HALF_LIFE_HOURS', 24))
+
+# Most recent posts kept in the post list of each trend
+TREND_MAX_POSTS = getattr(settings, 'POSTS_TREND_MAX_POSTS', 50)
+
+# Seconds a user's assembled trends response is served from the cache
+TRENDS_CACHE_TIMEOUT = getattr(settings, 'POSTS_TRENDS_CACHE_TIMEOUT', 60)
+
+TRENDS_CACHE_VERSION_KEY = 'posts:trends:version'
+
+# Minutes after which reading the trends starts a background refresh, applying the decay
+TRENDS_REFRESH_INTERVAL = getattr(settings, 'POSTS_TRENDS_REFRESH_MINUTES', 60)
+
+TRENDS_REFRESHED_KEY = 'posts:trends:refreshed'
+
+
+def get_bucket(moment):
+    """Get the start of the hour a moment falls in"""
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def get_decay_weight(moment, now=None):
+    """Get the weight of a post created at the given moment in the trend score"""
+    age = (now or timezone.now()) - moment
+    return 0.5 ** (max(age, timedelta(0)) / TRENDING_HALF_LIFE)
+
+
+def record_hashtag_activity(hashtag_ids, created_at, delta):
+    """Add delta posts created at the given moment to the activity of hashtags"""
+    if not hashtag_ids:
+        return
+
+    bucket = get_bucket(created_at)
+    if delta > 0:
+        # Create the missing buckets empty, then increment them all in one statement
+        HashtagActivity.objects.bulk_create(
+            [HashtagActivity(hashtag_id=hashtag_id, bucket=bucket) for hashtag_id in hashtag_ids],
+            ignore_conflicts=True
+        )
+    HashtagActivity.objects.filter(
+        hashtag_id__in=hashtag_ids,
+        bucket=bucket
+    ).update(count=Greatest(F('count') + delta, Value(0)))
+
+    if timezone.now() - created_at > TRENDING_WINDOW:
+        return
+    Trend.objects.filter(hashtag_id__in=hashtag_ids).update(
+        window_count=Greatest(F('window_count') + delta, Value(0)),
+        score=Greatest(F('score') + delta * get_decay_weight(created_at), Value(0.0))
+    )
+    invalidate_trends_cache()
+
+
+def get_top_trends(limit=10):
+    """Get the trends with the highest decayed score"""
+    return Trend.objects.filter(score__gt=0).select_related('hashtag').order_by('-score')[:limit]
+
+
+def get_top_hashtags(limit=10):
+    """Get the hashtags used by the most posts in the sliding window"""
+    trends = Trend.objects.filter(window_count__gt=0).select_related('hashtag').order_by('-window_count')[:limit]
+    hashtags = []
+    for trend in trends:
+        trend.hashtag.post_count = trend.window_count
+        hashtags.append(trend.hashtag)
+    return hashtags
+
+
+def get_trend_previews(user, limit=10, posts_per_trend=5):
+    """
+    Get the top trends with the most recent posts of each that the user can see.
+    The posts of every trend are read in a single windowed query over the tagged posts
+    of the window, filtered by visibility before they are ranked, so that posts the
+    user cannot see never crowd out those they can.
+    """
+    trends = list(get_top_trends(limit))
+    if not trends:
+        return []
+
+    rows = PostHashtag.objects.filter(
+        hashtag_id__in=[trend.hashtag_id for trend in trends],
+        post__created_at__gte=timezone.now() - TRENDING_WINDOW
+    ).filter(
+        # Visibility filter
+        Q(post__ispublic=True) |
+        Q(post__organization__in=user.organizations.all()) |
+        Q(post__user=user)
+    ).annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=[F('hashtag_id')],
+            order_by=[F('post__created_at').desc(), F('post_id').desc()]
+        )
+    ).filter(position__lte=posts_per_trend).select_related('post__user').defer(
+        'post__search_vector'
+    ).order_by('hashtag_id', 'position')
+
+    posts = defaultdict(list)
+    for row in rows:
+        posts[row.hashtag_id].append(row.post)
+    return [(trend, posts[trend.hashtag_id]) for trend in trends]
+
+
+def trim_trend_posts(trend_ids=None):
+    """Drop the posts that fall beyond the cap of the given trends, or of every trend"""
+    TrendPost = Trend.posts.through
+    rows = TrendPost.objects.all()
+    if trend_ids is not None:
+        rows = rows.filter(trend_id__in=trend_ids)
+
+    overflow = rows.annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=[F('trend_id')],
+            order_by=[F('post__created_at').desc(), F('post_id').desc()]
+        )
+    ).filter(position__gt=TREND_MAX_POSTS).values_list('pk', flat=True)
+
+    overflow_ids = list(overflow)
+    if overflow_ids:
+        TrendPost.objects.filter(pk__in=overflow_ids).delete()
+
+
+def get_trends_cache_key(user):
+    """Get the cache key of a user's trends response for the current trends"""
+    version = cache.get(TRENDS_CACHE_VERSION_KEY, 0)
+    return f"posts:trends:{version}:{user.id}"
+
+
+def invalidate_trends_cache():
+    """Make every cached trends response stale"""
+    cache.add(TRENDS_CACHE_VERSION_KEY, 0, timeout=None)
+    try:
+        cache.incr(TRENDS_CACHE_VERSION_KEY)
+    except ValueError:
+        # The key was evicted between add and incr, which is as good as a new version
+        pass
+
+
+def refresh_trends(now=None):
+    """
+    Drop the buckets that left the window and recompute every trend from the rest.
+    Writes keep the trends up to date between runs; this applies the decay and
+    repairs any drift, since the buckets are the source of truth.
+    """
+    now = now or timezone.now()
+    window_start = get_bucket(now - TRENDING_WINDOW)
+
+    counts = defaultdict(int)
+    scores = defaultdict(float)
+    buckets = HashtagActivity.objects.filter(bucket__gte=window_start, count__gt=0).values_list(
+        'hashtag_id', 'bucket', 'count'
+    )
+    for hashtag_id, bucket, count in buckets.iterator():
+        counts[hashtag_id] += count
+        # A bucket weighs as a post created in the middle of its hour
+        scores[hashtag_id] += count * get_decay_weight(bucket + timedelta(minutes=30), now)
+
+    with transaction.atomic():
+        HashtagActivity.objects.filter(Q(bucket__lt=window_start) | Q(count=0)).delete()
+
+        trends = list(Trend.objects.filter(Q(window_count__gt=0) | Q(score__gt=0) | Q(hashtag_id__in=list(counts))))
+        for trend in trends:
+            trend.window_count = counts.get(trend.hashtag_id, 0)
+            trend.score = scores.get(trend.hashtag_id, 0.0)
+        Trend.objects.bulk_update(trends, ['window_count', 'score'], batch_size=500)
+
+    trim_trend_posts()
+    invalidate_trends_cache()
+    cache.set(TRENDS_REFRESHED_KEY, True, timeout=TRENDS_REFRESH_INTERVAL * 60)
+    return len(trends)
+
+
+def refresh_trends_if_stale():
+    """
+    Start a background refresh of the trends when they were last refreshed over TRENDS_REFRESH_INTERVAL ago.
+    Only the request that claims the refresh starts it, and every request reads the current trends.
+    """
+    if cache.add(TRENDS_REFRESHED_KEY, True, timeout=TRENDS_REFRESH_INTERVAL * 60):
+        threading.Thread(target=run_trends_refresh, daemon=True).start()
+
+
+def run_trends_refresh():
+    try:
+        refresh_trends()
+    finally:
+        # The thread had its own database connection
+        connection.close()
+
+
+def rebuild_hashtag_activity(now=None):
+    """Recompute the activity buckets of the window from the hashtags of recent posts"""
+    now = now or timezone.now()
+    window_start = get_bucket(now - TRENDING_WINDOW)
+
+    rows = list(PostHashtag.objects.filter(
+        post__created_at__gte=window_start
+    ).annotate(
+        bucket=TruncHour('post__created_at')
+    ).order_by().values('hashtag_id', 'bucket').annotate(total=Count('id')))
+
+    with transaction.atomic():
+        HashtagActivity.objects.all().delete()
+        HashtagActivity.objects.bulk_create(
+            [HashtagActivity(hashtag_id=row['hashtag_id'], bucket=row['bucket'], count=row['total']) for row in rows],
+            batch_size=1000
+        )
+        # Hashtags used before the trend tables existed may not have a trend yet
+        Trend.objects.bulk_create(
+            [Trend(hashtag_id=hashtag_id) for hashtag_id in {row['hashtag_id'] for row in rows}],
+            ignore_conflicts=True
+        )
@@ -9,6 +9,7 @@ urlpatterns = [
     path('<int:pk>/', views.get_post_detail, name='post_detail'),
     path('<int:pk>/update/', views.update_post, name='post_update'),
     path('<int:pk>/delete/', views.delete_post, name='post_delete'),
+    path('media/<int:media_id>/', views.get_media_status, name='media_status'),
     
     # Feed and timeline
     path('feed/', views.get_feed, name='feed'),
@@ -18,6 +19,7 @@ urlpatterns = [
     
     # Comment operations
     path('<int:post_id>/comments/', views.get_post_comments, name='post_comments'),
+    path('<int:post_id>/comments/threads/', views.get_comment_threads, name='comment_threads'),
     path('<int:post_id>/comments/create/', views.create_comment, name='create_comment'),
     path('comments/<int:comment_id>/replies/', views.get_comment_replies, name='comment_replies'),
     path('comments/<int:comment_id>/update/', views.update_comment, name='update_comment'),
@@ -36,6 +38,7 @@ urlpatterns = [
     # Search operations
     path('search/', views.search_posts, name='search_posts'),
     path('hashtag/<str:hashtag_name>/', views.get_posts_by_hashtag, name='posts_by_hashtag'),
+    path('hashtags/suggest/', views.suggest_hashtags, name='suggest_hashtags'),
     path('trending-hashtags/', views.get_trending_hashtags, name='trending_hashtags'),
     path('trends/', views.get_trends, name='trends'),
     path('trend/<str:hashtag_name>/', views.get_trend_posts, name='trend_posts'),
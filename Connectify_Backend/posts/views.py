@@ -1,7 +1,11 @@
 from django.shortcuts import render, get_object_or_404
-from django.db.models import Q, Count
+from django.db.models import Q
 from accounts.models import User
-from django.utils import timezone
+from accounts.uploads import ChunkedUploadError, claim_uploads, discard_upload, open_upload, release_uploads
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
@@ -9,25 +13,37 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 
-from organizations.models import Organization, OrganizationAdmins
+from organizations.access import get_authorization_context
+from organizations.models import Organization
 from .models import (
     Post, PostMedia, PostComment, ReactionType, 
     PostReaction, CommentReaction, PostShare, 
-    PostTag, Hashtag, PostHashtag, Trend
+    PostTag, Trend
 )
 from .serializers import (
     PostSerializer, PostDetailSerializer, PostCreateSerializer,
-    PostUpdateSerializer, PostCommentSerializer, PostCommentCreateSerializer,
+    PostUpdateSerializer, PostCommentSerializer, PostCommentCreateSerializer, PostCommentThreadSerializer,
     ReactionTypeSerializer, PostReactionSerializer, CommentReactionSerializer,
-    PostShareSerializer, PostTagSerializer, HashtagSerializer
+    PostShareSerializer, PostTagSerializer, HashtagSerializer, PostMediaSerializer
+)
+from .comments import get_first_replies, get_latest_reactions, COMMENT_INLINE_REPLIES
+from .detail import get_post_detail_data, get_post_detail_modified, get_post_detail_tag
+from .media import add_post_media, validate_media_files, MediaUploadError
+from .timeline import get_timeline, fan_out_post, refresh_post, TIMELINE_MAX_LENGTH
+from .pagination import PostPagination
+from .counters import record_reaction_change, update_counter, update_post_counter
+from .hashtags import set_post_hashtags, set_post_tags
+from .search import index_post, match_posts
+from .suggest import hashtag_index, HASHTAG_SUGGEST_LIMIT
+from .trending import (
+    get_top_hashtags, get_trend_previews, get_trends_cache_key, refresh_trends_if_stale, TRENDS_CACHE_TIMEOUT
 )
-from .utils import upload_to_cloudinary, delete_from_cloudinary
 
 
 # Helper function to check if user is an organization admin
 def is_organization_admin(user, organization):
     """Check if a user is an admin of the organization"""
-    return OrganizationAdmins.objects.filter(organization=organization, admin=user).exists()
+    return get_authorization_context(user).is_admin(organization)
 
 # Helper function to check if user can access a post
 def can_access_post(user, post):
@@ -43,21 +59,22 @@ def can_access_post(user, post):
         return True
     
     # Post creator can access their own posts
-    if post.user == user:
+    if post.user_id == user.id:
         return True
     
     # Check if post belongs to an organization
-    if post.organization:
+    context = get_authorization_context(user)
+    if post.organization_id:
         # Organization admins can access all posts in their organization
-        if is_organization_admin(user, post.organization):
+        if context.is_admin(post.organization_id):
             return True
         
         # Organization members can access non-public posts in their organization
-        if user in post.organization.users.all():
+        if context.is_member(post.organization_id):
             return True
     
     # System admins can access all posts
-    if user.role == 'ADMIN':
+    if context.is_system_admin:
         return True
     
     return False
@@ -88,76 +105,72 @@ def create_post(request):
         if organization_id:
             organization = get_object_or_404(Organization, id=organization_id)
             # Check if user is a member of the organization
-            if not organization.users.filter(id=request.user.id).exists():
+            if not get_authorization_context(request.user).is_member(organization):
                 return Response(
                     {"error": "You must be a member of the organization to post"},
                     status=status.HTTP_403_FORBIDDEN
                 )
         
-        # Create post
-        post = Post.objects.create(
-            user=request.user,
-            organization=organization,
-            content=serializer.validated_data.get('content', ''),
-            ispublic=serializer.validated_data.get('ispublic', True),
-            type=post_type  # Set post type
-        )
+        # Take the finished chunked uploads, attached after the files sent with the post
+        try:
+            uploads = claim_uploads(request.user, serializer.validated_data['upload_ids'])
+        except ChunkedUploadError as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        media_files = request.FILES.getlist('media') + [open_upload(upload) for upload in uploads]
         
-        # Handle media file from mobile app format
-        media_data = request.data.get('media')
-        if media_data:
+        try:
+            # Reject unsupported media before anything is written
             try:
-                # Get the file from request.FILES
-                media_file = request.FILES.get('media')
-                if media_file:
-                    # Upload to Cloudinary
-                    upload_result = upload_to_cloudinary(media_file)
-                    print("Upload result:", upload_result)
-                    
-                    if not upload_result['success']:
-                        post.delete()
-                        return Response(
-                            {"error": f"Failed to upload media: {upload_result['error']}"},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
-                    
-                    # Get media type from file content_type
-                    media_type = media_file.content_type.split('/')[0]  # 'image' or 'video'
-                    PostMedia.objects.create(
-                        post=post,
-                        file=upload_result['url'],
-                        media_type=media_type
-                    )
-            except Exception as e:
-                post.delete()
+                validate_media_files(media_files)
+            except MediaUploadError as e:
+                release_uploads(uploads)
                 return Response(
-                    {"error": f"Error processing media: {str(e)}"},
+                    {"error": str(e)},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            
+            # Create post
+            post = Post.objects.create(
+                user=request.user,
+                organization=organization,
+                content=serializer.validated_data.get('content', ''),
+                ispublic=serializer.validated_data.get('ispublic', True),
+                type=post_type  # Set post type
+            )
+            
+            # Attach media files, uploaded in the background in the order they were sent
+            if media_files:
+                try:
+                    add_post_media(post, media_files)
+                except Exception as e:
+                    post.delete()
+                    release_uploads(uploads)
+                    return Response(
+                        {"error": f"Error processing media: {str(e)}"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+        finally:
+            for media_file in media_files:
+                media_file.close()
+        
+        # The media keeps its own copy of the uploads
+        for upload in uploads:
+            discard_upload(upload)
 
         # Process hashtags
-        content = post.content
-        hashtag_list = []
-        words = content.split()
-        for word in words:
-            if word.startswith('#'):
-                # Get original hashtag name for display
-                hashtag_name = word[1:]
-                if hashtag_name:
-                    # Convert to uppercase for storage and lookup
-                    uppercase_hashtag = hashtag_name.upper()
-                    hashtag, created = Hashtag.objects.get_or_create(name=uppercase_hashtag)
-                    PostHashtag.objects.create(post=post, hashtag=hashtag)
-                    hashtag_list.append(hashtag.name)
+        set_post_hashtags(post, post.content, created=True)
+        
+        # Make the post searchable
+        index_post(post)
         
         # Process user tags
-        user_ids = serializer.validated_data.get('tagged_user_ids', [])
-        for user_id in user_ids:
-            try:
-                tagged_user = User.objects.get(id=user_id)
-                PostTag.objects.create(post=post, user=tagged_user)
-            except User.DoesNotExist:
-                pass
+        set_post_tags(post, serializer.validated_data.get('tagged_user_ids', []))
+        
+        # Distribute the post to the timelines that can see it
+        fan_out_post(post)
         
         return Response(
             PostDetailSerializer(post).data,
@@ -171,8 +184,12 @@ def create_post(request):
 def get_post_detail(request, pk):
     """
     Get detailed information about a specific post.
+    Responses carry an ETag and Last-Modified, and unchanged posts are answered with 304.
     """
-    post = get_object_or_404(Post, pk=pk)
+    # Only the fields deciding access and the version are loaded until the response is known to be needed
+    post = get_object_or_404(Post.objects.only(
+        'id', 'user_id', 'organization_id', 'ispublic', 'sharded_counters', 'detail_version', 'detail_modified_at'
+    ), pk=pk)
     
     # Check if user can access this post
     if not can_access_post(request.user, post):
@@ -181,8 +198,35 @@ def get_post_detail(request, pk):
             status=status.HTTP_403_FORBIDDEN
         )
     
-    serializer = PostDetailSerializer(post)
-    return Response(serializer.data)
+    tag = get_post_detail_tag(post)
+    etag = quote_etag(tag)
+    # Only the ETag decides 304s: Last-Modified has second precision, so
+    # If-Modified-Since would miss writes made within the same second
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = Response(get_post_detail_data(post, tag))
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(get_post_detail_modified(post))
+    return response
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_media_status(request, media_id):
+    """
+    Get the upload status of a post's media, for clients polling after creating a post.
+    """
+    media = get_object_or_404(PostMedia.objects.select_related('post'), pk=media_id)
+    
+    if not can_access_post(request.user, media.post):
+        return Response(
+            {"error": "You do not have permission to view this media"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    data = PostMediaSerializer(media).data
+    if media.status == PostMedia.STATUS_FAILED:
+        data['error'] = media.error
+    return Response(data)
 
 @api_view(['PUT'])
 @permission_classes([IsAuthenticated])
@@ -203,25 +247,20 @@ def update_post(request, pk):
     
     serializer = PostUpdateSerializer(post, data=request.data, partial=True)
     if serializer.is_valid():
-        updated_post = serializer.save()
+        # Saving the post renews its cached detail, committed along with its hashtags
+        with transaction.atomic():
+            updated_post = serializer.save()
+            
+            # Update hashtags if content was changed
+            if 'content' in serializer.validated_data:
+                set_post_hashtags(updated_post, updated_post.content)
         
-        # Update hashtags if content was changed
         if 'content' in serializer.validated_data:
-            # Remove existing hashtags
-            PostHashtag.objects.filter(post=post).delete()
-            
-            # Add new hashtags
-            content = updated_post.content
-            words = content.split()
-            for word in words:
-                if word.startswith('#'):
-                    # Get original hashtag name for display
-                    hashtag_name = word[1:]
-                    if hashtag_name:
-                        # Convert to uppercase for storage and lookup
-                        uppercase_hashtag = hashtag_name.upper()
-                        hashtag, created = Hashtag.objects.get_or_create(name=uppercase_hashtag)
-                        PostHashtag.objects.create(post=updated_post, hashtag=hashtag)
+            index_post(updated_post)
+        
+        # Visibility changes move the post between timelines
+        if 'ispublic' in serializer.validated_data:
+            refresh_post(updated_post)
         
         return Response(
             PostDetailSerializer(updated_post).data,
@@ -252,33 +291,27 @@ def delete_post(request, pk):
 
 # Feed and Timeline
 
-class PostPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 50
-
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_feed(request):
     """
     Get a feed of regular posts for the current user.
+    The feed is read from the user's materialized timeline.
     """
     paginator = PostPagination()
+    paginator.cursor_ordering = ('-created_at', '-post_id')
+    paginator.max_results = TIMELINE_MAX_LENGTH
     
-    # Get user's organizations
-    user_orgs = request.user.organizations.all()
+    # Page through the precomputed timeline instead of the posts table
+    entries = get_timeline(request.user)
+    result_page = paginator.paginate_queryset(entries, request)
     
-    # Query for posts
-    posts = Post.objects.filter(
-        type='post'  # Only get regular posts
-    ).filter(
-        Q(ispublic=True) | 
-        Q(organization__in=user_orgs) |
-        Q(user=request.user)
-    ).distinct().order_by('-created_at')
+    # Load the posts of the page, keeping the timeline order
+    post_ids = [entry.post_id for entry in result_page]
+    posts_by_id = Post.objects.select_related('user').defer('search_vector').in_bulk(post_ids)
+    posts = [posts_by_id[post_id] for post_id in post_ids if post_id in posts_by_id]
     
-    result_page = paginator.paginate_queryset(posts, request)
-    serializer = PostSerializer(result_page, many=True)
+    serializer = PostSerializer(posts, many=True)
     
     return paginator.get_paginated_response(serializer.data)
 
@@ -294,7 +327,7 @@ def get_announcements(request):
     user_orgs = request.user.organizations.all()
     
     # Query for announcements
-    announcements = Post.objects.filter(
+    announcements = Post.objects.select_related('user').defer('search_vector').filter(
         type='announcement'
     ).filter(
         Q(ispublic=True) | 
@@ -320,18 +353,18 @@ def get_user_posts(request, user_id=None):
         
         # If viewing another user's posts, only show public posts
         if request.user.id != target_user.id and request.user.role != 'ADMIN':
-            posts = Post.objects.filter(
+            posts = Post.objects.select_related('user').defer('search_vector').filter(
                 user=target_user, 
                 ispublic=True
             ).order_by('-created_at')
         else:
             # If viewing own posts or is admin, show all posts
-            posts = Post.objects.filter(
+            posts = Post.objects.select_related('user').defer('search_vector').filter(
                 user=target_user
             ).order_by('-created_at')
     else:
         # Get current user's posts
-        posts = Post.objects.filter(
+        posts = Post.objects.select_related('user').defer('search_vector').filter(
             user=request.user
         ).order_by('-created_at')
     
@@ -351,19 +384,20 @@ def get_organization_posts(request, org_id):
     organization = get_object_or_404(Organization, pk=org_id)
     
     # Check if user is a member of the organization
-    is_member = organization.users.filter(id=request.user.id).exists()
-    is_admin = is_organization_admin(request.user, organization)
-    is_system_admin = request.user.role == 'ADMIN'
+    context = get_authorization_context(request.user)
+    is_member = context.is_member(organization)
+    is_admin = context.is_admin(organization)
+    is_system_admin = context.is_system_admin
     
     if not (is_member or is_admin or is_system_admin):
         # If not a member, only show public posts
-        posts = Post.objects.filter(
+        posts = Post.objects.select_related('user').defer('search_vector').filter(
             organization=organization,
             ispublic=True
         ).order_by('-created_at')
     else:
         # If a member, show all posts
-        posts = Post.objects.filter(
+        posts = Post.objects.select_related('user').defer('search_vector').filter(
             organization=organization
         ).order_by('-created_at')
     
@@ -399,22 +433,21 @@ def create_comment(request, post_id):
         if parent_comment_id:
             parent_comment = get_object_or_404(PostComment, pk=parent_comment_id, post=post)
         
-        # Create comment
-        comment = PostComment.objects.create(
-            post=post,
-            user=request.user,
-            parent_comment=parent_comment,
-            content=serializer.validated_data.get('content')
-        )
-        
-        # Update post comment count
-        post.comment_count = PostComment.objects.filter(post=post, parent_comment=None).count()
-        post.save()
-        
-        # Update parent comment reply count if applicable
-        if parent_comment:
-            parent_comment.reply_count = PostComment.objects.filter(parent_comment=parent_comment).count()
-            parent_comment.save()
+        # The comment and its count are committed together, so the renewed detail shows both
+        with transaction.atomic():
+            # Create comment
+            comment = PostComment.objects.create(
+                post=post,
+                user=request.user,
+                parent_comment=parent_comment,
+                content=serializer.validated_data.get('content')
+            )
+            
+            # Update post comment count or parent comment reply count
+            if parent_comment:
+                update_counter(PostComment, parent_comment.id, 'reply_count', 1)
+            else:
+                update_post_counter(post, 'comment_count', 1)
         
         return Response(
             PostCommentSerializer(comment).data,
@@ -439,6 +472,7 @@ def get_post_comments(request, post_id):
         )
     
     paginator = PostPagination()
+    paginator.cursor_ordering = ('created_at', 'id')
     comments = PostComment.objects.filter(
         post=post,
         parent_comment=None
@@ -450,6 +484,50 @@ def get_post_comments(request, post_id):
     
     return paginator.get_paginated_response(serializer.data)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_comment_threads(request, post_id):
+    """
+    Get a page of top-level comments of a post, each with its first replies and latest reactions.
+    Threads with more replies carry a cursor to continue them on the replies endpoint.
+    """
+    post = get_object_or_404(Post.objects.only('id', 'user_id', 'organization_id', 'ispublic'), pk=post_id)
+    
+    # Check if user can access this post to view comments
+    if not can_access_post(request.user, post):
+        return Response(
+            {"error": "You do not have permission to view comments on this post"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    # Replies shown per thread, from 1 up to COMMENT_INLINE_REPLIES
+    try:
+        reply_limit = int(request.query_params.get('replies', COMMENT_INLINE_REPLIES))
+    except ValueError:
+        reply_limit = COMMENT_INLINE_REPLIES
+    reply_limit = min(max(reply_limit, 1), COMMENT_INLINE_REPLIES)
+    
+    paginator = PostPagination()
+    paginator.cursor_ordering = ('created_at', 'id')
+    comments = PostComment.objects.filter(
+        post=post,
+        parent_comment=None
+    ).select_related('user').order_by('created_at')
+    result_page = list(paginator.paginate_queryset(comments, request))
+    
+    # The replies and reactions of the whole page are loaded in one query each
+    comment_ids = [comment.id for comment in result_page]
+    replies = get_first_replies(comment_ids, reply_limit)
+    comment_ids += [reply.id for thread in replies.values() for reply in thread[:reply_limit]]
+    serializer = PostCommentThreadSerializer(result_page, many=True, context={
+        'replies': replies,
+        'reply_limit': reply_limit,
+        'reactions': get_latest_reactions(comment_ids),
+        'paginator': paginator,
+    })
+    
+    return paginator.get_paginated_response(serializer.data)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_comment_replies(request, comment_id):
@@ -466,6 +544,7 @@ def get_comment_replies(request, comment_id):
         )
     
     paginator = PostPagination()
+    paginator.cursor_ordering = ('created_at', 'id')
     replies = PostComment.objects.filter(
         parent_comment=comment
     ).order_by('created_at')
@@ -521,17 +600,16 @@ def delete_comment(request, comment_id):
     post = comment.post
     parent_comment = comment.parent_comment
     
-    # Delete the comment
-    comment.delete()
-    
-    # Update post comment count if it was a top-level comment
-    if not parent_comment:
-        post.comment_count = PostComment.objects.filter(post=post, parent_comment=None).count()
-        post.save()
-    else:
-        # Update parent comment reply count
-        parent_comment.reply_count = PostComment.objects.filter(parent_comment=parent_comment).count()
-        parent_comment.save()
+    with transaction.atomic():
+        # Delete the comment
+        comment.delete()
+        
+        # Update post comment count if it was a top-level comment
+        if not parent_comment:
+            update_post_counter(post, 'comment_count', -1)
+        else:
+            # Update parent comment reply count
+            update_counter(PostComment, parent_comment.id, 'reply_count', -1)
     
     return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -595,23 +673,27 @@ def react_to_post(request, post_id):
     # Check if user already reacted to this post
     existing_reaction = PostReaction.objects.filter(post=post, user=request.user).first()
     
-    if existing_reaction:
-        # Update existing reaction
-        existing_reaction.reaction_type = reaction_type
-        existing_reaction.save()
-        message = "Reaction updated"
-    else:
-        # Create new reaction
-        PostReaction.objects.create(
-            post=post,
-            user=request.user,
-            reaction_type=reaction_type
-        )
-        
-        # Update post reaction count
-        post.reaction_count = PostReaction.objects.filter(post=post).count()
-        post.save()
-        message = "Reaction added"
+    # The reaction and its counts are committed together, so the renewed detail shows both
+    with transaction.atomic():
+        if existing_reaction:
+            # Update existing reaction
+            old_type_id = existing_reaction.reaction_type_id
+            existing_reaction.reaction_type = reaction_type
+            existing_reaction.save()
+            record_reaction_change(post, old_type_id, reaction_type.id)
+            message = "Reaction updated"
+        else:
+            # Create new reaction
+            PostReaction.objects.create(
+                post=post,
+                user=request.user,
+                reaction_type=reaction_type
+            )
+            record_reaction_change(post, new_type_id=reaction_type.id)
+            
+            # Update post reaction count
+            update_post_counter(post, 'reaction_count', 1)
+            message = "Reaction added"
     
     return Response(
         {"message": message, "reaction_type": reaction_type.name},
@@ -635,12 +717,13 @@ def remove_post_reaction(request, post_id):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Delete the reaction
-    reaction.delete()
-    
-    # Update post reaction count
-    post.reaction_count = PostReaction.objects.filter(post=post).count()
-    post.save()
+    with transaction.atomic():
+        # Delete the reaction
+        reaction.delete()
+        record_reaction_change(post, old_type_id=reaction.reaction_type_id)
+        
+        # Update post reaction count
+        update_post_counter(post, 'reaction_count', -1)
     
     return Response(
         {"message": "Reaction removed"},
@@ -675,23 +758,23 @@ def react_to_comment(request, comment_id):
     # Check if user already reacted to this comment
     existing_reaction = CommentReaction.objects.filter(comment=comment, user=request.user).first()
     
-    if existing_reaction:
-        # Update existing reaction
-        existing_reaction.reaction_type = reaction_type
-        existing_reaction.save()
-        message = "Reaction updated"
-    else:
-        # Create new reaction
-        CommentReaction.objects.create(
-            comment=comment,
-            user=request.user,
-            reaction_type=reaction_type
-        )
-        
-        # Update comment reaction count
-        comment.reaction_count = CommentReaction.objects.filter(comment=comment).count()
-        comment.save()
-        message = "Reaction added"
+    with transaction.atomic():
+        if existing_reaction:
+            # Update existing reaction
+            existing_reaction.reaction_type = reaction_type
+            existing_reaction.save()
+            message = "Reaction updated"
+        else:
+            # Create new reaction
+            CommentReaction.objects.create(
+                comment=comment,
+                user=request.user,
+                reaction_type=reaction_type
+            )
+            
+            # Update comment reaction count
+            update_counter(PostComment, comment.id, 'reaction_count', 1)
+            message = "Reaction added"
     
     return Response(
         {"message": message, "reaction_type": reaction_type.name},
@@ -715,12 +798,12 @@ def remove_comment_reaction(request, comment_id):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Delete the reaction
-    reaction.delete()
-    
-    # Update comment reaction count
-    comment.reaction_count = CommentReaction.objects.filter(comment=comment).count()
-    comment.save()
+    with transaction.atomic():
+        # Delete the reaction
+        reaction.delete()
+        
+        # Update comment reaction count
+        update_counter(PostComment, comment.id, 'reaction_count', -1)
     
     return Response(
         {"message": "Reaction removed"},
@@ -747,15 +830,15 @@ def share_post(request, post_id):
     # Create share
     additional_content = request.data.get('additional_content', '')
     
-    share = PostShare.objects.create(
-        post=post,
-        user=request.user,
-        additional_content=additional_content
-    )
-    
-    # Update post share count
-    post.share_count = PostShare.objects.filter(post=post).count()
-    post.save()
+    with transaction.atomic():
+        share = PostShare.objects.create(
+            post=post,
+            user=request.user,
+            additional_content=additional_content
+        )
+        
+        # Update post share count
+        update_post_counter(post, 'share_count', 1)
     
     return Response(
         PostShareSerializer(share).data,
@@ -778,25 +861,26 @@ def search_posts(request):
         )
     
     paginator = PostPagination()
+    # Keyset pages follow (created_at, id), which would drop the relevance order
+    if paginator.wants_cursor(request):
+        return Response(
+            {"error": "Search results are ranked by relevance and only support page numbers"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
     # Get user's organizations
     user_orgs = request.user.organizations.all()
     
-    # Search for posts
-    posts = Post.objects.filter(
-        # Content search
-        (Q(content__icontains=query) |
-        # Hashtag search
-        Q(hashtags__hashtag__name__icontains=query) |
-        # User search
-        Q(user__username__icontains=query) |
-        Q(user__first_name__icontains=query) |
-        Q(user__last_name__icontains=query)) &
-        # Visibility filter
-        (Q(ispublic=True) | 
-        Q(organization__in=user_orgs) |
-        Q(user=request.user))
-    ).distinct().order_by('-created_at')
+    # Search the full-text index of content, hashtags and author names, best matches first
+    posts = match_posts(
+        Post.objects.select_related('user').defer('search_vector').filter(
+            # Visibility filter
+            Q(ispublic=True) | 
+            Q(organization__in=user_orgs) |
+            Q(user=request.user)
+        ),
+        query
+    )
     
     # Apply pagination
     result_page = paginator.paginate_queryset(posts, request)
@@ -816,7 +900,7 @@ def get_posts_by_hashtag(request, hashtag_name):
     user_orgs = request.user.organizations.all()
     
     # Get posts with the hashtag
-    posts = Post.objects.filter(
+    posts = Post.objects.select_related('user').defer('search_vector').filter(
         hashtags__hashtag__name=hashtag_name
     ).filter(
         # Visibility filter
@@ -831,18 +915,40 @@ def get_posts_by_hashtag(request, hashtag_name):
     
     return paginator.get_paginated_response(serializer.data)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def suggest_hashtags(request):
+    """
+    Suggest the most used hashtags starting with a prefix, for autocompletion.
+    """
+    prefix = request.query_params.get('prefix', '').lstrip('#').upper()
+    if not prefix:
+        return Response(
+            {"error": "Query parameter 'prefix' is required"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        limit = int(request.query_params.get('limit', HASHTAG_SUGGEST_LIMIT))
+    except ValueError:
+        limit = HASHTAG_SUGGEST_LIMIT
+    
+    # Answered from the in-memory index, without touching the database
+    names = hashtag_index.suggest(prefix, max(limit, 1))
+    return Response([
+        {"name": name, "weight": hashtag_index.get_weight(name)}
+        for name in names
+    ])
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_trending_hashtags(request):
     """
     Get trending hashtags based on recent post activity.
     """
-    # Get hashtags from recent posts (last 7 days)
-    trending_hashtags = Hashtag.objects.filter(
-        posts__post__created_at__gte=timezone.now() - timezone.timedelta(days=7)
-    ).annotate(
-        post_count=Count('posts')
-    ).order_by('-post_count')[:10]
+    # Counts over the last 7 days are maintained as posts are tagged
+    refresh_trends_if_stale()
+    trending_hashtags = get_top_hashtags(10)
     
     serializer = HashtagSerializer(trending_hashtags, many=True)
     return Response(serializer.data)
@@ -853,16 +959,28 @@ def get_trends(request):
     """
     Get trending hashtags and their associated posts.
     """
-    trends = Trend.objects.order_by('-post_count')[:10]
+    # The response depends on the posts the user can see, so it is cached per user
+    refresh_trends_if_stale()
+    cache_key = get_trends_cache_key(request.user)
+    data = cache.get(cache_key)
+    if data is not None:
+        return Response(data, status=status.HTTP_200_OK)
+
+    previews = get_trend_previews(request.user, limit=10, posts_per_trend=5)
+
+    # Serialize the posts of all trends together, once each
+    posts = {post.id: post for trend, trend_posts in previews for post in trend_posts}
+    posts_data = PostSerializer(list(posts.values()), many=True, context={'request': request}).data
+    posts_data = {post['id']: post for post in posts_data}
+
     data = []
-    for trend in trends:
-        posts = trend.posts.order_by('-created_at')[:5]  # Limit to 5 recent posts per trend
-        posts_data = PostSerializer(posts, many=True, context={'request': request}).data
+    for trend, trend_posts in previews:
         data.append({
             "hashtag": trend.hashtag.name,
             "post_count": trend.post_count,
-            "posts": posts_data,
+            "posts": [posts_data[post.id] for post in trend_posts],
         })
+    cache.set(cache_key, data, TRENDS_CACHE_TIMEOUT)
     return Response(data, status=status.HTTP_200_OK)
 
 # User Tag Operations
@@ -964,7 +1082,10 @@ def get_trend_posts(request, hashtag_name):
     # Get and paginate posts
     paginator = PageNumberPagination()
     paginator.page_size = 10
-    posts = trend.posts.all().order_by('-created_at')
+    # Trends only keep their most recent posts, so read the full list from the hashtags
+    posts = Post.objects.select_related('user').defer('search_vector').filter(
+        hashtags__hashtag_id=trend.hashtag_id
+    ).order_by('-created_at')
     
     page = paginator.paginate_queryset(posts, request)
     serializer = PostSerializer(page, many=True, context={'request': request})